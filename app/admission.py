@@ -0,0 +1,201 @@
+"""
+Admission control for the registration endpoints.
+
+When a popular lab opens, every student submits at once and each request
+competes for SQLite's single write lock. The AdmissionController lets at
+most REGISTRATION_MAX_IN_FLIGHT registrations run at once and puts the rest
+in a FIFO queue, bounded by REGISTRATION_QUEUE_SIZE.
+
+The queue is the registration_ticket table, so every worker process and
+thread sees the same queue and the in-flight cap is global. No request ever
+waits for its turn: a registration that cannot run now is answered at once
+with 202 and a ticket. The page then polls the ticket's status endpoint.
+The poll that finds a free slot for a ticket near the head of the queue
+runs the registration and stores its response on the ticket. A waiting
+ticket that is not polled for REGISTRATION_QUEUE_TIMEOUT seconds drops out
+of the queue. REGISTRATION_ADMISSION=0 turns the controller off.
+"""
+import json
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, update
+
+from models import db, RegistrationTicket
+from auth import begin_write_transaction
+
+# Seconds a running ticket holds its slot if its request never finishes (worker killed)
+ADMISSION_RUN_TIMEOUT = 60.0
+# Seconds finished and abandoned tickets are kept, so a late poll still gets its result
+ADMISSION_RETENTION = 3600.0
+# Seconds between deletions of old tickets, per process
+ADMISSION_PURGE_INTERVAL = 60.0
+
+# state: 'admitted' (the caller must run it now), 'waiting', 'running'
+# (in another request), 'done' or 'expired'. position counts from 1.
+Ticket = namedtuple('Ticket', 'ticket_id action payload state position waiting status_code result')
+
+_tickets = RegistrationTicket.__table__.c
+
+
+class RegistrationBusy(Exception):
+    """The queue is full."""
+
+    def __init__(self, reason, position=None):
+        super().__init__(reason)
+        self.reason = reason
+        self.position = position
+
+
+class AdmissionController:
+    """Bounded in-flight slots with a FIFO waiting queue in front of them, kept in the database."""
+
+    def __init__(self, max_in_flight=4, max_waiting=500, wait_timeout=15.0):
+        self.max_in_flight = max_in_flight
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self._purged_at = 0.0
+
+    def _cutoffs(self, now):
+        return now - timedelta(seconds=self.wait_timeout), now - timedelta(seconds=ADMISSION_RUN_TIMEOUT)
+
+    def _live(self, now):
+        """WHERE clause for tickets still holding a slot or a place in the queue."""
+        idle, stuck = self._cutoffs(now)
+        return ((_tickets.state == 'waiting') & (_tickets.touched_at >= idle)) | \
+               ((_tickets.state == 'running') & (_tickets.touched_at >= stuck))
+
+    def _count(self, state, now, before=None):
+        idle, stuck = self._cutoffs(now)
+        query = select(func.count()).select_from(RegistrationTicket.__table__).where(
+            _tickets.state == state, _tickets.touched_at >= (idle if state == 'waiting' else stuck))
+        if before is not None:
+            query = query.where(_tickets.ticket_id <= before)
+        return db.session.scalar(query)
+
+    def _purge(self, now):
+        if time.monotonic() - self._purged_at < ADMISSION_PURGE_INTERVAL:
+            return
+        self._purged_at = time.monotonic()
+        db.session.execute(delete(RegistrationTicket.__table__).where(
+            _tickets.touched_at < now - timedelta(seconds=ADMISSION_RETENTION)))
+
+    def admit(self, owner, action, payload):
+        """
+        Issue a ticket for a registration. Returns an 'admitted' Ticket when a
+        slot is free and nobody is waiting, else a 'waiting' one. A student
+        with a live ticket gets that ticket back. Raises RegistrationBusy when
+        the queue is full.
+        """
+        now = datetime.now()
+        begin_write_transaction()
+        self._purge(now)
+
+        existing = db.session.execute(
+            select(_tickets.ticket_id, _tickets.state)
+            .where(_tickets.am == owner, self._live(now))
+            .order_by(_tickets.ticket_id).limit(1)
+        ).first()
+        if existing is not None:
+            db.session.commit()
+            return self.poll(existing.ticket_id, owner)
+
+        running = self._count('running', now)
+        waiting = self._count('waiting', now)
+        if running < self.max_in_flight and waiting == 0:
+            state = 'running'
+        elif waiting >= self.max_waiting:
+            db.session.commit()
+            raise RegistrationBusy('queue_full', waiting)
+        else:
+            state = 'waiting'
+
+        body = json.dumps(payload)
+        ticket_id = db.session.execute(RegistrationTicket.__table__.insert().values(
+            am=owner, action=action, payload=body, state=state, issued_at=now, touched_at=now
+        )).inserted_primary_key[0]
+        db.session.commit()
+        if state == 'running':
+            return Ticket(ticket_id, action, payload, 'admitted', 0, 0, None, None)
+        return Ticket(ticket_id, action, payload, 'waiting', waiting + 1, waiting + 1, None, None)
+
+    def poll(self, ticket_id, owner):
+        """
+        The ticket's current state, or None if it is not owner's. Claims a
+        slot (state 'admitted') when there are as many free slots as tickets
+        up to and including this one; the caller must then run it and call
+        finish().
+        """
+        now = datetime.now()
+        row = db.session.execute(
+            select(_tickets.action, _tickets.payload, _tickets.state, _tickets.touched_at,
+                   _tickets.status_code, _tickets.result)
+            .where(_tickets.ticket_id == ticket_id, _tickets.am == owner)
+        ).first()
+        if row is None:
+            return None
+        payload = json.loads(row.payload)
+        idle, stuck = self._cutoffs(now)
+        if row.state == 'done':
+            return Ticket(ticket_id, row.action, payload, 'done', 0, 0, row.status_code, row.result)
+        if row.touched_at < (idle if row.state == 'waiting' else stuck):
+            return Ticket(ticket_id, row.action, payload, 'expired', 0, 0, None, None)
+        if row.state == 'running':
+            return Ticket(ticket_id, row.action, payload, 'running', 0, 0, None, None)
+
+        # The first free-slots tickets of the queue may start
+        position = self._count('waiting', now, before=ticket_id)
+        if position <= self.max_in_flight - self._count('running', now):
+            # Check again under the write lock: other polls may have taken the slots
+            begin_write_transaction()
+            claimed = 0
+            if self._count('waiting', now, before=ticket_id) <= self.max_in_flight - self._count('running', now):
+                claimed = db.session.execute(
+                    update(RegistrationTicket.__table__)
+                    .where(_tickets.ticket_id == ticket_id, _tickets.state == 'waiting')
+                    .values(state='running', touched_at=now)
+                ).rowcount
+            db.session.commit()
+            if claimed:
+                return Ticket(ticket_id, row.action, payload, 'admitted', 0, 0, None, None)
+            position = self._count('waiting', now, before=ticket_id)
+
+        waiting = self._count('waiting', now)
+        if now - row.touched_at > timedelta(seconds=self.wait_timeout / 3):
+            # Polling keeps the place; refresh it well before it would expire
+            db.session.execute(update(RegistrationTicket.__table__)
+                               .where(_tickets.ticket_id == ticket_id).values(touched_at=now))
+            db.session.commit()
+        return Ticket(ticket_id, row.action, payload, 'waiting', position, waiting, None, None)
+
+    def finish(self, ticket_id, status_code, result):
+        """Store the response of an admitted ticket and free its slot."""
+        db.session.execute(
+            update(RegistrationTicket.__table__).where(_tickets.ticket_id == ticket_id)
+            .values(state='done', status_code=status_code, result=result, touched_at=datetime.now())
+        )
+        db.session.commit()
+
+    def stats(self):
+        now = datetime.now()
+        return {
+            'max_in_flight': self.max_in_flight,
+            'in_flight': self._count('running', now),
+            'waiting': self._count('waiting', now),
+            'max_waiting': self.max_waiting
+        }
+
+
+def init_admission(app):
+    """Build the registration admission controller; None when REGISTRATION_ADMISSION is off."""
+    if not app.config.get('REGISTRATION_ADMISSION', True):
+        app.extensions['admission'] = None
+        return None
+    controller = AdmissionController(
+        max_in_flight=app.config.get('REGISTRATION_MAX_IN_FLIGHT', 4),
+        max_waiting=app.config.get('REGISTRATION_QUEUE_SIZE', 500),
+        wait_timeout=app.config.get('REGISTRATION_QUEUE_TIMEOUT', 15.0)
+    )
+    app.extensions['admission'] = controller
+    return controller
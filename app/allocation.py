@@ -0,0 +1,135 @@
+"""
+Batch group allocation for labs in 'preferences' mode.
+
+Instead of racing for seats when registration opens, students of such a lab
+rank its groups (group_preference) until the lab's reg_limit. Afterwards
+allocate_lab assigns everyone at once by serial dictatorship: students are
+put in a random priority order (a lottery, reproducible with a seed) and each
+takes their best-ranked group that still has a free seat. No student can get
+a better group by misreporting their ranking. Students whose ranked groups
+all filled up are then placed in the group with the most free seats left.
+
+The assignment is written through auth.bulk_enroll_students, so seats,
+duplicates and existing memberships are checked again under the write lock.
+Only the preferences of students it enrolled are deleted, in the same
+transaction. Students left without a seat, or refused by the checks, keep
+their ranking, so the next run (the daily allocate-preferences command)
+tries them again.
+"""
+import heapq
+import random
+from collections import Counter, namedtuple
+from itertools import groupby
+from operator import itemgetter
+
+from sqlalchemy import delete, select
+
+from models import db, CourseLab, GroupPreference, LabGroup, RelLabGroup
+from auth import bulk_enroll_students, get_academic_year
+
+ALLOCATION_MODES = ('fcfs', 'preferences')
+
+# Longest ranking a student may submit; students whose ranked groups fill up
+# are placed by fill_unranked, so ranking every group buys nothing
+MAX_RANKED_GROUPS = 20
+
+# Students per DELETE of consumed preferences, below SQLite's bound-parameter limit
+PREFERENCE_DELETE_CHUNK = 500
+
+# assigned: {am: group_id}; unassigned: [am, ...] in priority order;
+# ranks: Counter of the rank each student got (0 = placed outside their ranking)
+Allocation = namedtuple('Allocation', 'assigned unassigned ranks')
+
+_preferences = GroupPreference.__table__.c
+
+
+def lottery_order(ams, seed=None):
+    """The students in a random priority order; the same seed gives the same order."""
+    order = sorted(ams)
+    random.Random(seed).shuffle(order)
+    return order
+
+
+def serial_dictatorship(preferences, seats, order, fill_unranked=True):
+    """
+    Assign students to groups.
+
+    preferences: {am: [group_id, ...]} best first; seats: {group_id: free
+    seats}; order: the students in priority order. Runs in time linear in the
+    number of preferences looked at, plus a heap operation per unranked
+    placement.
+    """
+    free = dict(seats)
+    assigned, ranks, unassigned = {}, Counter(), []
+    for am in order:
+        for rank, group_id in enumerate(preferences.get(am, ()), 1):
+            if free.get(group_id, 0) > 0:
+                free[group_id] -= 1
+                assigned[am] = group_id
+                ranks[rank] += 1
+                break
+        else:
+            unassigned.append(am)
+
+    if fill_unranked and unassigned:
+        # Emptiest group first; ties go to the lower group_id
+        heap = [(-n, group_id) for group_id, n in free.items() if n > 0]
+        heapq.heapify(heap)
+        still_unassigned = []
+        for am in unassigned:
+            if not heap:
+                still_unassigned.append(am)
+                continue
+            n, group_id = heapq.heappop(heap)
+            assigned[am] = group_id
+            ranks[0] += 1
+            if n + 1 < 0:
+                heapq.heappush(heap, (n + 1, group_id))
+        unassigned = still_unassigned
+
+    return Allocation(assigned, unassigned, ranks)
+
+
+def load_preferences(lab_id):
+    """{am: [group_id, ...]} best first, for every student who ranked the lab's groups."""
+    # A Core select in primary-key order: one range scan, no sort, no ORM rows
+    rows = db.session.execute(
+        select(_preferences.am, _preferences.group_id)
+        .where(_preferences.lab_id == lab_id)
+        .order_by(_preferences.am, _preferences.rank)
+    ).all()
+    return {am: [group_id for _, group_id in ranking] for am, ranking in groupby(rows, itemgetter(0))}
+
+
+def free_seats(lab_id, academic_year):
+    """{group_id: free seats} for the lab's groups of one academic year."""
+    rows = db.session.execute(
+        select(LabGroup.group_id, CourseLab.maxusers - LabGroup.enrolled_count)
+        .join(RelLabGroup, RelLabGroup.group_id == LabGroup.group_id)
+        .join(CourseLab, CourseLab.lab_id == RelLabGroup.lab_id)
+        .where(RelLabGroup.lab_id == lab_id, LabGroup.year == academic_year)
+    )
+    return {group_id: max(0, n) for group_id, n in rows}
+
+
+def allocate_lab(lab_id, seed=None, fill_unranked=True):
+    """
+    Allocate every student who ranked the lab's groups, enroll them and delete
+    the preferences of those enrolled. Returns (Allocation, {am: status from
+    bulk_enroll_students}).
+    """
+    preferences = load_preferences(lab_id)
+    seats = free_seats(lab_id, get_academic_year())
+    allocation = serial_dictatorship(preferences, seats, lottery_order(preferences, seed), fill_unranked)
+
+    pairs = list(allocation.assigned.items())
+
+    def consume_preferences(statuses):
+        # Preferences submitted after load_preferences belong to unplaced students and stay
+        placed = [am for (am, _), status in zip(pairs, statuses) if status == 'added']
+        for i in range(0, len(placed), PREFERENCE_DELETE_CHUNK):
+            db.session.execute(delete(GroupPreference.__table__).where(
+                _preferences.lab_id == lab_id, _preferences.am.in_(placed[i:i + PREFERENCE_DELETE_CHUNK])))
+
+    statuses = bulk_enroll_students(pairs, before_commit=consume_preferences) if pairs else []
+    return allocation, dict(zip((am for am, _ in pairs), statuses))
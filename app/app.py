@@ -1,8 +1,13 @@
 from flask import Flask, session, jsonify, render_template
 from flask_babel import Babel
 from models import db, init_app
-from auth import get_academic_year
+from auth import get_academic_year, init_route_permissions, format_date, repair_enrolled_counts, close_waitlists
+from audit import init_audit, purge_audit_entries
+from cas import init_cas
+from admission import init_admission
+from migrations import upgrade, current_version, check_schema, SchemaOutOfDate, MIGRATIONS
 import os
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,13 +15,140 @@ load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'dev-key-123')
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-DB_PATH = os.path.join(BASE_DIR, 'data', 'labregister.sqlite')
+DB_PATH = os.getenv('DATABASE_PATH', os.path.join(BASE_DIR, 'data', 'labregister.sqlite'))
 app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{DB_PATH}'
 app.config['AUTH_MODE'] = os.getenv('AUTH_MODE', 'dev')
-init_app(app)
 
-with app.app_context():
-    db.create_all()
+# SQLite pragma profile applied to every connection: performance | safe | legacy
+app.config['SQLITE_PROFILE'] = os.getenv('SQLITE_PROFILE', 'performance')
+# GET/HEAD requests read through a separate mode=ro engine (see models.RoutingSession)
+app.config['SQLITE_READONLY_ENGINE'] = os.getenv('SQLITE_READONLY_ENGINE', '1') == '1'
+app.config['SQLITE_READONLY_POOL_SIZE'] = int(os.getenv('SQLITE_READONLY_POOL_SIZE', 4))
+
+# CAS single sign-on: pooled ticket validation with timeouts and a circuit breaker
+app.config['CAS_LOGIN_URL'] = os.getenv('CAS_LOGIN_URL', 'https://sso.uoi.gr/login')
+app.config['CAS_VALIDATE_URL'] = os.getenv('CAS_VALIDATE_URL', 'https://sso.uoi.gr/serviceValidate')
+app.config['CAS_SERVICE_URL'] = os.getenv('CAS_SERVICE_URL', 'http://localhost:5000/cas_callback')
+app.config['CAS_CONNECT_TIMEOUT'] = float(os.getenv('CAS_CONNECT_TIMEOUT', 2.0))
+app.config['CAS_READ_TIMEOUT'] = float(os.getenv('CAS_READ_TIMEOUT', 5.0))
+app.config['CAS_POOL_SIZE'] = int(os.getenv('CAS_POOL_SIZE', 20))
+app.config['CAS_MAX_CONCURRENT'] = int(os.getenv('CAS_MAX_CONCURRENT', 20))
+app.config['CAS_ACQUIRE_TIMEOUT'] = float(os.getenv('CAS_ACQUIRE_TIMEOUT', 2.0))
+app.config['CAS_BREAKER_THRESHOLD'] = int(os.getenv('CAS_BREAKER_THRESHOLD', 5))
+app.config['CAS_BREAKER_RESET'] = float(os.getenv('CAS_BREAKER_RESET', 30.0))
+
+# Audit trail: batched background writer to a rotating JSONL file
+app.config['AUDIT_LOG_ASYNC'] = os.getenv('AUDIT_LOG_ASYNC', '1') == '1'
+app.config['AUDIT_LOG_PATH'] = os.getenv('AUDIT_LOG_PATH', os.path.join(BASE_DIR, 'logs', 'audit.jsonl'))
+app.config['AUDIT_LOG_MAX_BYTES'] = int(os.getenv('AUDIT_LOG_MAX_BYTES', 10 * 1024 * 1024))
+app.config['AUDIT_LOG_BACKUP_COUNT'] = int(os.getenv('AUDIT_LOG_BACKUP_COUNT', 5))  # older files are archived, not deleted
+app.config['AUDIT_BATCH_SIZE'] = int(os.getenv('AUDIT_BATCH_SIZE', 200))
+app.config['AUDIT_FLUSH_INTERVAL'] = float(os.getenv('AUDIT_FLUSH_INTERVAL', 1.0))
+app.config['AUDIT_LOG_DB'] = os.getenv('AUDIT_LOG_DB', '1') == '1'
+app.config['AUDIT_RETENTION_DAYS'] = int(os.getenv('AUDIT_RETENTION_DAYS', 365))  # 0 = keep forever
+app.config['AUDIT_PURGE_CHUNK_SIZE'] = int(os.getenv('AUDIT_PURGE_CHUNK_SIZE', 5000))
+
+# Registration admission control: bounded in-flight registrations, FIFO ticket queue (in the DB) for the rest
+app.config['REGISTRATION_ADMISSION'] = os.getenv('REGISTRATION_ADMISSION', '1') == '1'
+app.config['REGISTRATION_MAX_IN_FLIGHT'] = int(os.getenv('REGISTRATION_MAX_IN_FLIGHT', 4))
+app.config['REGISTRATION_QUEUE_SIZE'] = int(os.getenv('REGISTRATION_QUEUE_SIZE', 500))
+app.config['REGISTRATION_QUEUE_TIMEOUT'] = float(os.getenv('REGISTRATION_QUEUE_TIMEOUT', 15.0))
+
+# Apply pending migrations on the first request; off = refuse to serve until `flask db-upgrade`
+app.config['DB_AUTO_UPGRADE'] = os.getenv('DB_AUTO_UPGRADE', '1') == '1'
+
+# Importing this module does not touch the database: the schema is checked on the first request
+init_app(app)
+init_cas(app)
+init_admission(app)
+init_audit(app)
+
+_schema_lock = threading.Lock()
+_schema_checked = False
+
+
+@app.before_request
+def ensure_schema():
+    """Check the schema version once per worker, before the first request is served."""
+    global _schema_checked
+    if _schema_checked:
+        return None
+    with _schema_lock:
+        if not _schema_checked:
+            try:
+                check_schema(db.engine, db.metadata, auto_upgrade=app.config['DB_AUTO_UPGRADE'])
+            except SchemaOutOfDate as e:
+                app.logger.error(str(e))
+                return jsonify({'error': 'Service unavailable', 'message': 'Database upgrade pending'}), 503
+            _schema_checked = True
+    return None
+
+
+@app.cli.command('db-upgrade')
+def db_upgrade_command():
+    """Apply pending schema migrations."""
+    applied = upgrade(db.engine, metadata=db.metadata)
+    print(f"Applied migrations: {applied}" if applied else "Database is up to date")
+    print(f"Schema version: {current_version(db.engine)} (latest {MIGRATIONS[-1][0]})")
+
+
+@app.cli.command('purge-audit')
+def purge_audit_command():
+    """Delete audit entries older than AUDIT_RETENTION_DAYS, in small chunks."""
+    check_schema(db.engine, db.metadata, auto_upgrade=app.config['DB_AUTO_UPGRADE'])
+    days = app.config['AUDIT_RETENTION_DAYS']
+    if not days:
+        print('AUDIT_RETENTION_DAYS is 0: audit entries are kept forever')
+        return
+    deleted = purge_audit_entries(db.engine, days, app.config['AUDIT_PURGE_CHUNK_SIZE'])
+    print(f'{deleted} audit entries older than {days} days purged')
+
+
+@app.cli.command('repair-enrolled-counts')
+def repair_enrolled_counts_command():
+    """Recompute lab_groups.enrolled_count from rel_group_student."""
+    check_schema(db.engine, db.metadata, auto_upgrade=app.config['DB_AUTO_UPGRADE'])
+    drifted = repair_enrolled_counts()
+    db.session.commit()
+    for group_id, (stored, actual) in sorted(drifted.items()):
+        print(f'  group {group_id}: {stored} -> {actual}')
+    print(f'{len(drifted)} group counts repaired' if drifted else 'All group counts are correct')
+
+@app.cli.command('allocate-preferences')
+def allocate_preferences_command():
+    """Allocate every preference-mode lab whose reg_limit has passed (run daily from cron)."""
+    from datetime import date
+    from sqlalchemy import select
+    from models import CourseLab, GroupPreference
+    from allocation import allocate_lab
+
+    check_schema(db.engine, db.metadata, auto_upgrade=app.config['DB_AUTO_UPGRADE'])
+    due = db.session.scalars(
+        select(CourseLab.lab_id).where(
+            CourseLab.allocation == 'preferences', CourseLab.reg_limit < date.today(),
+            select(GroupPreference.am).where(GroupPreference.lab_id == CourseLab.lab_id).exists()
+        ).order_by(CourseLab.lab_id)
+    ).all()
+    for lab_id in due:
+        allocation, statuses = allocate_lab(lab_id)
+        enrolled = sum(1 for status in statuses.values() if status == 'added')
+        print(f'  lab {lab_id}: {enrolled} enrolled, {len(allocation.unassigned)} without a seat')
+        # Their preferences are kept; the next run tries them again
+        for am in allocation.unassigned:
+            print(f'    {am}: no seat left')
+        for am, status in sorted(statuses.items()):
+            if status != 'added':
+                print(f'    {am}: {status}')
+    print(f'{len(due)} labs allocated' if due else 'No labs are due for allocation')
+
+@app.cli.command('close-waitlists')
+def close_waitlists_command():
+    """Delete the waitlists of labs whose reg_limit has passed (run daily from cron)."""
+    check_schema(db.engine, db.metadata, auto_upgrade=app.config['DB_AUTO_UPGRADE'])
+    closed = close_waitlists()
+    for group_id, ams in sorted(closed.items()):
+        print(f'  group {group_id}: {len(ams)} waiting students dropped')
+    print(f'{len(closed)} waitlists closed' if closed else 'No waitlists to close')
 
 # =============================================================================
 # BABEL / i18n
@@ -42,6 +174,9 @@ def inject_common_vars():
         'current_language': session.get('language', 'el'),
     }
 
+# Dates are stored as DATE; templates show them as dd/mm/yyyy
+app.add_template_filter(format_date, 'date')
+
 # =============================================================================
 # PREVENT BROWSER CACHING OF AUTHENTICATED PAGES
 # =============================================================================
@@ -84,6 +219,9 @@ app.register_blueprint(auth_bp)
 app.register_blueprint(views_bp)
 app.register_blueprint(api_bp)
 
+# Resolve every route's allowed roles now so matrix typos fail at startup
+init_route_permissions(app)
+
 # =============================================================================
 # MAIN
 # =============================================================================
@@ -0,0 +1,310 @@
+"""
+Background writer for the audit trail.
+
+auth.audit_log() only builds the entry dict and puts it on a queue. A daemon
+thread drains the queue, serialises the entries and hands them in batches to
+its sinks: a size-rotated JSONL file and the indexed audit_log table. A batch
+is written when it reaches AUDIT_BATCH_SIZE entries or AUDIT_FLUSH_INTERVAL
+seconds after its first entry, whichever comes first.
+
+Entries are never dropped: a full queue blocks the caller, a failing sink is
+retried a few times and then the batch is spilled to the process log, rotated
+files are archived rather than deleted, and close() (registered with atexit)
+drains everything that was submitted before returning.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from models import db, AuditEntry
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class JsonlFileSink:
+    """
+    Append JSON lines to a file, rotating it like RotatingFileHandler into
+    path.1 .. path.N (N = backup_count). The file that would fall off the end
+    is renamed to path.<timestamp> instead of being deleted; prune those
+    archives with the host's log retention. backup_count=0 never rotates.
+    """
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backup_count=5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _archive(self, src):
+        stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+        dst, n = f"{self.path}.{stamp}", 1
+        while os.path.exists(dst):
+            n += 1
+            dst = f"{self.path}.{stamp}-{n}"
+        os.replace(src, dst)
+
+    def _rotate(self):
+        oldest = f"{self.path}.{self.backup_count}"
+        if os.path.exists(oldest):
+            self._archive(oldest)
+        for i in range(self.backup_count - 1, 0, -1):
+            src, dst = f"{self.path}.{i}", f"{self.path}.{i + 1}"
+            if os.path.exists(src):
+                os.replace(src, dst)
+        os.replace(self.path, f"{self.path}.1")
+
+    def write(self, entries):
+        data = ''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in entries).encode('utf-8')
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            size = 0
+        if size and self.max_bytes and self.backup_count > 0 and size + len(data) > self.max_bytes:
+            self._rotate()
+        with open(self.path, 'ab') as f:
+            f.write(data)
+            f.flush()
+
+
+def purge_audit_entries(engine, retention_days, chunk_size=5000, pause=0.05):
+    """
+    Delete audit entries older than retention_days, chunk_size rows per
+    transaction, sleeping between chunks so request writers can take the lock.
+    Returns the number of rows deleted.
+    """
+    cutoff = datetime.now() - timedelta(days=retention_days)
+    table = AuditEntry.__table__
+    oldest = (select(table.c.id)
+              .where(table.c.timestamp < cutoff)
+              .order_by(table.c.timestamp, table.c.id)
+              .limit(chunk_size))
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            deleted = conn.execute(table.delete().where(table.c.id.in_(oldest))).rowcount
+        total += deleted
+        if deleted < chunk_size:
+            break
+        time.sleep(pause)
+    if total:
+        logger.info(f"Purged {total} audit entries older than {cutoff:%Y-%m-%d}")
+    return total
+
+
+class DatabaseSink:
+    """Insert entries into the audit_log table, one transaction per batch."""
+
+    _COLUMNS = ('user_id', 'user_role', 'action', 'target_type', 'target_id',
+                'ip_address', 'old_value', 'new_value', 'reason')
+
+    def __init__(self, engine, retention_days=0, purge_interval=6 * 3600, purge_chunk_size=5000):
+        self.engine = engine
+        self.retention_days = retention_days
+        self.purge_interval = purge_interval
+        self.purge_chunk_size = purge_chunk_size
+        self._next_purge = time.monotonic()
+
+    def _row(self, entry):
+        row = {c: entry.get(c) for c in self._COLUMNS}
+        for c in ('old_value', 'new_value'):
+            if row[c] is not None and not isinstance(row[c], str):
+                row[c] = json.dumps(row[c], ensure_ascii=False, default=str)
+        row['user_id'] = str(row['user_id']) if row['user_id'] is not None else 'unknown'
+        row['user_role'] = row['user_role'] or 'unknown'
+        row['timestamp'] = datetime.fromisoformat(entry['timestamp'])
+        return row
+
+    def write(self, entries):
+        with self.engine.begin() as conn:
+            conn.execute(AuditEntry.__table__.insert(), [self._row(e) for e in entries])
+
+        if self.retention_days and time.monotonic() >= self._next_purge:
+            self._next_purge = time.monotonic() + self.purge_interval
+            try:
+                purge_audit_entries(self.engine, self.retention_days, self.purge_chunk_size)
+            except Exception as e:
+                logger.error(f"Audit retention purge failed: {e}")
+
+
+class AuditWriter:
+    """Queue-backed batching writer thread for audit entries."""
+
+    def __init__(self, sinks, batch_size=200, flush_interval=1.0,
+                 queue_size=100000, retry_delay=0.5, max_attempts=3):
+        self.sinks = list(sinks)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._batch_ready = threading.Event()
+        self._thread = None
+        self._closed = False
+        self.written = 0
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if not self.running:
+            self._closed = False
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, entry):
+        """Queue one entry; blocks rather than dropping when the queue is full."""
+        if self._closed:
+            return False
+        self._queue.put(entry)
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+        return True
+
+    def write_now(self, entries):
+        """Synchronous path used when the thread is disabled: one attempt per sink."""
+        for sink in self.sinks:
+            try:
+                sink.write(entries)
+            except Exception as e:
+                logger.error(f"Audit sink {type(sink).__name__} failed: {e}")
+                for entry in entries:
+                    logger.error(f"AUDIT: {json.dumps(entry, ensure_ascii=False)}")
+        self.written += len(entries)
+
+    def flush(self):
+        """Block until every entry submitted so far has been written."""
+        self._batch_ready.set()
+        self._queue.join()
+
+    def close(self, timeout=None):
+        """Write everything still queued and stop the thread."""
+        if not self.running or self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._batch_ready.set()
+        self._thread.join(timeout)
+
+    def _write(self, batch):
+        for sink in self.sinks:
+            attempts = 0
+            while True:
+                try:
+                    sink.write(batch)
+                    break
+                except Exception as e:
+                    attempts += 1
+                    logger.error(f"Audit sink {type(sink).__name__} failed (attempt {attempts}): {e}")
+                    if attempts >= self.max_attempts:
+                        # Keep the entries in the process log rather than stall the
+                        # queue (and with it every request that audits) on a dead sink
+                        for entry in batch:
+                            logger.error(f"AUDIT: {json.dumps(entry, ensure_ascii=False)}")
+                        break
+                    time.sleep(self.retry_delay)
+        self.written += len(batch)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                self._queue.task_done()
+                break
+            batch = [item]
+
+            # Sleep until the batch is full or the flush interval elapses,
+            # instead of waking up for every submitted entry
+            if self._queue.qsize() < self.batch_size - 1 and not self._closed:
+                self._batch_ready.wait(self.flush_interval)
+            self._batch_ready.clear()
+
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+
+_writer = None
+
+
+def init_audit(app):
+    """Build the audit sinks from the AUDIT_* app config and start the writer."""
+    global _writer
+    shutdown_audit()
+
+    sinks = [JsonlFileSink(
+        app.config['AUDIT_LOG_PATH'],
+        max_bytes=app.config.get('AUDIT_LOG_MAX_BYTES', 10 * 1024 * 1024),
+        backup_count=app.config.get('AUDIT_LOG_BACKUP_COUNT', 5)
+    )]
+    if app.config.get('AUDIT_LOG_DB', True):
+        with app.app_context():
+            engine = db.engine
+        sinks.append(DatabaseSink(
+            engine,
+            retention_days=app.config.get('AUDIT_RETENTION_DAYS', 0),
+            purge_chunk_size=app.config.get('AUDIT_PURGE_CHUNK_SIZE', 5000)
+        ))
+
+    _writer = AuditWriter(
+        sinks,
+        batch_size=app.config.get('AUDIT_BATCH_SIZE', 200),
+        flush_interval=app.config.get('AUDIT_FLUSH_INTERVAL', 1.0)
+    )
+    if app.config.get('AUDIT_LOG_ASYNC', True):
+        _writer.start()
+    return _writer
+
+
+def shutdown_audit():
+    """Drain and stop the running writer, if any."""
+    global _writer
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+
+
+def submit(entry):
+    """
+    Hand an entry to the writer: queued when its thread runs, written inline
+    otherwise. Returns False if audit output was never configured.
+    """
+    writer = _writer
+    if writer is None:
+        return False
+    if writer.running:
+        return writer.submit(entry)
+    writer.write_now([entry])
+    return True
+
+
+def flush():
+    if _writer is not None:
+        _writer.flush()
+
+
+atexit.register(shutdown_audit)
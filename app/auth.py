@@ -1,10 +1,17 @@
 import json
 import functools
 import os
+import threading
+import time
 from flask import session, abort, request, flash, redirect, url_for
-from models import db, Student, Professor, RelGroupStudent, LabGroup, CourseLab, RelLabStudent, RelLabGroup, StudentMissesPerGroup, Coursename, RelCourseLab
-from sqlalchemy import and_
+from models import db, Student, Professor, RelGroupStudent, LabGroup, CourseLab, RelLabStudent, RelLabGroup, StudentAbsence, Coursename, RelCourseLab, GroupWaitlist
+from sqlalchemy import and_, delete, func, insert, select, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from cache import TTLCache
+from waitlist import waitlists
+import audit
 import logging
+from collections import Counter, namedtuple
 from datetime import datetime
 
 # Configure logging for audit
@@ -22,31 +29,186 @@ STATUS_COMPLETED = "Ολοκληρωμένο"
 # PERMISSION MATRIX
 # =============================================================================
 
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+MATRIX_FILE = os.path.join(APP_DIR, 'templates', 'permission_matrix.json')
+TEST_MATRIX_FILE = 'test_permission_matrix.json'
+
+# Minimum seconds between two mtime checks of the matrix file
+MATRIX_RELOAD_INTERVAL = 2.0
+
+
+def _resolve_matrix_file():
+    """A test_permission_matrix.json in the working directory overrides the bundled matrix."""
+    return TEST_MATRIX_FILE if os.path.exists(TEST_MATRIX_FILE) else MATRIX_FILE
+
+
+class PermissionConfigError(ValueError):
+    """A decorated route refers to a resource, action or role missing from the matrix."""
+
+
+class RoutePermission:
+    """
+    Access rule of one decorated view: either a (resource, action) pair from
+    the matrix or an explicit role list. `roles` holds the resolved allowed
+    set and is kept current by the engine across matrix reloads.
+    """
+    __slots__ = ('resource', 'action', 'required_roles', 'endpoint', 'roles')
+
+    def __init__(self, endpoint, resource=None, action=None, required_roles=None):
+        self.endpoint = endpoint
+        self.resource = resource
+        self.action = action
+        self.required_roles = frozenset(required_roles) if required_roles is not None else None
+        self.roles = None
+
+    @property
+    def permission(self):
+        return f"{self.resource}.{self.action}" if self.resource else None
+
+
+class PermissionEngine:
+    """
+    Process-wide compiled form of permission_matrix.json.
+
+    Every role gets one bit and every (resource, action) pair the OR of the
+    bits of its allowed roles, so a check is two dict lookups and an AND.
+    The file is re-read only when its mtime changes, and its mtime is looked
+    at no more than once per reload_interval seconds.
+    """
+
+    def __init__(self, matrix_file=None, reload_interval=MATRIX_RELOAD_INTERVAL):
+        self.matrix_file = matrix_file or _resolve_matrix_file()
+        self.reload_interval = reload_interval
+        self.matrix = {}
+        self.role_bits = {}
+        self.masks = {}
+        self.version = 0
+        self._mtime = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._route_permissions = []
+        self.reload()
+
+    @staticmethod
+    def compile(matrix):
+        """Turn the JSON matrix into ({role: bit}, {(resource, action): mask})."""
+        role_bits = {role: 1 << i for i, role in enumerate(matrix['roles'])}
+        masks = {}
+        for resource, actions in matrix['resources'].items():
+            for action, roles in actions.items():
+                if not isinstance(roles, list):
+                    continue  # free-text entries such as "notes"
+                mask = 0
+                for role in roles:
+                    mask |= role_bits.get(role, 0)
+                masks[(resource, action)] = mask
+        return role_bits, masks
+
+    @staticmethod
+    def _allowed_roles(role_bits, masks, rp):
+        if rp.resource is None:
+            unknown = rp.required_roles - role_bits.keys()
+            if unknown:
+                raise PermissionConfigError(
+                    f"Unknown role(s) {sorted(unknown)} required by {rp.endpoint}")
+            return rp.required_roles
+        mask = masks.get((rp.resource, rp.action))
+        if mask is None:
+            raise PermissionConfigError(
+                f"Unknown permission {rp.permission} required by {rp.endpoint}")
+        return frozenset(role for role, bit in role_bits.items() if mask & bit)
+
+    def bind(self, rp):
+        """Resolve a route's allowed roles now and keep them updated on reload."""
+        with self._lock:
+            rp.roles = self._allowed_roles(self.role_bits, self.masks, rp)
+            self._route_permissions.append(rp)
+        return rp.roles
+
+    def reload(self):
+        """Load and compile the matrix file. Keeps the previous table on a bad edit."""
+        with self._lock:
+            try:
+                mtime = os.stat(self.matrix_file).st_mtime_ns
+                with open(self.matrix_file, 'r', encoding='utf-8') as f:
+                    matrix = json.load(f)
+                role_bits, masks = self.compile(matrix)
+                resolved = [self._allowed_roles(role_bits, masks, rp) for rp in self._route_permissions]
+            except (OSError, ValueError, KeyError) as e:
+                if not self.masks:
+                    raise
+                logger.error(f"Permission matrix reload failed, keeping previous version: {e}")
+                return False
+
+            self.matrix, self.role_bits, self.masks = matrix, role_bits, masks
+            for rp, roles in zip(self._route_permissions, resolved):
+                rp.roles = roles
+            self._mtime = mtime
+            self.version += 1
+            logger.info(f"Permission matrix loaded from {self.matrix_file} (version {self.version})")
+            return True
+
+    def refresh(self):
+        """Reload the matrix if the file changed since the last check."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.reload_interval
+        try:
+            mtime = os.stat(self.matrix_file).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._mtime:
+            self.reload()
+
+    def has_permission(self, role, resource, action):
+        """Check if role has permission for resource.action"""
+        self.refresh()
+        return bool(self.masks.get((resource, action), 0) & self.role_bits.get(role, 0))
+
+
+permission_engine = PermissionEngine()
+
+
+# user_id -> role for sessions that carry an id but no role
+ROLE_CACHE_SIZE = 4096
+ROLE_CACHE_TTL = 300
+_role_cache = TTLCache('user_roles', maxsize=ROLE_CACHE_SIZE, ttl=ROLE_CACHE_TTL)
+
+
+def invalidate_user_role(user_id):
+    """Drop the cached role of a user after a professor/student is created or deleted."""
+    _role_cache.invalidate(str(user_id))
+
+
 class PermissionMatrix:
-    def __init__(self):
-        matrix_file = 'test_permission_matrix.json' if os.path.exists('test_permission_matrix.json') else 'templates/permission_matrix.json'
-        with open(matrix_file, 'r', encoding='utf-8') as f:
-            self.matrix = json.load(f)
-    
+    """Thin view over the shared PermissionEngine; constructing it does no file I/O."""
+
+    def __init__(self, engine=None):
+        self.engine = engine or permission_engine
+
+    @property
+    def matrix(self):
+        return self.engine.matrix
+
     def has_permission(self, role, resource, action):
         """Check if role has permission for resource.action"""
-        if role not in self.matrix['roles']:
-            return False
-        
-        if resource not in self.matrix['resources']:
-            return False
-        
-        resource_config = self.matrix['resources'][resource]
-        if action not in resource_config:
-            return False
-        
-        return role in resource_config[action]
+        return self.engine.has_permission(role, resource, action)
     
     def get_user_role(self, user_id):
-        """Get user role from session or database"""
+        """Get user role from session, the role cache or the database"""
         if 'role' in session:
             return session['role']
         
+        key = str(user_id)
+        role = _role_cache.get(key)
+        if role is None:
+            role = self._lookup_user_role(user_id)
+            _role_cache.set(key, role)
+        return role
+
+    @staticmethod
+    def _lookup_user_role(user_id):
         prof = Professor.query.filter_by(prof_id=user_id).first()
         if prof:
             return 'professor'
@@ -57,6 +219,9 @@ class PermissionMatrix:
         
         return 'guest'
 
+
+permission_matrix = PermissionMatrix()
+
 # =============================================================================
 # DECORATORS
 # =============================================================================
@@ -66,19 +231,41 @@ def _is_api_request():
     return request.path.startswith('/api/')
 
 
+def _session_role():
+    """Role of the current session, falling back to a lookup when only the id is set."""
+    if 'schGrAcPersonID' not in session:
+        return 'guest'
+    role = session.get('role')
+    if role is None:
+        role = permission_matrix.get_user_role(session['schGrAcPersonID'])
+    return role
+
+
+def init_route_permissions(app):
+    """
+    Resolve the allowed-role set of every decorated view registered on the app.
+    Call after the blueprints are registered; raises PermissionConfigError on
+    any resource, action or role the matrix does not define.
+    """
+    for endpoint, view in app.view_functions.items():
+        rp = getattr(view, 'route_permission', None)
+        if rp is not None and rp.roles is None:
+            rp.endpoint = endpoint
+            permission_engine.bind(rp)
+
+
 def require_permission(resource, action):
     """Decorator for requiring specific permission"""
     def decorator(f):
+        rp = RoutePermission(f.__qualname__, resource=resource, action=action)
+
         @functools.wraps(f)
         def decorated_function(*args, **kwargs):
-            matrix = PermissionMatrix()
-            if 'schGrAcPersonID' in session:
-                user_id = session['schGrAcPersonID']
-                role = matrix.get_user_role(user_id)
-            else:
-                role = 'guest'
+            permission_engine.refresh()
+            allowed = rp.roles if rp.roles is not None else permission_engine.bind(rp)
+            role = _session_role()
             
-            if not matrix.has_permission(role, resource, action):
+            if role not in allowed:
                 logger.warning(f"Permission denied: {role} tried to access {resource}.{action}")
                 if _is_api_request():
                     abort(403, description="Insufficient permissions")
@@ -89,12 +276,15 @@ def require_permission(resource, action):
                 return redirect(url_for('views_bp.dashboard'))
             
             return f(*args, **kwargs)
+        decorated_function.route_permission = rp
         return decorated_function
     return decorator
 
 def require_role(*roles):
     """Decorator for requiring specific role(s)"""
     def decorator(f):
+        rp = RoutePermission(f.__qualname__, required_roles=roles)
+
         @functools.wraps(f)
         def decorated_function(*args, **kwargs):
             if 'schGrAcPersonID' not in session:
@@ -104,7 +294,7 @@ def require_role(*roles):
                 return redirect(url_for('auth_bp.login'))
             
             user_role = session.get('role', 'guest')
-            if user_role not in roles:
+            if user_role not in rp.required_roles:
                 logger.warning(f"Role denied: {user_role} tried to access endpoint requiring {roles}")
                 if _is_api_request():
                     abort(403, description="Insufficient role permissions")
@@ -112,6 +302,7 @@ def require_role(*roles):
                 return redirect(url_for('views_bp.dashboard'))
             
             return f(*args, **kwargs)
+        decorated_function.route_permission = rp
         return decorated_function
     return decorator
 
@@ -119,23 +310,31 @@ def require_role(*roles):
 # UTILITY FUNCTIONS
 # =============================================================================
 
-def audit_log(action, old_value=None, new_value=None, reason=None):
-    """Log audit trail for critical actions"""
+def audit_log(action, old_value=None, new_value=None, reason=None, target=None):
+    """
+    Log audit trail for critical actions.
+    target: optional (entity_type, entity_id) the action applies to, e.g. ('student', am)
+    """
     user_id = session.get('schGrAcPersonID', 'unknown')
     user_role = session.get('role', 'unknown')
+    target_type, target_id = target if target else (None, None)
     
     log_entry = {
         'timestamp': datetime.now().isoformat(),
         'user_id': user_id,
         'user_role': user_role,
         'action': action,
+        'target_type': target_type,
+        'target_id': str(target_id) if target_id is not None else None,
         'ip_address': request.remote_addr if request else 'unknown',
         'old_value': old_value,
         'new_value': new_value,
         'reason': reason
     }
     
-    logger.info(f"AUDIT: {json.dumps(log_entry, ensure_ascii=False)}")
+    # Serialisation and I/O happen on the background writer when it is running
+    if not audit.submit(log_entry):
+        logger.info(f"AUDIT: {json.dumps(log_entry, ensure_ascii=False)}")
 
 def mask_pii(data, fields_to_mask=['email', 'am', 'tel']):
     """Mask PII fields in public views"""
@@ -170,39 +369,95 @@ def get_academic_year():
 # REGISTRATION VALIDATION FUNCTIONS
 # =============================================================================
 
+# Seconds before the deadline index reloads; covers edits made by other workers
+REG_DEADLINE_REFRESH = 60.0
+# Unknown lab_ids remembered between loads
+REG_DEADLINE_MAX_MISSING = 10000
+
+
+class DeadlineIndex:
+    """
+    In-process lab_id -> registration deadline map, loaded with one query.
+
+    Registration checks become a dict lookup and a date comparison. Admin lab
+    edits call invalidate(); an unknown lab_id triggers one reload so labs
+    created by another worker are picked up before the refresh interval. A
+    lab_id still unknown after that reload is remembered as missing until the
+    next load, so bogus ids cannot force a reload on every request.
+    """
+
+    def __init__(self, refresh=REG_DEADLINE_REFRESH, max_missing=REG_DEADLINE_MAX_MISSING):
+        self.refresh = refresh
+        self.max_missing = max_missing
+        self._deadlines = None
+        self._missing = set()
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        rows = db.session.query(CourseLab.lab_id, CourseLab.reg_limit).all()
+        self._deadlines = dict(rows)
+        self._missing = set()
+        self._loaded_at = time.monotonic()
+
+    def _current(self, force=False):
+        with self._lock:
+            if force or self._deadlines is None or time.monotonic() - self._loaded_at > self.refresh:
+                self._load()
+            return self._deadlines
+
+    def lookup(self, lab_id):
+        """Return (found, deadline); deadline is None for labs without one."""
+        deadlines = self._current()
+        if lab_id not in deadlines:
+            if lab_id in self._missing:
+                return False, None
+            deadlines = self._current(force=True)
+            if lab_id not in deadlines:
+                with self._lock:
+                    if len(self._missing) < self.max_missing:
+                        self._missing.add(lab_id)
+                return False, None
+        return True, deadlines[lab_id]
+
+    def invalidate(self):
+        with self._lock:
+            self._deadlines = None
+            self._missing = set()
+
+
+registration_deadlines = DeadlineIndex()
+
+
 def validate_registration_period(lab_id):
     """
     Έλεγχος αν η εγγραφή είναι εντός της επιτρεπόμενης περιόδου.
     
     Returns: (bool, str) - (is_valid, message)
     """
-    lab = CourseLab.query.get(lab_id)
-    if not lab:
+    found, reg_limit = registration_deadlines.lookup(lab_id)
+    if not found:
         return False, "Το εργαστήριο δεν βρέθηκε"
     
-    if not lab.reg_limit:
+    if reg_limit is None:
         return True, "Δεν υπάρχει όριο εγγραφών"
     
-    try:
-        reg_limit_date = datetime.strptime(lab.reg_limit, "%d/%m/%Y").date()
-        today = datetime.now().date()
-        
-        if today > reg_limit_date:
-            return False, "Δεν επιτρέπεται η αλλαγή / εγγραφή σε τμήμα."
-        
-        return True, f"Εγγραφές έως {lab.reg_limit}"
-    except ValueError:
-        try:
-            reg_limit_date = datetime.strptime(lab.reg_limit, "%Y-%m-%d").date()
-            today = datetime.now().date()
-            
-            if today > reg_limit_date:
-                return False, "Δεν επιτρέπεται η αλλαγή / εγγραφή σε τμήμα."
-            
-            return True, f"Εγγραφές έως {lab.reg_limit}"
-        except ValueError:
-            logger.warning(f"Could not parse reg_limit: {lab.reg_limit}")
-            return True, "Μη έγκυρη ημερομηνία ορίου"
+    if datetime.now().date() > reg_limit:
+        return False, "Δεν επιτρέπεται η αλλαγή / εγγραφή σε τμήμα."
+    
+    return True, f"Εγγραφές έως {format_date(reg_limit)}"
+
+def check_first_come_allocation(lab_id):
+    """
+    Labs in 'preferences' mode are allocated from ranked preferences, so no
+    entry point may take a seat in them directly.
+    
+    Returns: (bool, str) - (is_allowed, message)
+    """
+    allocation = db.session.scalar(select(CourseLab.allocation).where(CourseLab.lab_id == lab_id))
+    if allocation == 'preferences':
+        return False, "Η εγγραφή σε αυτό το εργαστήριο γίνεται με δήλωση προτιμήσεων τμημάτων."
+    return True, ""
 
 def check_group_capacity(group_id, lab_id):
     """
@@ -210,12 +465,12 @@ def check_group_capacity(group_id, lab_id):
     
     Returns: (bool, str, dict) - (has_space, message, occupancy_info)
     """
-    current_count = RelGroupStudent.query.filter_by(group_id=group_id).count()
-    
-    lab = CourseLab.query.get(lab_id)
+    lab = db.session.get(CourseLab, lab_id)
     if not lab:
         return False, "Το εργαστήριο δεν βρέθηκε", {}
     
+    group = db.session.get(LabGroup, group_id)
+    current_count = group.enrolled_count if group else 0
     max_users = lab.maxusers
     available = max_users - current_count
     
@@ -281,10 +536,119 @@ def check_existing_enrollment(student_am, lab_id, group_id, academic_year):
     
     return 'none', "Νέα εγγραφή σε τμήμα"
 
+# =============================================================================
+# ENROLLED COUNTS
+# =============================================================================
+
+def adjust_enrolled_count(group_id, delta):
+    """
+    Add delta to lab_groups.enrolled_count in the current transaction.
+
+    Every insert or delete of a rel_group_student row must be paired with a
+    call, so the counter commits or rolls back together with the enrollment.
+    """
+    db.session.execute(
+        update(LabGroup)
+        .where(LabGroup.group_id == group_id)
+        .values(enrolled_count=LabGroup.enrolled_count + delta)
+    )
+
+def begin_write_transaction():
+    """
+    Commit the session's read transaction and start one holding SQLite's
+    write lock (BEGIN IMMEDIATE). Enrollment checks made after this call
+    cannot be invalidated by another writer before our commit.
+    """
+    db.session.commit()
+    if db.engine.dialect.name == 'sqlite':
+        db.session.execute(text('BEGIN IMMEDIATE'))
+
+def reserve_seat(group_id, lab_id):
+    """
+    Take one seat in a group if it is below the lab's maxusers, as a single
+    conditional UPDATE. Returns False when the group is full (or unknown).
+    """
+    max_users = select(CourseLab.maxusers).where(CourseLab.lab_id == lab_id).scalar_subquery()
+    result = db.session.execute(
+        update(LabGroup)
+        .where(LabGroup.group_id == group_id, LabGroup.enrolled_count < max_users)
+        .values(enrolled_count=LabGroup.enrolled_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+def repair_enrolled_counts():
+    """
+    Recompute enrolled_count from rel_group_student where it has drifted
+    (e.g. after raw SQL imports). Returns {group_id: (stored, actual)}; the
+    caller commits.
+    """
+    actual = select(func.count()).where(
+        RelGroupStudent.group_id == LabGroup.group_id
+    ).correlate(LabGroup).scalar_subquery()
+    drifted = db.session.query(
+        LabGroup.group_id, LabGroup.enrolled_count, actual
+    ).filter(LabGroup.enrolled_count != actual).all()
+    
+    for group_id, stored, count in drifted:
+        db.session.execute(
+            update(LabGroup).where(LabGroup.group_id == group_id).values(enrolled_count=count)
+        )
+        logger.warning(f"Group {group_id}: enrolled_count {stored} corrected to {count}")
+    return {group_id: (stored, count) for group_id, stored, count in drifted}
+
 # =============================================================================
 # MAIN REGISTRATION FUNCTIONS
 # =============================================================================
 
+def _create_enrollment(student_am, lab_id, group_id, enrollment_type):
+    """
+    Add the lab row (or reopen a failed one) and the group row of a new
+    enrollment. The seat must already be reserved; the caller commits.
+    """
+    if enrollment_type == 'failed':
+        lab_enrollment = RelLabStudent.query.filter_by(am=student_am, lab_id=lab_id).first()
+        old_failures = lab_enrollment.misses if hasattr(lab_enrollment, 'misses') else 0
+        
+        lab_enrollment.status = STATUS_IN_PROGRESS
+        lab_enrollment.misses = old_failures + 1
+        lab_enrollment.reg_month = datetime.now().month
+        lab_enrollment.reg_year = datetime.now().year
+        
+        audit_log(
+            'lab_reregistration',
+            old_value=f"Status: {STATUS_FAILED}, Failures: {old_failures}",
+            new_value=f"Status: {STATUS_IN_PROGRESS}, Failures: {old_failures + 1}",
+            reason="Student re-registered after failure",
+            target=('student', student_am)
+        )
+    else:
+        new_lab_enrollment = RelLabStudent(
+            am=student_am,
+            lab_id=lab_id,
+            misses=0,
+            grade=0,
+            reg_month=datetime.now().month,
+            reg_year=datetime.now().year,
+            status=STATUS_IN_PROGRESS
+        )
+        db.session.add(new_lab_enrollment)
+        
+        audit_log(
+            'lab_registration_created',
+            new_value=f"Student {student_am} registered to lab {lab_id}",
+            reason="New lab registration",
+            target=('student', student_am)
+        )
+    
+    new_group_enrollment = RelGroupStudent(
+        am=student_am,
+        group_id=group_id,
+        group_reg_daymonth=f"{datetime.now().day}/{datetime.now().month}",
+        group_reg_year=datetime.now().year
+    )
+    db.session.add(new_group_enrollment)
+
 def register_student_to_lab(student_am, lab_id, group_id):
     """
     Πλήρης εγγραφή φοιτητή σε εργαστήριο και τμήμα.
@@ -297,68 +661,48 @@ def register_student_to_lab(student_am, lab_id, group_id):
     if not period_valid:
         return False, period_msg, {'error_type': 'registration_closed'}
     
+    allowed, allocation_msg = check_first_come_allocation(lab_id)
+    if not allowed:
+        return False, allocation_msg, {'error_type': 'preferences_only'}
+    
+    # Unlocked pre-check: full groups are turned away without queueing for the lock
     has_space, capacity_msg, occupancy = check_group_capacity(group_id, lab_id)
     if not has_space:
         return False, capacity_msg, {'error_type': 'group_full', 'occupancy': occupancy}
     
-    enrollment_type, enrollment_msg = check_existing_enrollment(
-        student_am, lab_id, group_id, academic_year
-    )
-    
     try:
+        begin_write_transaction()
+        
+        enrollment_type, enrollment_msg = check_existing_enrollment(
+            student_am, lab_id, group_id, academic_year
+        )
+        
         if enrollment_type == 'same_group':
+            db.session.rollback()
             return False, enrollment_msg, {'error_type': 'already_enrolled'}
         
         if enrollment_type == 'different_group':
+            db.session.rollback()
             return False, "Χρησιμοποιήστε την αλλαγή τμήματος", {'error_type': 'use_change_group'}
         
-        if enrollment_type == 'failed':
-            lab_enrollment = RelLabStudent.query.filter_by(am=student_am, lab_id=lab_id).first()
-            old_failures = lab_enrollment.misses if hasattr(lab_enrollment, 'misses') else 0
-            
-            lab_enrollment.status = STATUS_IN_PROGRESS
-            lab_enrollment.misses = old_failures + 1
-            lab_enrollment.reg_month = datetime.now().month
-            lab_enrollment.reg_year = datetime.now().year
-            
-            audit_log(
-                'lab_reregistration',
-                old_value=f"Status: {STATUS_FAILED}, Failures: {old_failures}",
-                new_value=f"Status: {STATUS_IN_PROGRESS}, Failures: {old_failures + 1}",
-                reason="Student re-registered after failure"
-            )
-        else:
-            new_lab_enrollment = RelLabStudent(
-                am=student_am,
-                lab_id=lab_id,
-                misses=0,
-                grade=0,
-                reg_month=datetime.now().month,
-                reg_year=datetime.now().year,
-                status=STATUS_IN_PROGRESS
-            )
-            db.session.add(new_lab_enrollment)
-            
-            audit_log(
-                'lab_registration_created',
-                new_value=f"Student {student_am} registered to lab {lab_id}",
-                reason="New lab registration"
-            )
+        if not reserve_seat(group_id, lab_id):
+            db.session.rollback()
+            _, _, occupancy = check_group_capacity(group_id, lab_id)
+            return False, "Το τμήμα δεν έχει ανοιχτές θέσεις", {'error_type': 'group_full', 'occupancy': occupancy}
         
-        new_group_enrollment = RelGroupStudent(
-            am=student_am,
-            group_id=group_id,
-            group_reg_daymonth=f"{datetime.now().day}/{datetime.now().month}",
-            group_reg_year=datetime.now().year
-        )
-        db.session.add(new_group_enrollment)
+        _create_enrollment(student_am, lab_id, group_id, enrollment_type)
+        left_waitlist = _drop_lab_waitlist_entry(student_am, lab_id)
         
         db.session.commit()
+        invalidate_student_enrollments(student_am)
+        if left_waitlist is not None:
+            waitlists.removed(left_waitlist, student_am)
         
         audit_log(
             'group_enrollment_created',
             new_value=f"Student {student_am} enrolled in group {group_id}",
-            reason="Registration completed"
+            reason="Registration completed",
+            target=('student', student_am)
         )
         
         return True, "Η εγγραφή ολοκληρώθηκε επιτυχώς!", {
@@ -382,31 +726,48 @@ def change_student_group(student_am, old_group_id, new_group_id, lab_id):
     if not period_valid:
         return False, period_msg, {'error_type': 'registration_closed'}
     
+    allowed, allocation_msg = check_first_come_allocation(lab_id)
+    if not allowed:
+        return False, allocation_msg, {'error_type': 'preferences_only'}
+    
     has_space, capacity_msg, occupancy = check_group_capacity(new_group_id, lab_id)
     if not has_space:
         return False, capacity_msg, {'error_type': 'group_full', 'occupancy': occupancy}
     
-    existing_enrollment = RelGroupStudent.query.filter_by(
-        am=student_am, group_id=old_group_id
-    ).first()
-    
-    if not existing_enrollment:
-        return False, "Δεν είστε εγγεγραμμένος στο τρέχον τμήμα", {'error_type': 'not_enrolled'}
-    
-    logger.info(f"Changing group for student {student_am} from {old_group_id} to {new_group_id}")
-    
     try:
+        begin_write_transaction()
+        
+        existing_enrollment = RelGroupStudent.query.filter_by(
+            am=student_am, group_id=old_group_id
+        ).first()
+        
+        if not existing_enrollment:
+            db.session.rollback()
+            return False, "Δεν είστε εγγεγραμμένος στο τρέχον τμήμα", {'error_type': 'not_enrolled'}
+        
+        if not reserve_seat(new_group_id, lab_id):
+            db.session.rollback()
+            _, _, occupancy = check_group_capacity(new_group_id, lab_id)
+            return False, "Το τμήμα δεν έχει ανοιχτές θέσεις", {'error_type': 'group_full', 'occupancy': occupancy}
+        
+        logger.info(f"Changing group for student {student_am} from {old_group_id} to {new_group_id}")
+        
         existing_enrollment.group_id = new_group_id
         existing_enrollment.group_reg_daymonth = f"{datetime.now().day}/{datetime.now().month}"
         existing_enrollment.group_reg_year = datetime.now().year
+        adjust_enrolled_count(old_group_id, -1)
+        promotion = promote_waitlisted(old_group_id, lab_id)
         
         db.session.commit()
+        invalidate_student_enrollments(student_am)
+        waitlist_committed(promotion)
         
         audit_log(
             'group_changed',
             old_value=f"Group {old_group_id}",
             new_value=f"Group {new_group_id}",
-            reason="Student changed group"
+            reason="Student changed group",
+            target=('student', student_am)
         )
         
         return True, "Η αλλαγή τμήματος ολοκληρώθηκε επιτυχώς!", {
@@ -419,26 +780,384 @@ def change_student_group(student_am, old_group_id, new_group_id, lab_id):
         logger.error(f"Group change failed: {e}")
         return False, "Σφάλμα στην επικοινωνία. Προσπαθήστε αργότερα", {'error_type': 'system_error'}
 
+# =============================================================================
+# WAITLIST
+# =============================================================================
+
+# promoted: students moved from the waitlist into the group;
+# dropped: entries removed because the student got a group of the lab elsewhere
+Promotion = namedtuple('Promotion', 'group_id promoted dropped')
+
+
+def _drop_lab_waitlist_entry(student_am, lab_id):
+    """Delete the student's waitlist entry for a lab; returns its group_id or None."""
+    return db.session.execute(
+        delete(GroupWaitlist)
+        .where(GroupWaitlist.am == student_am, GroupWaitlist.lab_id == lab_id)
+        .returning(GroupWaitlist.group_id),
+        execution_options={'synchronize_session': False}
+    ).scalar()
+
+def join_waitlist(student_am, lab_id, group_id):
+    """
+    Εγγραφή φοιτητή στη λίστα αναμονής πλήρους τμήματος.
+    
+    Returns: (bool, str, dict) - (success, message, details)
+    """
+    academic_year = get_academic_year()
+    
+    period_valid, period_msg = validate_registration_period(lab_id)
+    if not period_valid:
+        return False, period_msg, {'error_type': 'registration_closed'}
+    
+    allowed, allocation_msg = check_first_come_allocation(lab_id)
+    if not allowed:
+        return False, allocation_msg, {'error_type': 'preferences_only'}
+    
+    in_lab = db.session.scalar(
+        select(LabGroup.group_id)
+        .join(RelLabGroup, RelLabGroup.group_id == LabGroup.group_id)
+        .where(RelLabGroup.lab_id == lab_id, LabGroup.group_id == group_id, LabGroup.year == academic_year)
+    )
+    if in_lab is None:
+        return False, "Το τμήμα δεν βρέθηκε", {'error_type': 'group_not_found'}
+    
+    try:
+        begin_write_transaction()
+        
+        enrollment_type, enrollment_msg = check_existing_enrollment(
+            student_am, lab_id, group_id, academic_year
+        )
+        if enrollment_type in ('same_group', 'different_group'):
+            db.session.rollback()
+            return False, enrollment_msg, {'error_type': 'already_enrolled'}
+        
+        has_space, _, occupancy = check_group_capacity(group_id, lab_id)
+        if has_space:
+            db.session.rollback()
+            return False, "Το τμήμα έχει ελεύθερες θέσεις. Εγγραφείτε απευθείας.", {
+                'error_type': 'group_has_space', 'occupancy': occupancy}
+        
+        waiting_for = db.session.scalar(select(GroupWaitlist.group_id).where(
+            GroupWaitlist.am == student_am, GroupWaitlist.lab_id == lab_id))
+        if waiting_for is not None:
+            db.session.rollback()
+            return False, "Είστε ήδη σε λίστα αναμονής τμήματος αυτού του εργαστηρίου", {
+                'error_type': 'already_waiting', 'group_id': waiting_for}
+        
+        entry = GroupWaitlist(am=student_am, lab_id=lab_id, group_id=group_id, joined_at=datetime.now())
+        db.session.add(entry)
+        db.session.commit()
+        waitlists.appended(group_id, entry.seq, student_am)
+        
+        audit_log(
+            'waitlist_joined',
+            new_value=f"Student {student_am} waiting for group {group_id}",
+            reason="Group full",
+            target=('student', student_am)
+        )
+        
+        position, waiting = waitlists.position(group_id, student_am)
+        return True, f"Εγγραφήκατε στη λίστα αναμονής (θέση {position})", {
+            'group_id': group_id,
+            'lab_id': lab_id,
+            'position': position,
+            'waiting': waiting
+        }
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Waitlist join failed: {e}")
+        return False, "Σφάλμα στην επικοινωνία. Προσπαθήστε αργότερα", {'error_type': 'system_error'}
+
+def leave_waitlist(student_am, lab_id):
+    """Remove the student from the lab's waitlist. Returns the group_id left, or None."""
+    group_id = _drop_lab_waitlist_entry(student_am, lab_id)
+    db.session.commit()
+    if group_id is not None:
+        waitlists.removed(group_id, student_am)
+        audit_log(
+            'waitlist_left',
+            old_value=f"Student {student_am} waiting for group {group_id}",
+            reason="Student left the waitlist",
+            target=('student', student_am)
+        )
+    return group_id
+
+def get_student_waitlists(student_am):
+    """The student's waitlist entries with their current queue positions."""
+    rows = db.session.execute(
+        select(GroupWaitlist.lab_id, GroupWaitlist.group_id, GroupWaitlist.joined_at)
+        .where(GroupWaitlist.am == student_am)
+        .order_by(GroupWaitlist.seq)
+    ).all()
+    entries = []
+    for lab_id, group_id, joined_at in rows:
+        if not validate_registration_period(lab_id)[0]:
+            continue  # closed: the queue will not move again (close_waitlists deletes it)
+        position, waiting = waitlists.position(group_id, student_am)
+        entries.append({
+            'lab_id': lab_id,
+            'group_id': group_id,
+            'joined_at': joined_at.isoformat(sep=' ', timespec='seconds'),
+            'position': position,
+            'waiting': waiting
+        })
+    return entries
+
+def promote_waitlisted(group_id, lab_id):
+    """
+    Fill the group's free seats from its waitlist, first come first served,
+    inside the caller's transaction: call it after the write that freed the
+    seats (so the write lock is held), commit, then pass the result to
+    waitlist_committed(). Students who meanwhile got a group of the lab (or
+    hold a lab row that cannot be reopened) are dropped from the queue.
+    Once registration has closed nothing is promoted and the whole queue is
+    dropped.
+    """
+    promotion = Promotion(group_id, [], [])
+    if lab_id is None:
+        return promotion
+    if not validate_registration_period(lab_id)[0]:
+        promotion.dropped.extend(db.session.scalars(
+            delete(GroupWaitlist).where(GroupWaitlist.group_id == group_id).returning(GroupWaitlist.am)
+        ))
+        return promotion
+    academic_year = get_academic_year()
+    
+    while True:
+        head = db.session.scalars(
+            select(GroupWaitlist).where(GroupWaitlist.group_id == group_id)
+            .order_by(GroupWaitlist.seq).limit(1)
+        ).first()
+        if head is None:
+            break
+        
+        placed = db.session.scalar(
+            select(RelGroupStudent.group_id)
+            .join(LabGroup, LabGroup.group_id == RelGroupStudent.group_id)
+            .join(RelLabGroup, RelLabGroup.group_id == LabGroup.group_id)
+            .where(RelGroupStudent.am == head.am, RelLabGroup.lab_id == lab_id, LabGroup.year == academic_year)
+            .limit(1)
+        )
+        lab_status = db.session.scalar(select(RelLabStudent.status).where(
+            RelLabStudent.am == head.am, RelLabStudent.lab_id == lab_id))
+        if placed is not None or lab_status not in (None, STATUS_FAILED):
+            db.session.delete(head)
+            promotion.dropped.append(head.am)
+            continue
+        enrollment_type = 'failed' if lab_status == STATUS_FAILED else 'none'
+        
+        if not reserve_seat(group_id, lab_id):
+            break
+        
+        db.session.delete(head)
+        _create_enrollment(head.am, lab_id, group_id, enrollment_type)
+        promotion.promoted.append(head.am)
+        audit_log(
+            'waitlist_promoted',
+            new_value=f"Student {head.am} enrolled in group {group_id} from the waitlist",
+            reason="Seat freed",
+            target=('student', head.am)
+        )
+    
+    if promotion.promoted:
+        logger.info(f"Group {group_id}: promoted {promotion.promoted} from the waitlist")
+    return promotion
+
+def close_waitlists():
+    """
+    Delete the waitlists of labs whose reg_limit has passed, so no student is
+    shown a place in a queue that will never move. Returns {group_id: [am, ...]}
+    of the entries deleted.
+    """
+    begin_write_transaction()
+    closed_labs = select(CourseLab.lab_id).where(CourseLab.reg_limit < datetime.now().date())
+    rows = db.session.execute(
+        delete(GroupWaitlist).where(GroupWaitlist.lab_id.in_(closed_labs))
+        .returning(GroupWaitlist.group_id, GroupWaitlist.am)
+    ).all()
+    db.session.commit()
+    closed = {}
+    for group_id, am in rows:
+        closed.setdefault(group_id, []).append(am)
+    for group_id, ams in closed.items():
+        waitlists.removed(group_id, *ams)
+    return closed
+
+def waitlist_committed(*promotions):
+    """Publish committed promotions to the waitlist index and enrollment cache."""
+    for promotion in promotions:
+        if promotion.promoted or promotion.dropped:
+            waitlists.removed(promotion.group_id, *promotion.promoted, *promotion.dropped)
+            invalidate_student_enrollments(*promotion.promoted)
+
+# Largest IN (...) list sent to SQLite by the bulk queries
+BULK_QUERY_CHUNK = 500
+
+
+def _chunked(values, size=BULK_QUERY_CHUNK):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def bulk_enroll_students(pairs, before_commit=None):
+    """
+    Place many students into groups in one write transaction (admin bulk enrollment).
+
+    pairs is a list of (am, group_id). Students, groups, capacity and existing
+    memberships are validated with one set-based query per kind, then every
+    accepted row is inserted with executemany. Like the admin force-add, a
+    missing rel_lab_student row is created and an existing one is kept.
+
+    Returns one status per pair: 'added', 'student_not_found',
+    'group_not_found', 'duplicate' (the student was already placed in this lab
+    earlier in the same request), 'already_enrolled', 'enrolled_elsewhere'
+    (another group of the same lab and year) or 'group_full'.
+
+    before_commit, if given, is called with the statuses inside the same write
+    transaction, after the inserts and just before the commit; it is not
+    called when no row was accepted.
+    """
+    begin_write_transaction()
+
+    ams = {am for am, _ in pairs}
+    known = set()
+    for chunk in _chunked(ams):
+        known.update(db.session.scalars(select(Student.am).where(Student.am.in_(chunk))))
+
+    # group_id -> [lab_id, year, free seats]
+    groups = {}
+    for chunk in _chunked({group_id for _, group_id in pairs}):
+        rows = db.session.execute(
+            select(LabGroup.group_id, RelLabGroup.lab_id, LabGroup.year,
+                   CourseLab.maxusers - LabGroup.enrolled_count)
+            .join(RelLabGroup, RelLabGroup.group_id == LabGroup.group_id)
+            .join(CourseLab, CourseLab.lab_id == RelLabGroup.lab_id)
+            .where(LabGroup.group_id.in_(chunk))
+        )
+        for group_id, lab_id, year, free in rows:
+            groups.setdefault(group_id, [lab_id, year, free])
+
+    lab_ids = {lab_id for lab_id, _, _ in groups.values()}
+    placed = {}        # (am, lab_id, year) -> group_id the student is already in
+    lab_enrolled = set()
+    for chunk in _chunked(ams & known):
+        rows = db.session.execute(
+            select(RelGroupStudent.am, RelGroupStudent.group_id, RelLabGroup.lab_id, LabGroup.year)
+            .join(RelLabGroup, RelLabGroup.group_id == RelGroupStudent.group_id)
+            .join(LabGroup, LabGroup.group_id == RelGroupStudent.group_id)
+            .where(RelGroupStudent.am.in_(chunk), RelLabGroup.lab_id.in_(lab_ids))
+        )
+        for am, group_id, lab_id, year in rows:
+            placed[(am, lab_id, year)] = group_id
+        lab_enrolled.update(db.session.execute(
+            select(RelLabStudent.am, RelLabStudent.lab_id)
+            .where(RelLabStudent.am.in_(chunk), RelLabStudent.lab_id.in_(lab_ids))
+        ).all())
+
+    now = datetime.now()
+    statuses, group_rows, lab_rows = [], [], []
+    accepted = set()
+    added = Counter()
+    for am, group_id in pairs:
+        group = groups.get(group_id)
+        if am not in known:
+            status = 'student_not_found'
+        elif group is None:
+            status = 'group_not_found'
+        else:
+            lab_id, year, free = group
+            key = (am, lab_id, year)
+            if key in accepted:
+                status = 'duplicate'
+            elif key in placed:
+                status = 'already_enrolled' if placed[key] == group_id else 'enrolled_elsewhere'
+            elif free <= 0:
+                status = 'group_full'
+            else:
+                status = 'added'
+                group[2] -= 1
+                added[group_id] += 1
+                accepted.add(key)
+                group_rows.append({'am': am, 'group_id': group_id,
+                                   'group_reg_daymonth': now.strftime('%d/%m'), 'group_reg_year': now.year})
+                if (am, lab_id) not in lab_enrolled:
+                    lab_enrolled.add((am, lab_id))
+                    lab_rows.append({'am': am, 'lab_id': lab_id, 'misses': 0, 'grade': 0,
+                                     'reg_month': now.month, 'reg_year': now.year,
+                                     'status': STATUS_IN_PROGRESS})
+        statuses.append(status)
+
+    if not group_rows:
+        db.session.rollback()
+        return statuses
+
+    db.session.execute(insert(RelGroupStudent), group_rows)
+    if lab_rows:
+        db.session.execute(insert(RelLabStudent), lab_rows)
+    for group_id, n in added.items():
+        adjust_enrolled_count(group_id, n)
+    if before_commit is not None:
+        before_commit(statuses)
+    db.session.commit()
+    invalidate_student_enrollments(*{r['am'] for r in group_rows})
+    return statuses
+
+# am -> {academic_year: tuple of enrollment dicts}
+ENROLLMENT_CACHE_SIZE = 4096
+# Invalidation only reaches this worker; a write on another worker (register,
+# waitlist promotion, grade) shows up here once the entry expires
+ENROLLMENT_CACHE_TTL = 5
+_enrollment_cache = TTLCache('student_enrollments', maxsize=ENROLLMENT_CACHE_SIZE,
+                             ttl=ENROLLMENT_CACHE_TTL)
+
+
+def invalidate_student_enrollments(*student_ams):
+    """Forget cached enrollments of students whose enrollments, grades or absences changed."""
+    for am in student_ams:
+        if am:
+            _enrollment_cache.invalidate(str(am))
+
+
+def clear_student_enrollments():
+    """Forget all cached enrollments after a lab, group or course shown in them is edited."""
+    _enrollment_cache.clear()
+
+
 def get_student_enrollments(student_am, academic_year=None):
     """
     Λήψη εγγραφών φοιτητή με εξάμηνο, ταξινομημένες ανά εξάμηνο και αλφαβητικά.
-    
+
+    One query: absences are outer-joined (one row per absence date) and
+    folded here. Cached per (student, year) until invalidate_student_enrollments.
+
     Returns: List of enrollment dictionaries sorted by semester and lab name
     """
     if academic_year is None:
         academic_year = get_academic_year()
-    
-    # Προσθήκη Coursename για να πάρουμε το εξάμηνο
-    enrollments = db.session.query(
+
+    key = str(student_am)
+    by_year = _enrollment_cache.get(key) or {}
+    cached = by_year.get(academic_year)
+    if cached is None:
+        cached = _load_student_enrollments(student_am, academic_year)
+        _enrollment_cache.set(key, {**by_year, academic_year: cached})
+    return [dict(e) for e in cached]
+
+
+def _load_student_enrollments(student_am, academic_year):
+    rows = db.session.query(
         CourseLab.name.label('lab_name'),
         CourseLab.lab_id,
         LabGroup.daytime,
         LabGroup.group_id,
         RelLabStudent.status,
-        RelLabStudent.misses,
         RelLabStudent.grade,
         Coursename.semester.label('semester'),
-        Coursename.name.label('course_name')
+        Coursename.name.label('course_name'),
+        StudentAbsence.absence_date
     ).join(
         RelLabStudent, CourseLab.lab_id == RelLabStudent.lab_id
     ).join(
@@ -454,33 +1173,105 @@ def get_student_enrollments(student_am, academic_year=None):
         RelCourseLab, CourseLab.lab_id == RelCourseLab.lab_id
     ).join(
         Coursename, RelCourseLab.course_id == Coursename.course_id
+    ).outerjoin(
+        StudentAbsence, and_(
+            StudentAbsence.am == RelGroupStudent.am,
+            StudentAbsence.group_id == LabGroup.group_id
+        )
     ).filter(
         RelLabStudent.am == student_am,
         LabGroup.year == academic_year
-    ).distinct().all()
-    
+    ).distinct().order_by(
+        # Πρώτα ανά εξάμηνο, μετά αλφαβητικά ανά όνομα εργαστηρίου;
+        # the rest keeps each enrollment's absence rows adjacent and in date order
+        Coursename.semester, CourseLab.name, CourseLab.lab_id, LabGroup.group_id,
+        Coursename.name, StudentAbsence.absence_date
+    ).all()
+
     result = []
-    for e in enrollments:
-        absences = StudentMissesPerGroup.query.filter_by(
-            am=student_am, group_id=e.group_id
-        ).first()
-        
-        result.append({
-            'lab_name': e.lab_name,
-            'lab_id': e.lab_id,
-            'group_daytime': e.daytime,
-            'group_id': e.group_id,
-            'status': e.status,
-            'absences': absences.misses if absences else '-',
-            'grade': e.grade,
-            'semester': e.semester,
-            'course_name': e.course_name
-        })
-    
-    # Ταξινόμηση: πρώτα ανά εξάμηνο, μετά αλφαβητικά ανά όνομα εργαστηρίου
-    result.sort(key=lambda x: (x['semester'], x['lab_name']))
-    
-    return result
+    last = None
+    for r in rows:
+        ident = (r.lab_id, r.group_id, r.semester, r.course_name)
+        if ident != last:
+            last = ident
+            result.append((r, []))
+        if r.absence_date is not None:
+            result[-1][1].append(format_date(r.absence_date))
+
+    return tuple({
+        'lab_name': r.lab_name,
+        'lab_id': r.lab_id,
+        'group_daytime': r.daytime,
+        'group_id': r.group_id,
+        'status': r.status,
+        'absences': ', '.join(dates) if dates else '-',
+        'absences_count': len(dates),
+        'grade': r.grade,
+        'semester': r.semester,
+        'course_name': r.course_name
+    } for r, dates in result)
+
+# =============================================================================
+# DATES
+# =============================================================================
+
+# Dates are stored as DATE and shown to / accepted from users as dd/mm/yyyy
+DATE_FORMAT = '%d/%m/%Y'
+
+def parse_date(value):
+    """Parse 'dd/mm/yyyy' or 'yyyy-mm-dd' (HTML date input) into a date. Raises ValueError."""
+    text = str(value or '').strip()
+    for fmt in (DATE_FORMAT, '%Y-%m-%d'):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date '{text}'")
+
+def format_date(value):
+    """dd/mm/yyyy for display; '' for a missing date."""
+    return value.strftime(DATE_FORMAT) if value else ''
+
+# =============================================================================
+# ABSENCES
+# =============================================================================
+
+def add_absence(student_am, group_id, absence_date):
+    """Insert one absence. Returns False if that date was already recorded. Caller commits."""
+    stmt = sqlite_insert(StudentAbsence.__table__).values(
+        am=student_am, group_id=group_id, absence_date=absence_date
+    ).on_conflict_do_nothing()
+    return db.session.execute(stmt).rowcount == 1
+
+def remove_absence(student_am, group_id, absence_date):
+    """Delete one absence. Returns False if it was not recorded. Caller commits."""
+    return StudentAbsence.query.filter_by(
+        am=student_am, group_id=group_id, absence_date=absence_date
+    ).delete(synchronize_session=False) == 1
+
+def get_absence_dates(group_id, student_ams=None):
+    """{am: [dd/mm/yyyy, ...]} in date order for a group, optionally limited to some students."""
+    query = db.session.query(StudentAbsence.am, StudentAbsence.absence_date).filter(
+        StudentAbsence.group_id == group_id
+    )
+    if student_ams is not None:
+        query = query.filter(StudentAbsence.am.in_(list(student_ams)))
+
+    dates = {}
+    for am, absence_date in query.order_by(StudentAbsence.am, StudentAbsence.absence_date):
+        dates.setdefault(am, []).append(format_date(absence_date))
+    return dates
+
+def count_absences(group_ids):
+    """{(am, group_id): number of absences} for the given groups, as one GROUP BY."""
+    if not group_ids:
+        return {}
+    rows = db.session.query(
+        StudentAbsence.am, StudentAbsence.group_id, func.count()
+    ).filter(StudentAbsence.group_id.in_(list(group_ids))).group_by(
+        StudentAbsence.group_id, StudentAbsence.am
+    )
+    return {(am, group_id): n for am, group_id, n in rows}
 
 # =============================================================================
 # LEGACY FUNCTIONS (for backwards compatibility)
@@ -509,23 +1300,6 @@ def check_enrollment_preconditions(student_am, group_id):
         logger.error(f"Error checking enrollment preconditions: {e}")
         return False, "System error"
 
-def transactional_enrollment(student_am, group_id):
-    """Enroll student in group with transactional safety"""
-    try:
-        lab_group_rel = RelLabGroup.query.filter_by(group_id=group_id).first()
-        if not lab_group_rel:
-            return False, "No lab associated with this group"
-        
-        lab_id = lab_group_rel.lab_id
-        
-        success, message, details = register_student_to_lab(student_am, lab_id, group_id)
-        return success, message
-        
-    except Exception as e:
-        db.session.rollback()
-        logger.error(f"Transaction failed: {e}")
-        return False, "Enrollment failed"
-
 def record_absence(student_am, group_id, date, reason=None):
     """Record student absence with audit trail"""
     try:
@@ -533,29 +1307,23 @@ def record_absence(student_am, group_id, date, reason=None):
         if user_role not in ['professor', 'admin']:
             return False, "Insufficient permissions to record absence"
         
-        existing = StudentMissesPerGroup.query.filter_by(
-            am=student_am, group_id=group_id
-        ).first()
-        
-        if existing:
-            if existing.misses:
-                existing.misses = f"{existing.misses}, {date}"
-            else:
-                existing.misses = date
-        else:
-            absence = StudentMissesPerGroup(
-                am=student_am,
-                group_id=group_id,
-                misses=date
-            )
-            db.session.add(absence)
+        try:
+            absence_date = parse_date(date)
+        except ValueError:
+            return False, "Invalid date"
+
+        if not add_absence(student_am, group_id, absence_date):
+            db.session.rollback()
+            return False, "Absence already recorded for this date"
         
         db.session.commit()
+        invalidate_student_enrollments(student_am)
         
         audit_log(
             action="absence_recorded",
             new_value=f"Absence recorded for student {student_am} in group {group_id} on {date}",
-            reason=reason or "Professor recorded absence"
+            reason=reason or "Professor recorded absence",
+            target=('student', student_am)
         )
         
         return True, "Absence recorded"
@@ -0,0 +1,77 @@
+"""
+Small in-process caches shared by the auth and API layers.
+
+Every cache is per worker process. Writers must call the matching
+invalidate helper after committing a change the cache depends on; the TTL
+only bounds how stale an entry can get if another process made the change.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_registry = {}
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire `ttl` seconds after being
+    stored. Keeps hit/miss counters so the admin API can report them.
+    """
+
+    def __init__(self, name, maxsize=1024, ttl=300.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        _registry[name] = self
+
+    def get(self, key, default=None):
+        """Return the cached value, or default if missing or expired."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires = item
+                if expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0
+        }
+
+
+def cache_stats():
+    """Stats for every cache created in this process, keyed by cache name."""
+    return {name: cache.stats() for name, cache in _registry.items()}
@@ -0,0 +1,175 @@
+"""
+CAS ticket validation for production logins.
+
+One CASClient per process keeps a pooled keep-alive requests.Session to the
+SSO server. Every validation has connect/read timeouts, waits a bounded time
+for one of a fixed number of concurrency slots, and goes through a circuit
+breaker: after CAS_BREAKER_THRESHOLD consecutive transport failures logins
+fail fast with CASUnavailable for CAS_BREAKER_RESET seconds instead of
+tying up worker threads, then a single trial request decides whether the
+circuit closes again.
+"""
+import logging
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+CAS_NS = {'cas': 'http://www.yale.edu/tp/cas'}
+
+
+class CASUnavailable(Exception):
+    """CAS could not be reached in time, or the circuit breaker is open."""
+
+
+def parse_cas_response(xml_text):
+    """
+    Parse a /serviceValidate response.
+
+    Returns a dict with person_id, name, affiliation and email, or None if
+    the ticket was rejected or the document is not a CAS success response.
+    """
+    try:
+        root = ET.fromstring(xml_text)
+    except ET.ParseError:
+        return None
+
+    success = root.find('.//cas:authenticationSuccess', CAS_NS)
+    if success is None:
+        return None
+
+    def text(tag, default=''):
+        node = success.find(f'cas:{tag}', CAS_NS)
+        return node.text if node is not None and node.text else default
+
+    return {
+        'person_id': text('schGrAcPersonID', None),
+        'name': text('displayName', 'Unknown'),
+        'affiliation': text('eduPersonAffiliation'),
+        'email': text('mail'),
+    }
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed -> open -> half-open)."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """True if a request may go out; half-open lets one trial through."""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self._opened_at is not None or self.failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.error(f"CAS circuit opened after {self.failures} consecutive failures")
+                self._opened_at = time.monotonic()
+
+
+class CASClient:
+    """Pooled, time-bounded CAS /serviceValidate client."""
+
+    def __init__(self, validate_url, connect_timeout=2.0, read_timeout=5.0,
+                 pool_size=20, max_concurrent=20, acquire_timeout=2.0, breaker=None):
+        self.validate_url = validate_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.acquire_timeout = acquire_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def validate(self, ticket, service):
+        """
+        Validate a service ticket.
+
+        Returns the parsed user dict, or None if CAS rejected the ticket.
+        Raises CASUnavailable on timeouts, transport errors, 5xx responses,
+        saturation or an open circuit.
+        """
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            raise CASUnavailable('too many concurrent validations')
+        if not self.breaker.allow():
+            self._slots.release()
+            raise CASUnavailable('circuit open')
+        try:
+            response = self.session.get(self.validate_url, params={'service': service, 'ticket': ticket},
+                                        timeout=self.timeout, verify=True)
+        except requests.RequestException as e:
+            self.breaker.record_failure()
+            logger.warning(f"CAS validation failed: {e}")
+            raise CASUnavailable(str(e)) from e
+        finally:
+            self._slots.release()
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            raise CASUnavailable(f'CAS returned {response.status_code}')
+
+        self.breaker.record_success()
+        if response.status_code != 200:
+            return None
+        return parse_cas_response(response.text)
+
+    def stats(self):
+        return {'state': self.breaker.state, 'consecutive_failures': self.breaker.failures}
+
+    def close(self):
+        self.session.close()
+
+
+def init_cas(app):
+    """Build the process-wide CAS client from the CAS_* app config."""
+    client = CASClient(
+        app.config['CAS_VALIDATE_URL'],
+        connect_timeout=app.config.get('CAS_CONNECT_TIMEOUT', 2.0),
+        read_timeout=app.config.get('CAS_READ_TIMEOUT', 5.0),
+        pool_size=app.config.get('CAS_POOL_SIZE', 20),
+        max_concurrent=app.config.get('CAS_MAX_CONCURRENT', 20),
+        acquire_timeout=app.config.get('CAS_ACQUIRE_TIMEOUT', 2.0),
+        breaker=CircuitBreaker(app.config.get('CAS_BREAKER_THRESHOLD', 5),
+                               app.config.get('CAS_BREAKER_RESET', 30.0))
+    )
+    app.extensions['cas'] = client
+    return client
@@ -1,13 +1,73 @@
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
 from models import (
-    Student, CourseLab, RelGroupStudent, db
+    Student, Professor, CourseLab, LabGroup, RelGroupProf, db
 )
-from auth import audit_log, get_academic_year, get_student_enrollments
+from auth import audit_log, get_academic_year, get_student_enrollments, invalidate_user_role
+from cache import TTLCache
+
+# prof_id -> frozenset of the group_ids the professor is assigned to
+GROUP_OWNERSHIP_CACHE_SIZE = 1024
+GROUP_OWNERSHIP_CACHE_TTL = 300
+_group_ownership_cache = TTLCache('professor_groups', maxsize=GROUP_OWNERSHIP_CACHE_SIZE,
+                                  ttl=GROUP_OWNERSHIP_CACHE_TTL)
+
+
+def get_professor_group_ids(prof_id):
+    """Return the set of group_ids assigned to a professor (cached)."""
+    key = str(prof_id)
+    group_ids = _group_ownership_cache.get(key)
+    if group_ids is None:
+        rows = db.session.query(RelGroupProf.group_id).filter(RelGroupProf.prof_id == prof_id).all()
+        group_ids = frozenset(r.group_id for r in rows)
+        _group_ownership_cache.set(key, group_ids)
+    return group_ids
+
+
+def professor_owns_group(prof_id, group_id):
+    """In-memory check that a professor is assigned to a group."""
+    return int(group_id) in get_professor_group_ids(prof_id)
+
+
+def invalidate_professor_groups(*prof_ids):
+    """Forget cached group sets after group assignments change."""
+    for prof_id in prof_ids:
+        if prof_id:
+            _group_ownership_cache.invalidate(str(prof_id))
+
+
+# professor email -> prof_id (0 when no professor has that email)
+PROFESSOR_EMAIL_CACHE_SIZE = 4096
+PROFESSOR_EMAIL_CACHE_TTL = 300
+_professor_email_cache = TTLCache('professor_emails', maxsize=PROFESSOR_EMAIL_CACHE_SIZE,
+                                  ttl=PROFESSOR_EMAIL_CACHE_TTL)
+
+
+def get_professor_id_by_email(email):
+    """Resolve a CAS email to a prof_id via the email index (cached). None if unknown."""
+    if not email:
+        return None
+    prof_id = _professor_email_cache.get(email)
+    if prof_id is None:
+        row = db.session.query(Professor.prof_id).filter(Professor.email == email).first()
+        prof_id = row.prof_id if row else 0
+        _professor_email_cache.set(email, prof_id)
+    return prof_id or None
+
+
+def invalidate_professor_email(*emails):
+    """Forget cached email lookups after professors are created or deleted."""
+    for email in emails:
+        if email:
+            _professor_email_cache.invalidate(email)
 
 
 def get_group_occupancy(group_id, lab_id):
-    """Calculate group occupancy stats."""
-    current_count = RelGroupStudent.query.filter_by(group_id=group_id).count()
-    lab = CourseLab.query.get(lab_id)
+    """Calculate group occupancy stats from the stored enrolled_count."""
+    # Primary-key gets: callers listing groups already hold both in the session
+    group = db.session.get(LabGroup, group_id)
+    current_count = group.enrolled_count if group else 0
+    lab = db.session.get(CourseLab, lab_id)
     max_users = lab.maxusers if lab else 0
 
     return {
@@ -27,8 +87,8 @@ def get_student_notifications(student_am):
     enrollments = get_student_enrollments(student_am, academic_year)
 
     for e in enrollments:
-        if e['absences'] and e['absences'] != '-':
-            absence_count = len(e['absences'].split(',')) if isinstance(e['absences'], str) else 0
+        if e['absences_count']:
+            absence_count = e['absences_count']
             lab = CourseLab.query.get(e['lab_id'])
             max_misses = lab.max_misses if lab else 3
 
@@ -46,31 +106,39 @@ def get_student_notifications(student_am):
 
 
 def create_or_get_student(am, name, email=None):
-    """Create a new student or return the existing one."""
-    student = Student.query.filter_by(am=am).first()
-
+    """
+    Return (student, created) for a CAS login, creating the student if needed.
+
+    Returning students cost one primary-key read. First logins insert with
+    INSERT .. ON CONFLICT DO NOTHING, so two concurrent first logins of the
+    same AM both succeed: exactly one of them sees created=True.
+    """
+    student = db.session.get(Student, am)
     if student:
         return student, False
 
-    new_student = Student(
+    stmt = sqlite_insert(Student.__table__).values(
         am=am,
         name=name,
         semester=1,
         pwd='',
         email=email or ''
-    )
+    ).on_conflict_do_nothing(index_elements=['am'])
 
     try:
-        db.session.add(new_student)
+        created = db.session.execute(stmt).rowcount == 1
         db.session.commit()
+    except Exception:
+        db.session.rollback()
+        return None, False
 
+    if created:
+        invalidate_user_role(am)
         audit_log(
             'student_created',
             new_value=f"Student {am} ({name}) created via CAS",
-            reason="First CAS login"
+            reason="First CAS login",
+            target=('student', am)
         )
 
-        return new_student, True
-    except Exception:
-        db.session.rollback()
-        return None, False
+    return db.session.get(Student, am), created
@@ -0,0 +1,95 @@
+"""
+Idempotency-Key support for the mutating API endpoints.
+
+A client may send an `Idempotency-Key` header (any unique string, e.g. a
+UUID made when the form is submitted) and reuse it when it retries. The
+first request with a key runs normally and its response is stored; a retry
+with the same key, from the same user, gets the stored response back
+without running the view again, with `Idempotent-Replayed: true`. A retry
+that arrives while the first request is still running waits for it. Reusing
+a key for a different request (method, path or body) is refused with 422.
+
+Responses are kept in a bounded, expiring TTLCache per worker process, so a
+key is honoured for IDEMPOTENCY_TTL seconds by the worker that saw it.
+5xx answers (including the admission controller's 503) are not stored, so
+the retry runs again. Requests without the header behave as before.
+"""
+import functools
+import hashlib
+import threading
+from collections import namedtuple
+
+from flask import jsonify, make_response, request, session
+
+from cache import TTLCache
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+IDEMPOTENCY_MAX_KEY_LENGTH = 255
+IDEMPOTENCY_CACHE_SIZE = 10000
+IDEMPOTENCY_TTL = 3600
+# Seconds a retry waits for the original request with the same key to finish
+IDEMPOTENCY_WAIT = 30.0
+
+StoredResponse = namedtuple('StoredResponse', 'fingerprint status body content_type')
+
+_responses = TTLCache('idempotent_responses', maxsize=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_TTL)
+# Keys whose first request is still running -> Event set when it finishes
+_in_flight = {}
+_lock = threading.Lock()
+
+
+def _fingerprint():
+    # full_path keeps the query string: some endpoints pick their target with it (?prof_id=)
+    digest = hashlib.sha256(f'{request.method} {request.full_path}\n'.encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _replay(stored, fingerprint):
+    if stored.fingerprint != fingerprint:
+        return jsonify({'success': False,
+                        'message': f'{IDEMPOTENCY_HEADER} was already used for a different request'}), 422
+    response = make_response(stored.body, stored.status)
+    response.content_type = stored.content_type
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view):
+    """Honour an Idempotency-Key header on a mutating view."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return view(*args, **kwargs)
+        key = key.strip()
+        if not key or len(key) > IDEMPOTENCY_MAX_KEY_LENGTH:
+            return jsonify({'success': False,
+                            'message': f'{IDEMPOTENCY_HEADER} must be 1-{IDEMPOTENCY_MAX_KEY_LENGTH} characters'}), 400
+
+        scope = (session.get('role'), session.get('schGrAcPersonID'), key)
+        fingerprint = _fingerprint()
+        while True:
+            with _lock:
+                stored = _responses.get(scope)
+                pending = _in_flight.get(scope) if stored is None else None
+                if stored is None and pending is None:
+                    _in_flight[scope] = threading.Event()
+                    break
+            if stored is not None:
+                return _replay(stored, fingerprint)
+            if not pending.wait(IDEMPOTENCY_WAIT):
+                return jsonify({'success': False,
+                                'message': 'A request with this Idempotency-Key is still in progress'}), 409
+            # The first request finished: replay it, or run again if it was not stored
+
+        try:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code < 500 and not response.is_streamed:
+                _responses.set(scope, StoredResponse(fingerprint, response.status_code,
+                                                     response.get_data(), response.content_type))
+            return response
+        finally:
+            with _lock:
+                _in_flight.pop(scope).set()
+    return wrapper
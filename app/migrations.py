@@ -0,0 +1,483 @@
+"""
+Versioned schema migrations for labregister.sqlite.
+
+db.create_all() only creates missing tables; it never changes existing
+ones. Schema changes to deployed database files go here instead, as
+numbered migrations applied in order and recorded in schema_migrations.
+Each migration runs in its own transaction (SQLite DDL is transactional),
+so a failing migration leaves the database at the previous version.
+
+Add a migration by appending a function decorated with
+@migration(<next version>, '<description>'). Never edit or renumber a
+migration that has been released.
+
+An empty database is not migrated step by step: upgrade(engine, metadata=...)
+creates the current model schema and records every migration as applied.
+The app itself only calls check_schema() once per worker, on the first
+request.
+"""
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register fn(conn) as schema version `version`."""
+    def decorator(fn):
+        if MIGRATIONS and version <= MIGRATIONS[-1][0]:
+            raise ValueError(f"Migration {version} must be numbered after {MIGRATIONS[-1][0]}")
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return decorator
+
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, description TEXT NOT NULL, applied_at TEXT NOT NULL)"
+    ))
+
+
+def current_version(engine):
+    with engine.begin() as conn:
+        _ensure_version_table(conn)
+        return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")).scalar()
+
+
+def pending_migrations(engine):
+    version = current_version(engine)
+    return [m for m in MIGRATIONS if m[0] > version]
+
+
+class SchemaOutOfDate(RuntimeError):
+    """The database is behind the code and automatic upgrades are off."""
+
+
+@contextmanager
+def _write_transaction(engine):
+    """A connection inside BEGIN IMMEDIATE .. COMMIT, rolled back on error."""
+    # pysqlite does not open a transaction before DDL by itself: manage it
+    # explicitly. IMMEDIATE also serialises workers upgrading at startup.
+    # Foreign keys are off inside the transaction, so rebuilding a table does
+    # not cascade into its children, and checked once before COMMIT instead.
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+        enforced = conn.exec_driver_sql('PRAGMA foreign_keys').scalar()
+        conn.exec_driver_sql('PRAGMA foreign_keys = OFF')
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            violations = conn.exec_driver_sql('PRAGMA foreign_key_check').all()
+            if violations:
+                raise RuntimeError(f"Foreign key violations (table, rowid, parent, fk): {violations[:10]}")
+            conn.exec_driver_sql('COMMIT')
+        except Exception:
+            conn.exec_driver_sql('ROLLBACK')
+            raise
+        finally:
+            if enforced:
+                conn.exec_driver_sql('PRAGMA foreign_keys = ON')
+
+
+def _record(conn, version, description):
+    conn.execute(text("INSERT INTO schema_migrations (version, description, applied_at) VALUES (:v, :d, :t)"),
+                 {'v': version, 'd': description, 't': datetime.now().isoformat(timespec='seconds')})
+
+
+def _create_baseline(engine, metadata):
+    """Create the current schema if the database has no tables. Returns True if it did."""
+    with _write_transaction(engine) as conn:
+        _ensure_version_table(conn)
+        tables = conn.execute(text(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' "
+            "AND name NOT LIKE 'sqlite_%' AND name != 'schema_migrations'"
+        )).scalar()
+        if tables:
+            return False
+        metadata.create_all(conn)
+        for version, description, fn in MIGRATIONS:
+            _record(conn, version, f"{description} (baseline)")
+    logger.info(f"Created schema version {MIGRATIONS[-1][0]} in an empty database")
+    return True
+
+
+def upgrade(engine, target=None, metadata=None):
+    """
+    Apply pending migrations up to `target` (default: latest). Returns applied
+    versions. Given the models' metadata, an empty database gets the current
+    schema directly.
+    """
+    if metadata is not None and target is None and _create_baseline(engine, metadata):
+        return [m[0] for m in MIGRATIONS]
+
+    applied = []
+    for version, description, fn in pending_migrations(engine):
+        if target is not None and version > target:
+            break
+        with _write_transaction(engine) as conn:
+            done = conn.execute(text("SELECT 1 FROM schema_migrations WHERE version = :v"),
+                                {'v': version}).first()
+            if not done:
+                fn(conn)
+                _record(conn, version, description)
+        if not done:
+            logger.info(f"Applied migration {version}: {description}")
+            applied.append(version)
+    return applied
+
+
+def check_schema(engine, metadata=None, auto_upgrade=True):
+    """
+    Startup check costing one version read. Brings an outdated database up to
+    date when auto_upgrade is set, otherwise raises SchemaOutOfDate. Returns
+    the schema version.
+    """
+    version = current_version(engine)
+    latest = MIGRATIONS[-1][0]
+    if version < latest:
+        if not auto_upgrade:
+            raise SchemaOutOfDate(f"Database schema is at version {version}, the code expects {latest}: "
+                                  f"run `flask --app app/app.py db-upgrade`")
+        upgrade(engine, metadata=metadata)
+        version = current_version(engine)
+    elif version > latest:
+        logger.warning(f"Database schema version {version} is newer than this code ({latest})")
+    return version
+
+
+def _table_exists(conn, table):
+    return conn.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :t"),
+                        {'t': table}).first() is not None
+
+
+def _column_exists(conn, table, column):
+    return any(row[1] == column for row in conn.execute(text(f"PRAGMA table_info({table})")))
+
+
+def _backup_rows(conn, table, where):
+    """Copy the rows of `table` matching `where` into migration_backup, as JSON. Returns the count."""
+    columns = [row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))]
+    fields = ', '.join(f"'{c}', {c}" for c in columns)
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS migration_backup ("
+        "id INTEGER PRIMARY KEY, source_table TEXT NOT NULL, row_data TEXT NOT NULL, removed_at TEXT NOT NULL)"
+    ))
+    return conn.execute(text(
+        f"INSERT INTO migration_backup (source_table, row_data, removed_at) "
+        f"SELECT :t, json_object({fields}), :now FROM {table} WHERE {where}"
+    ), {'t': table, 'now': datetime.now().isoformat(timespec='seconds')}).rowcount
+
+
+def _dedupe(conn, table, key_columns, keep='MAX(id)'):
+    """
+    Delete rows duplicating key_columns, keeping the row selected by `keep`.
+    The deleted rows are copied to migration_backup first.
+    """
+    keys = ', '.join(key_columns)
+    duplicates = f"id NOT IN (SELECT {keep} FROM {table} GROUP BY {keys})"
+    if not conn.execute(text(f"SELECT 1 FROM {table} WHERE {duplicates} LIMIT 1")).first():
+        return
+    _backup_rows(conn, table, duplicates)
+    deleted = conn.execute(text(f"DELETE FROM {table} WHERE {duplicates}")).rowcount
+    logger.warning(f"Removed {deleted} duplicate {table} rows on ({keys}); "
+                   f"they are kept in migration_backup (source_table = '{table}')")
+
+
+# =============================================================================
+# MIGRATIONS
+# =============================================================================
+
+@migration(1, 'Index pack for the hot relation tables')
+def _index_pack(conn):
+    # rel_lab_student and course_eligibility never had a uniqueness guarantee;
+    # keep the newest row of any duplicate before adding one
+    _dedupe(conn, 'rel_lab_student', ('am', 'lab_id'))
+    _dedupe(conn, 'course_eligibility', ('course_id', 'am'))
+
+    for statement in (
+        "CREATE INDEX IF NOT EXISTS ix_rel_group_student_group ON rel_group_student (group_id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_rel_lab_student_am_lab ON rel_lab_student (am, lab_id)",
+        "CREATE INDEX IF NOT EXISTS ix_rel_lab_student_lab ON rel_lab_student (lab_id)",
+        "CREATE INDEX IF NOT EXISTS ix_student_misses_pergroup_group ON student_misses_pergroup (group_id)",
+        "CREATE INDEX IF NOT EXISTS ix_rel_lab_group_group ON rel_lab_group (group_id)",
+        "CREATE INDEX IF NOT EXISTS ix_lab_groups_year ON lab_groups (year)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_course_eligibility_course_am ON course_eligibility (course_id, am)",
+        "CREATE INDEX IF NOT EXISTS ix_rel_group_prof_group ON rel_group_prof (group_id)",
+        "CREATE INDEX IF NOT EXISTS ix_rel_course_lab_lab ON rel_course_lab (lab_id)",
+        "CREATE INDEX IF NOT EXISTS ix_coursetoprof_prof ON coursetoprof (prof_id)",
+        "CREATE INDEX IF NOT EXISTS ix_professor_email ON professor (email)",
+    ):
+        conn.execute(text(statement))
+
+
+LEGACY_DATE_FORMATS = ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d.%m.%Y')
+
+
+def _parse_legacy_date(token):
+    for fmt in LEGACY_DATE_FORMATS:
+        try:
+            return datetime.strptime(token, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(token)
+
+
+@migration(2, 'Normalise absences into student_absence, one row per date')
+def _normalise_absences(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS student_absence ("
+        "id INTEGER NOT NULL, am INTEGER NOT NULL, group_id INTEGER NOT NULL, absence_date DATE NOT NULL, "
+        "PRIMARY KEY (id), CONSTRAINT ux_student_absence UNIQUE (am, group_id, absence_date))"
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_student_absence_group ON student_absence (group_id, am)"))
+
+    if not _table_exists(conn, 'student_misses_pergroup'):
+        return
+
+    absences, unparsed = [], []
+    for am, group_id, misses in conn.execute(text("SELECT am, group_id, misses FROM student_misses_pergroup")):
+        bad = []
+        for token in (misses or '').split(','):
+            token = token.strip()
+            if not token:
+                continue
+            try:
+                absences.append({'am': am, 'g': group_id, 'd': _parse_legacy_date(token).isoformat()})
+            except ValueError:
+                bad.append(token)
+        if bad:
+            unparsed.append({'am': am, 'g': group_id, 'm': ', '.join(bad)})
+
+    if absences:
+        conn.execute(text("INSERT OR IGNORE INTO student_absence (am, group_id, absence_date) VALUES (:am, :g, :d)"),
+                     absences)
+    logger.info(f"Migrated {len(absences)} absence dates to student_absence")
+
+    if unparsed:
+        # Keep what could not be read as a date for manual review, drop the rest
+        conn.execute(text("DELETE FROM student_misses_pergroup"))
+        conn.execute(text("INSERT INTO student_misses_pergroup (am, group_id, misses) VALUES (:am, :g, :m)"),
+                     unparsed)
+        logger.warning(f"{len(unparsed)} student_misses_pergroup rows kept: dates could not be parsed")
+    else:
+        conn.execute(text("DROP TABLE student_misses_pergroup"))
+
+
+@migration(3, 'Store course_lab.reg_limit as a nullable, indexed DATE')
+def _reg_limit_as_date(conn):
+    # reg_limit was free text (dd/mm/yyyy from the admin form, yyyy-mm-dd from
+    # older imports). SQLite cannot alter a column type: rebuild the table.
+    rows = conn.execute(text("SELECT lab_id, reg_limit FROM course_lab")).all()
+    deadlines, unreadable = [], []
+    for lab_id, reg_limit in rows:
+        value = (reg_limit or '').strip()
+        if not value:
+            continue
+        try:
+            deadlines.append({'id': lab_id, 'd': _parse_legacy_date(value).isoformat()})
+        except ValueError:
+            unreadable.append(lab_id)
+            logger.warning(f"course_lab {lab_id}: unreadable reg_limit '{value}' kept in migration_backup, "
+                           f"lab has no deadline")
+    if unreadable:
+        # The original text stays available so an admin can set the deadline again
+        _backup_rows(conn, 'course_lab', f"lab_id IN ({', '.join(str(int(i)) for i in unreadable)})")
+
+    conn.execute(text(
+        "CREATE TABLE course_lab_new ("
+        "lab_id INTEGER NOT NULL, name TEXT NOT NULL, description TEXT NOT NULL, maxusers INTEGER NOT NULL, "
+        "reg_limit DATE, max_misses INTEGER NOT NULL, PRIMARY KEY (lab_id))"
+    ))
+    conn.execute(text(
+        "INSERT INTO course_lab_new (lab_id, name, description, maxusers, reg_limit, max_misses) "
+        "SELECT lab_id, name, description, maxusers, NULL, max_misses FROM course_lab"
+    ))
+    if deadlines:
+        conn.execute(text("UPDATE course_lab_new SET reg_limit = :d WHERE lab_id = :id"), deadlines)
+    conn.execute(text("DROP TABLE course_lab"))
+    conn.execute(text("ALTER TABLE course_lab_new RENAME TO course_lab"))
+    conn.execute(text("CREATE INDEX ix_course_lab_reg_limit ON course_lab (reg_limit)"))
+
+
+@migration(4, 'Add lab_groups.enrolled_count, maintained on every enrollment change')
+def _enrolled_count(conn):
+    if not _column_exists(conn, 'lab_groups', 'enrolled_count'):
+        conn.execute(text("ALTER TABLE lab_groups ADD COLUMN enrolled_count INTEGER NOT NULL DEFAULT 0"))
+    conn.execute(text(
+        "UPDATE lab_groups SET enrolled_count = "
+        "(SELECT COUNT(*) FROM rel_group_student r WHERE r.group_id = lab_groups.group_id)"
+    ))
+
+
+@migration(5, 'Create audit_log, previously left to db.create_all() at startup')
+def _audit_log(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS audit_log ("
+        "id INTEGER NOT NULL, timestamp DATETIME NOT NULL, user_id TEXT NOT NULL, user_role TEXT NOT NULL, "
+        "action TEXT NOT NULL, target_type TEXT, target_id TEXT, ip_address TEXT, old_value TEXT, "
+        "new_value TEXT, reason TEXT, PRIMARY KEY (id))"
+    ))
+    for name, columns in (
+        ('ix_audit_log_timestamp', 'timestamp, id'),
+        ('ix_audit_log_user', 'user_id, timestamp, id'),
+        ('ix_audit_log_action', 'action, timestamp, id'),
+        ('ix_audit_log_target', 'target_type, target_id, timestamp, id'),
+    ):
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON audit_log ({columns})"))
+
+
+# Relation tables and their references: column -> (parent table, parent key, ON DELETE).
+# CASCADE removes links that mean nothing without the parent; RESTRICT makes
+# the database refuse deletes the admin endpoints used to refuse after a count.
+RELATION_FOREIGN_KEYS = {
+    'coursetoprof': (
+        "course_id INTEGER NOT NULL, prof_id INTEGER NOT NULL, PRIMARY KEY (course_id, prof_id)",
+        {'course_id': ('coursename', 'course_id', 'CASCADE'), 'prof_id': ('professor', 'prof_id', 'CASCADE')},
+    ),
+    'rel_course_lab': (
+        "course_id INTEGER NOT NULL, lab_id INTEGER NOT NULL, PRIMARY KEY (course_id, lab_id)",
+        {'course_id': ('coursename', 'course_id', 'RESTRICT'), 'lab_id': ('course_lab', 'lab_id', 'CASCADE')},
+    ),
+    'rel_lab_group': (
+        "lab_id INTEGER NOT NULL, group_id INTEGER NOT NULL, PRIMARY KEY (lab_id, group_id)",
+        {'lab_id': ('course_lab', 'lab_id', 'RESTRICT'), 'group_id': ('lab_groups', 'group_id', 'CASCADE')},
+    ),
+    'rel_group_prof': (
+        "prof_id INTEGER NOT NULL, group_id INTEGER NOT NULL, PRIMARY KEY (prof_id, group_id)",
+        {'prof_id': ('professor', 'prof_id', 'RESTRICT'), 'group_id': ('lab_groups', 'group_id', 'CASCADE')},
+    ),
+    'rel_group_student': (
+        "am INTEGER NOT NULL, group_id INTEGER NOT NULL, group_reg_daymonth TEXT NOT NULL, "
+        "group_reg_year INTEGER NOT NULL, PRIMARY KEY (am, group_id)",
+        {'am': ('student', 'am', 'CASCADE'), 'group_id': ('lab_groups', 'group_id', 'RESTRICT')},
+    ),
+    'rel_lab_student': (
+        "id INTEGER NOT NULL, am INTEGER NOT NULL, lab_id INTEGER NOT NULL, misses INTEGER NOT NULL, "
+        "grade INTEGER NOT NULL, reg_month INTEGER NOT NULL, reg_year INTEGER NOT NULL, status TEXT NOT NULL, "
+        "PRIMARY KEY (id)",
+        {'am': ('student', 'am', 'CASCADE'), 'lab_id': ('course_lab', 'lab_id', 'RESTRICT')},
+    ),
+    'student_absence': (
+        "id INTEGER NOT NULL, am INTEGER NOT NULL, group_id INTEGER NOT NULL, absence_date DATE NOT NULL, "
+        "PRIMARY KEY (id), CONSTRAINT ux_student_absence UNIQUE (am, group_id, absence_date)",
+        {'am': ('student', 'am', 'CASCADE'), 'group_id': ('lab_groups', 'group_id', 'CASCADE')},
+    ),
+    # Eligibility lists are imported before the students ever log in: no key on am
+    'course_eligibility': (
+        "id INTEGER NOT NULL, course_id INTEGER NOT NULL, am INTEGER NOT NULL, PRIMARY KEY (id)",
+        {'course_id': ('coursename', 'course_id', 'CASCADE')},
+    ),
+    # Only left on databases with absences migration 2 could not parse
+    'student_misses_pergroup': (
+        "am INTEGER NOT NULL, group_id INTEGER NOT NULL, misses TEXT NOT NULL, PRIMARY KEY (am, group_id)",
+        {'am': ('student', 'am', 'CASCADE'), 'group_id': ('lab_groups', 'group_id', 'CASCADE')},
+    ),
+}
+
+
+def orphan_report(conn, tables=RELATION_FOREIGN_KEYS):
+    """{(table, column): rows whose column points at no parent row}, non-zero counts only."""
+    report = {}
+    for table, (_, references) in tables.items():
+        if not _table_exists(conn, table):
+            continue
+        for column, (parent, key, _) in references.items():
+            count = conn.execute(text(
+                f"SELECT COUNT(*) FROM {table} WHERE NOT EXISTS "
+                f"(SELECT 1 FROM {parent} WHERE {parent}.{key} = {table}.{column})"
+            )).scalar()
+            if count:
+                report[table, column] = count
+    return report
+
+
+@migration(6, 'Foreign keys with ON DELETE CASCADE/RESTRICT on the relation tables')
+def _relation_foreign_keys(conn):
+    report = orphan_report(conn)
+    for (table, column), count in report.items():
+        parent, key, _ = RELATION_FOREIGN_KEYS[table][1][column]
+        orphans = f"NOT EXISTS (SELECT 1 FROM {parent} WHERE {parent}.{key} = {table}.{column})"
+        logger.warning(f"Removing {count} orphan {table} rows: {column} not in {parent}.{key}; "
+                       f"they are kept in migration_backup (source_table = '{table}')")
+        _backup_rows(conn, table, orphans)
+        conn.execute(text(f"DELETE FROM {table} WHERE {orphans}"))
+
+    # SQLite cannot add a constraint to an existing table: rebuild each one
+    for table, (columns, references) in RELATION_FOREIGN_KEYS.items():
+        if not _table_exists(conn, table):
+            continue
+        indexes = conn.execute(text(
+            "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = :t AND sql IS NOT NULL"
+        ), {'t': table}).scalars().all()
+        keys = ''.join(f", FOREIGN KEY({column}) REFERENCES {parent} ({key}) ON DELETE {action}"
+                       for column, (parent, key, action) in references.items())
+        conn.execute(text(f"CREATE TABLE {table}_new ({columns}{keys})"))
+        names = ', '.join(row[1] for row in conn.execute(text(f"PRAGMA table_info({table}_new)")))
+        conn.execute(text(f"INSERT INTO {table}_new ({names}) SELECT {names} FROM {table}"))
+        conn.execute(text(f"DROP TABLE {table}"))
+        conn.execute(text(f"ALTER TABLE {table}_new RENAME TO {table}"))
+        for sql in indexes:
+            conn.execute(text(sql))
+
+    if ('rel_group_student', 'am') in report or ('rel_group_student', 'group_id') in report:
+        conn.execute(text(
+            "UPDATE lab_groups SET enrolled_count = "
+            "(SELECT COUNT(*) FROM rel_group_student r WHERE r.group_id = lab_groups.group_id)"
+        ))
+
+
+@migration(7, 'Ranked group preferences and a per-lab allocation mode')
+def _group_preferences(conn):
+    if not _column_exists(conn, 'course_lab', 'allocation'):
+        conn.execute(text("ALTER TABLE course_lab ADD COLUMN allocation TEXT NOT NULL DEFAULT 'fcfs'"))
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS group_preference ("
+        "lab_id INTEGER NOT NULL, am INTEGER NOT NULL, rank INTEGER NOT NULL, group_id INTEGER NOT NULL, "
+        "submitted_at DATETIME NOT NULL, PRIMARY KEY (lab_id, am, rank), "
+        "FOREIGN KEY(lab_id) REFERENCES course_lab (lab_id) ON DELETE CASCADE, "
+        "FOREIGN KEY(am) REFERENCES student (am) ON DELETE CASCADE, "
+        "FOREIGN KEY(group_id) REFERENCES lab_groups (group_id) ON DELETE CASCADE) WITHOUT ROWID"
+    ))
+
+
+@migration(8, 'Per-group FIFO waitlist')
+def _group_waitlist(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS group_waitlist ("
+        "seq INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, group_id INTEGER NOT NULL, lab_id INTEGER NOT NULL, "
+        "am INTEGER NOT NULL, joined_at DATETIME NOT NULL, "
+        "CONSTRAINT ux_group_waitlist_am_lab UNIQUE (am, lab_id), "
+        "FOREIGN KEY(group_id) REFERENCES lab_groups (group_id) ON DELETE CASCADE, "
+        "FOREIGN KEY(lab_id) REFERENCES course_lab (lab_id) ON DELETE CASCADE, "
+        "FOREIGN KEY(am) REFERENCES student (am) ON DELETE CASCADE)"
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_group_waitlist_group ON group_waitlist (group_id, seq)"))
+
+
+@migration(9, 'Registration admission tickets shared by all workers')
+def _registration_tickets(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS registration_ticket ("
+        "ticket_id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, am INTEGER NOT NULL, action TEXT NOT NULL, "
+        "payload TEXT NOT NULL, state TEXT NOT NULL, issued_at DATETIME NOT NULL, touched_at DATETIME NOT NULL, "
+        "status_code INTEGER, result TEXT)"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_registration_ticket_state ON registration_ticket (state, ticket_id)"
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_registration_ticket_am ON registration_ticket (am)"))
+
+
+@migration(10, 'Index student_misses_pergroup where the table is still present')
+def _index_legacy_absences(conn):
+    # Migration 2 keeps the table when some absence dates could not be converted
+    if _table_exists(conn, 'student_misses_pergroup'):
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_student_misses_pergroup_group ON student_misses_pergroup (group_id)"
+        ))
@@ -1,11 +1,123 @@
+import os
+
+from flask import current_app, has_request_context, request
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_login import UserMixin
+from sqlalchemy import UpdateBase, TextClause, create_engine, event
+from sqlalchemy.engine import make_url
+
+# app.extensions key of the read-only engine serving GET/HEAD requests
+READONLY_ENGINE = 'sqlite_readonly'
+READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingSession(Session):
+    """
+    Sends the reads of GET/HEAD requests to the read-only engine, so they run
+    on their own connections next to the writer instead of queueing for the
+    primary pool. Flushes, INSERT/UPDATE/DELETE and raw SQL go to the primary
+    engine; once a session has written it stays there and reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self.info.get('wrote'):
+            if self._flushing or isinstance(clause, (UpdateBase, TextClause)):
+                self.info['wrote'] = True
+            elif has_request_context() and request.method in READ_ONLY_METHODS:
+                engine = current_app.extensions.get(READONLY_ENGINE)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Pragmas applied to every new SQLite connection, selected by SQLITE_PROFILE.
+# journal_mode=WAL persists in the database file; the rest are per connection.
+# Every connection enforces foreign keys whatever the profile: the admin
+# deletes rely on their ON DELETE RESTRICT / CASCADE actions
+REQUIRED_PRAGMAS = {'foreign_keys': 'ON'}
+
+SQLITE_PROFILES = {
+    # SQLite defaults: rollback journal, synchronous=FULL, no busy timeout
+    'legacy': {},
+    # Concurrent readers and durable commits
+    'safe': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+    },
+    # WAL with synchronous=NORMAL: a power loss can drop the last commits but
+    # never corrupts the database. Bigger page cache and memory-mapped reads.
+    'performance': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -65536,       # KiB, i.e. 64 MiB
+        'mmap_size': 268435456,     # 256 MiB
+        'temp_store': 'MEMORY',
+    },
+}
+
+def sqlite_pragmas(app):
+    """
+    Pragmas for the configured profile, with SQLITE_PRAGMAS overrides on top.
+    Raises ValueError if the overrides turn off a required pragma.
+    """
+    profile = app.config.get('SQLITE_PROFILE', 'performance')
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE '{profile}', expected one of {sorted(SQLITE_PROFILES)}")
+    pragmas = dict(REQUIRED_PRAGMAS)
+    pragmas.update(SQLITE_PROFILES[profile])
+    pragmas.update(app.config.get('SQLITE_PRAGMAS', {}))
+    for name, value in REQUIRED_PRAGMAS.items():
+        if str(pragmas[name]).upper() not in (value, '1', 'TRUE', 'YES'):
+            raise ValueError(f"SQLITE_PRAGMAS cannot set {name} = {pragmas[name]}: "
+                             f"the schema's ON DELETE actions need {name} = {value}")
+    return pragmas
+
+def readonly_url(app):
+    """mode=ro URI for the app's SQLite file, or None if there is no file to share."""
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:') or url.query.get('uri'):
+        return None
+    path = url.database if os.path.isabs(url.database) else os.path.join(app.instance_path, url.database)
+    return f'sqlite:///file:{path}?mode=ro&uri=true'
 
 def init_app(app):
     db.init_app(app)
 
+    with app.app_context():
+        engine = db.engine
+    readonly = None
+    ro_url = readonly_url(app) if app.config.get('SQLITE_READONLY_ENGINE', True) else None
+    if ro_url:
+        pool_size = app.config.get('SQLITE_READONLY_POOL_SIZE', 4)
+        readonly = app.extensions[READONLY_ENGINE] = create_engine(
+            ro_url, pool_size=pool_size, max_overflow=pool_size)
+
+    pragmas = sqlite_pragmas(app)
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    def apply_on_connect(engine, pragmas):
+        @event.listens_for(engine, 'connect')
+        def _apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+            cursor.close()
+
+    apply_on_connect(engine, pragmas)
+    if readonly is not None:
+        # The journal mode is a property of the file, set by the writer
+        apply_on_connect(readonly, {k: v for k, v in pragmas.items() if k != 'journal_mode'})
+
+# Every schema change here (tables, columns, __table_args__ indexes) also needs
+# a migration in migrations.py: only empty databases are created from these
+# models, existing files change through migrations alone.
+
 class Coursename(db.Model):
     __tablename__ = 'coursename'
     course_id = db.Column(db.Integer, primary_key=True)
@@ -15,8 +127,10 @@ class Coursename(db.Model):
 
 class Coursetoprof(db.Model):
     __tablename__ = 'coursetoprof'
-    course_id = db.Column(db.Integer, primary_key=True)
-    prof_id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('coursename.course_id', ondelete='CASCADE'), primary_key=True)
+    prof_id = db.Column(db.Integer, db.ForeignKey('professor.prof_id', ondelete='CASCADE'), primary_key=True)
+
+    __table_args__ = (db.Index('ix_coursetoprof_prof', 'prof_id'),)
 
 class CourseLab(db.Model):
     __tablename__ = 'course_lab'
@@ -24,8 +138,13 @@ class CourseLab(db.Model):
     name = db.Column(db.Text, nullable=False)
     description = db.Column(db.Text, nullable=False)
     maxusers = db.Column(db.Integer, nullable=False)
-    reg_limit = db.Column(db.Text, nullable=False)
+    reg_limit = db.Column(db.Date)  # last day of registration; NULL means no deadline
     max_misses = db.Column(db.Integer, nullable=False)
+    # 'fcfs': students register into groups directly; 'preferences': they rank
+    # groups until reg_limit and allocation.allocate_lab assigns them afterwards
+    allocation = db.Column(db.Text, nullable=False, default='fcfs', server_default='fcfs')
+
+    __table_args__ = (db.Index('ix_course_lab_reg_limit', 'reg_limit'),)
 
 class LabGroup(db.Model):
     __tablename__ = 'lab_groups'
@@ -33,6 +152,10 @@ class LabGroup(db.Model):
     daytime = db.Column(db.Text, nullable=False)
     year = db.Column(db.Integer, nullable=False)
     finalize = db.Column(db.Text, nullable=False)
+    # Denormalised COUNT(*) of rel_group_student; see auth.adjust_enrolled_count
+    enrolled_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    __table_args__ = (db.Index('ix_lab_groups_year', 'year'),)
 
 class Professor(db.Model):
     __tablename__ = 'professor'
@@ -43,39 +166,54 @@ class Professor(db.Model):
     email = db.Column(db.Text, nullable=False)
     tel = db.Column(db.Text, nullable=False)
 
+    __table_args__ = (db.Index('ix_professor_email', 'email'),)
+
 class RelCourseLab(db.Model):
     __tablename__ = 'rel_course_lab'
-    course_id = db.Column(db.Integer, primary_key=True)
-    lab_id = db.Column(db.Integer, primary_key=True)
+    course_id = db.Column(db.Integer, db.ForeignKey('coursename.course_id', ondelete='RESTRICT'), primary_key=True)
+    lab_id = db.Column(db.Integer, db.ForeignKey('course_lab.lab_id', ondelete='CASCADE'), primary_key=True)
+
+    __table_args__ = (db.Index('ix_rel_course_lab_lab', 'lab_id'),)
 
 class RelGroupProf(db.Model):
     __tablename__ = 'rel_group_prof'
-    prof_id = db.Column(db.Integer, primary_key=True)
-    group_id = db.Column(db.Integer, primary_key=True)
+    prof_id = db.Column(db.Integer, db.ForeignKey('professor.prof_id', ondelete='RESTRICT'), primary_key=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('lab_groups.group_id', ondelete='CASCADE'), primary_key=True)
+
+    __table_args__ = (db.Index('ix_rel_group_prof_group', 'group_id'),)
 
 class RelGroupStudent(db.Model):
     __tablename__ = 'rel_group_student'
-    am = db.Column(db.Integer, primary_key=True)
-    group_id = db.Column(db.Integer, primary_key=True)
+    am = db.Column(db.Integer, db.ForeignKey('student.am', ondelete='CASCADE'), primary_key=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('lab_groups.group_id', ondelete='RESTRICT'), primary_key=True)
     group_reg_daymonth = db.Column(db.Text, nullable=False)
     group_reg_year = db.Column(db.Integer, nullable=False)
 
+    __table_args__ = (db.Index('ix_rel_group_student_group', 'group_id'),)
+
 class RelLabGroup(db.Model):
     __tablename__ = 'rel_lab_group'
-    lab_id = db.Column(db.Integer, primary_key=True)
-    group_id = db.Column(db.Integer, primary_key=True)
+    lab_id = db.Column(db.Integer, db.ForeignKey('course_lab.lab_id', ondelete='RESTRICT'), primary_key=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('lab_groups.group_id', ondelete='CASCADE'), primary_key=True)
+
+    __table_args__ = (db.Index('ix_rel_lab_group_group', 'group_id'),)
 
 class RelLabStudent(db.Model):
     __tablename__ = 'rel_lab_student'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    am = db.Column(db.Integer, nullable=False)
-    lab_id = db.Column(db.Integer, nullable=False)
+    am = db.Column(db.Integer, db.ForeignKey('student.am', ondelete='CASCADE'), nullable=False)
+    lab_id = db.Column(db.Integer, db.ForeignKey('course_lab.lab_id', ondelete='RESTRICT'), nullable=False)
     misses = db.Column(db.Integer, nullable=False)
     grade = db.Column(db.Integer, nullable=False)
     reg_month = db.Column(db.Integer, nullable=False)
     reg_year = db.Column(db.Integer, nullable=False)
     status = db.Column(db.Text, nullable=False)
 
+    __table_args__ = (
+        db.Index('ux_rel_lab_student_am_lab', 'am', 'lab_id', unique=True),
+        db.Index('ix_rel_lab_student_lab', 'lab_id'),
+    )
+
 class Student(UserMixin, db.Model):
     __tablename__ = 'student'
     am = db.Column(db.Integer, primary_key=True)
@@ -90,15 +228,99 @@ class Student(UserMixin, db.Model):
     def check_password(self, password):
         return self.pwd == password
 
-class StudentMissesPerGroup(db.Model):
-    __tablename__ = 'student_misses_pergroup'
-    am = db.Column(db.Integer, primary_key=True)
-    group_id = db.Column(db.Integer, primary_key=True)
-    misses = db.Column(db.Text, nullable=False)
+class StudentAbsence(db.Model):
+    """One row per absence; replaces the comma-joined student_misses_pergroup.misses."""
+    __tablename__ = 'student_absence'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    am = db.Column(db.Integer, db.ForeignKey('student.am', ondelete='CASCADE'), nullable=False)
+    group_id = db.Column(db.Integer, db.ForeignKey('lab_groups.group_id', ondelete='CASCADE'), nullable=False)
+    absence_date = db.Column(db.Date, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('am', 'group_id', 'absence_date', name='ux_student_absence'),
+        db.Index('ix_student_absence_group', 'group_id', 'am'),
+    )
+
+
+class GroupPreference(db.Model):
+    """A student's ranked choice of group (rank 1 = first choice) in a preference-allocated lab."""
+    __tablename__ = 'group_preference'
+    # Keyed by lab first and stored in key order (WITHOUT ROWID): the allocator
+    # reads and deletes a whole lab as one range of a single b-tree
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    lab_id = db.Column(db.Integer, db.ForeignKey('course_lab.lab_id', ondelete='CASCADE'), primary_key=True)
+    am = db.Column(db.Integer, db.ForeignKey('student.am', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('lab_groups.group_id', ondelete='CASCADE'), nullable=False)
+    submitted_at = db.Column(db.DateTime, nullable=False)
+
+
+class GroupWaitlist(db.Model):
+    """A student waiting for a seat in a full group; served in seq (FIFO) order."""
+    __tablename__ = 'group_waitlist'
+    # AUTOINCREMENT: a seq is never reused, so a later joiner always sorts last
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('lab_groups.group_id', ondelete='CASCADE'), nullable=False)
+    lab_id = db.Column(db.Integer, db.ForeignKey('course_lab.lab_id', ondelete='CASCADE'), nullable=False)
+    am = db.Column(db.Integer, db.ForeignKey('student.am', ondelete='CASCADE'), nullable=False)
+    joined_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('am', 'lab_id', name='ux_group_waitlist_am_lab'),
+        db.Index('ix_group_waitlist_group', 'group_id', 'seq'),
+        {'sqlite_autoincrement': True},
+    )
+
+
+class RegistrationTicket(db.Model):
+    """A registration request in the admission queue (see admission.py); rows expire after an hour."""
+    __tablename__ = 'registration_ticket'
+    ticket_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    am = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.Text, nullable=False)  # name of the admitted view
+    payload = db.Column(db.Text, nullable=False)  # the request's JSON body
+    state = db.Column(db.Text, nullable=False)  # waiting | running | done
+    issued_at = db.Column(db.DateTime, nullable=False)
+    touched_at = db.Column(db.DateTime, nullable=False)  # last poll, start or finish
+    status_code = db.Column(db.Integer)
+    result = db.Column(db.Text)  # the JSON response once done
+
+    __table_args__ = (
+        db.Index('ix_registration_ticket_state', 'state', 'ticket_id'),
+        db.Index('ix_registration_ticket_am', 'am'),
+        {'sqlite_autoincrement': True},
+    )
 
 
 class CourseEligibility(db.Model):
     __tablename__ = 'course_eligibility'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    course_id = db.Column(db.Integer, nullable=False)
-    am = db.Column(db.Integer, nullable=False)
\ No newline at end of file
+    course_id = db.Column(db.Integer, db.ForeignKey('coursename.course_id', ondelete='CASCADE'), nullable=False)
+    am = db.Column(db.Integer, nullable=False)  # not a key: lists are imported before students log in
+
+    __table_args__ = (db.Index('ux_course_eligibility_course_am', 'course_id', 'am', unique=True),)
+
+
+class AuditEntry(db.Model):
+    """Persisted audit trail, written in batches by the background audit writer."""
+    __tablename__ = 'audit_log'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    timestamp = db.Column(db.DateTime, nullable=False)
+    user_id = db.Column(db.Text, nullable=False)
+    user_role = db.Column(db.Text, nullable=False)
+    action = db.Column(db.Text, nullable=False)
+    target_type = db.Column(db.Text)
+    target_id = db.Column(db.Text)
+    ip_address = db.Column(db.Text)
+    old_value = db.Column(db.Text)
+    new_value = db.Column(db.Text)
+    reason = db.Column(db.Text)
+
+    # Each index ends in (timestamp, id) so filtered listings are keyset scans
+    __table_args__ = (
+        db.Index('ix_audit_log_timestamp', 'timestamp', 'id'),
+        db.Index('ix_audit_log_user', 'user_id', 'timestamp', 'id'),
+        db.Index('ix_audit_log_action', 'action', 'timestamp', 'id'),
+        db.Index('ix_audit_log_target', 'target_type', 'target_id', 'timestamp', 'id'),
+    )
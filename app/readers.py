@@ -0,0 +1,76 @@
+"""
+Read-only row projections for listing pages and endpoints.
+
+Each reader runs one Core SELECT for exactly the columns its page or endpoint
+shows and returns namedtuples. Nothing goes through the ORM: no instances are
+built, registered in the identity map or watched by the unit of work, and the
+rows stay valid after the session is closed. Templates use the same attribute
+names as the models, and ``row._asdict()`` gives the JSON shape.
+"""
+from collections import namedtuple
+
+from sqlalchemy import select
+
+from models import db, Coursename, CourseLab, LabGroup, Professor, Student
+
+StudentRow = namedtuple('StudentRow', 'am name semester email')
+ProfessorRow = namedtuple('ProfessorRow', 'prof_id name status office email tel')
+LabRow = namedtuple('LabRow', 'lab_id name description maxusers reg_limit')
+CourseRow = namedtuple('CourseRow', 'course_id name semester')
+GroupRow = namedtuple('GroupRow', 'group_id daytime year finalize')
+LabChoice = namedtuple('LabChoice', 'lab_id name')
+ProfessorChoice = namedtuple('ProfessorChoice', 'prof_id name')
+
+_students = Student.__table__.c
+_professors = Professor.__table__.c
+_labs = CourseLab.__table__.c
+_courses = Coursename.__table__.c
+_groups = LabGroup.__table__.c
+
+
+def _fetch(row_type, stmt):
+    """Run a Core select and wrap each result tuple in row_type."""
+    make = row_type._make
+    return [make(row) for row in db.session.execute(stmt)]
+
+
+def student_rows():
+    """All students, by AM."""
+    return _fetch(StudentRow, select(_students.am, _students.name, _students.semester, _students.email)
+                  .order_by(_students.am))
+
+
+def professor_rows():
+    """All professors, by ID."""
+    return _fetch(ProfessorRow, select(_professors.prof_id, _professors.name, _professors.status,
+                                       _professors.office, _professors.email, _professors.tel)
+                  .order_by(_professors.prof_id))
+
+
+def lab_rows():
+    """All labs, by ID; reg_limit is a date (or None)."""
+    return _fetch(LabRow, select(_labs.lab_id, _labs.name, _labs.description, _labs.maxusers,
+                                 _labs.reg_limit)
+                  .order_by(_labs.lab_id))
+
+
+def course_rows():
+    """All courses, by semester and name."""
+    return _fetch(CourseRow, select(_courses.course_id, _courses.name, _courses.semester)
+                  .order_by(_courses.semester, _courses.name))
+
+
+def group_rows():
+    """All lab groups, by ID."""
+    return _fetch(GroupRow, select(_groups.group_id, _groups.daytime, _groups.year, _groups.finalize)
+                  .order_by(_groups.group_id))
+
+
+def lab_choices():
+    """(lab_id, name) of every lab, by name, for select boxes."""
+    return _fetch(LabChoice, select(_labs.lab_id, _labs.name).order_by(_labs.name))
+
+
+def professor_choices():
+    """(prof_id, name) of every professor, by name, for select boxes."""
+    return _fetch(ProfessorChoice, select(_professors.prof_id, _professors.name).order_by(_professors.name))
@@ -1,23 +1,40 @@
-from flask import Blueprint, request, session, jsonify, Response
+from flask import Blueprint, request, session, jsonify, Response, current_app, g, make_response, url_for
 from flask_babel import _
 from datetime import datetime
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.exc import IntegrityError
 import csv
+import functools
 import io
+import json
 
 from models import (
     Student, Professor, db, LabGroup, CourseLab, RelGroupStudent,
     Coursename, RelCourseLab, RelLabGroup, RelLabStudent,
-    StudentMissesPerGroup, RelGroupProf, CourseEligibility, Coursetoprof
+    StudentAbsence, RelGroupProf, CourseEligibility,
+    AuditEntry, GroupPreference
 )
 from auth import (
-    require_permission, audit_log, mask_pii,
-    transactional_enrollment, record_absence,
-    get_academic_year, validate_registration_period,
-    get_student_lab_status,
-    register_student_to_lab, change_student_group, get_student_enrollments,
+    require_permission, require_role, audit_log, mask_pii, invalidate_user_role,
+    record_absence,
+    parse_date, format_date, add_absence, remove_absence,
+    get_absence_dates, count_absences,
+    get_academic_year, validate_registration_period, registration_deadlines,
+    get_student_lab_status, adjust_enrolled_count,
+    register_student_to_lab, change_student_group, get_student_enrollments, bulk_enroll_students,
+    invalidate_student_enrollments, clear_student_enrollments,
+    join_waitlist, leave_waitlist, get_student_waitlists, promote_waitlisted, waitlist_committed,
     STATUS_FAILED, STATUS_IN_PROGRESS, STATUS_COMPLETED
 )
-from helpers import get_group_occupancy, get_student_notifications
+from helpers import (
+    get_group_occupancy, get_student_notifications,
+    professor_owns_group, invalidate_professor_groups, invalidate_professor_email
+)
+from readers import group_rows, professor_rows
+from cache import cache_stats
+from admission import RegistrationBusy
+from idempotency import idempotent
+from allocation import ALLOCATION_MODES, MAX_RANKED_GROUPS, allocate_lab
 
 api_bp = Blueprint('api_bp', __name__)
 
@@ -82,7 +99,7 @@ def get_labs_by_course(course_id):
             'name': lab.name,
             'description': lab.description,
             'maxusers': lab.maxusers,
-            'reg_limit': lab.reg_limit,
+            'reg_limit': format_date(lab.reg_limit),
             'max_misses': lab.max_misses
         } for lab in labs]
     })
@@ -118,7 +135,7 @@ def get_groups_by_lab(lab_id):
         'success': True,
         'lab_id': lab_id,
         'lab_name': lab.name if lab else None,
-        'reg_limit': lab.reg_limit if lab else None,
+        'reg_limit': format_date(lab.reg_limit) if lab else None,
         'registration_open': period_valid,
         'registration_message': period_msg,
         'academic_year': year,
@@ -140,10 +157,91 @@ def get_current_academic_year():
 # REGISTRATION APIs
 # =============================================================================
 
+# Seconds a rejected client is told to wait before retrying
+REGISTRATION_RETRY_AFTER = 5
+# Seconds between polls of a queued registration's ticket; tickets close to
+# the head poll faster so a freed slot is not left idle for long
+REGISTRATION_POLL_AFTER = 1
+REGISTRATION_POLL_NEAR_HEAD = 0.2
+
+# Views behind the admission controller, by name, so a ticket can run them later
+_admitted_views = {}
+
+
+def _request_data():
+    """JSON body of the request, or the queued body when an admitted ticket runs the view."""
+    if 'admitted_payload' in g:
+        return g.admitted_payload
+    return request.get_json()
+
+
+def _run_admitted(controller, ticket):
+    """Run an admitted ticket's view and store its response on the ticket."""
+    g.admitted_payload = ticket.payload
+    try:
+        response = make_response(_admitted_views[ticket.action]())
+    except Exception:
+        db.session.rollback()
+        controller.finish(ticket.ticket_id, 500, json.dumps({'success': False, 'message': 'Internal error'}))
+        raise
+    controller.finish(ticket.ticket_id, response.status_code, response.get_data(as_text=True))
+    return response
+
+
+def _queued_response(ticket, controller):
+    near_head = ticket.position <= 2 * controller.max_in_flight
+    return jsonify({
+        'success': True,
+        'queued': True,
+        'message': _('Η αίτησή σας βρίσκεται σε αναμονή.'),
+        'ticket': ticket.ticket_id,
+        'position': ticket.position,
+        'waiting': ticket.waiting,
+        'poll_after': REGISTRATION_POLL_NEAR_HEAD if near_head else REGISTRATION_POLL_AFTER,
+        'status_url': url_for('api_bp.api_registration_ticket', ticket_id=ticket.ticket_id)
+    }), 202, {'Retry-After': str(REGISTRATION_POLL_AFTER)}
+
+
+def _admit(action, payload):
+    """
+    Run the admission-controlled view `action` on payload now if the
+    registration admission controller has a free slot, else answer 202 with
+    a ticket to poll (see admission.py).
+    """
+    controller = current_app.extensions.get('admission')
+    student_am = _as_int(session.get('schGrAcPersonID'))
+    if controller is None or student_am is None or not payload:
+        g.admitted_payload = payload
+        return _admitted_views[action]()  # a missing body is rejected by the view's own checks
+    try:
+        ticket = controller.admit(student_am, action, payload)
+    except RegistrationBusy as e:
+        return jsonify({
+            'success': False,
+            'message': _('Πολλές ταυτόχρονες αιτήσεις εγγραφής. Προσπαθήστε ξανά σε λίγα δευτερόλεπτα.'),
+            'details': {'error_type': 'busy', 'reason': e.reason, 'position': e.position}
+        }), 503, {'Retry-After': str(REGISTRATION_RETRY_AFTER)}
+    if ticket.state == 'admitted':
+        return _run_admitted(controller, ticket)
+    return _queued_response(ticket, controller)
+
+
+def admission_controlled(view):
+    """Send the view's JSON body through the registration admission controller."""
+    _admitted_views[view.__name__] = view
+
+    @functools.wraps(view)
+    def wrapper():
+        return _admit(view.__name__, request.get_json(silent=True))
+    return wrapper
+
+
 @api_bp.route('/api/register-lab', methods=['POST'])
 @require_permission('registrations', 'create')
+@idempotent
+@admission_controlled
 def api_register_lab():
-    data = request.get_json()
+    data = _request_data()
     if not data:
         return jsonify({'success': False, 'message': 'No data provided'}), 400
 
@@ -167,8 +265,10 @@ def api_register_lab():
 
 @api_bp.route('/api/change-group', methods=['PUT'])
 @require_permission('registrations', 'create')
+@idempotent
+@admission_controlled
 def api_change_group():
-    data = request.get_json()
+    data = _request_data()
     if not data:
         return jsonify({'success': False, 'message': 'No data provided'}), 400
 
@@ -194,6 +294,83 @@ def api_change_group():
     return jsonify({'success': success, 'message': message, 'details': details}), status_code
 
 
+@api_bp.route('/api/register-lab/queue/<int:ticket_id>')
+@require_permission('registrations', 'create')
+def api_registration_ticket(ticket_id):
+    """
+    State of a queued registration. Runs it when its turn has come; the
+    finished registration's response is returned as is.
+    """
+    controller = current_app.extensions.get('admission')
+    ticket = None
+    if controller is not None:
+        ticket = controller.poll(ticket_id, _as_int(session.get('schGrAcPersonID')))
+    if ticket is None:
+        return jsonify({'success': False, 'message': 'Ticket not found'}), 404
+    if ticket.state == 'expired':
+        return jsonify({
+            'success': False,
+            'message': _('Η θέση σας στην ουρά έληξε. Υποβάλετε ξανά την αίτηση.'),
+            'details': {'error_type': 'ticket_expired'}
+        }), 410
+    if ticket.state == 'done':
+        return Response(ticket.result, ticket.status_code, mimetype='application/json')
+    if ticket.state == 'admitted':
+        return _run_admitted(controller, ticket)
+    return _queued_response(ticket, controller)
+
+
+@api_bp.route('/api/waitlist', methods=['POST'])
+@require_permission('registrations', 'create')
+@idempotent
+@admission_controlled
+def api_join_waitlist():
+    """Queue for a seat in a full group; the student is enrolled when one frees up."""
+    data = _request_data()
+    if not data:
+        return jsonify({'success': False, 'message': 'No data provided'}), 400
+
+    lab_id = _as_int(data.get('lab_id'))
+    group_id = _as_int(data.get('group_id'))
+    if not lab_id or not group_id:
+        return jsonify({'success': False, 'message': 'Select a group'}), 400
+
+    student_am = session.get('schGrAcPersonID')
+    if not student_am:
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+
+    eligible, elig_msg = _check_eligibility(student_am, lab_id)
+    if not eligible:
+        return jsonify({'success': False, 'message': elig_msg}), 403
+
+    success, message, details = join_waitlist(int(student_am), lab_id, group_id)
+    status_code = 201 if success else 400
+    return jsonify({'success': success, 'message': message, 'details': details}), status_code
+
+
+@api_bp.route('/api/waitlist/<int:lab_id>', methods=['DELETE'])
+@require_permission('registrations', 'cancel')
+@idempotent
+def api_leave_waitlist(lab_id):
+    student_am = session.get('schGrAcPersonID')
+    if not student_am:
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+
+    if leave_waitlist(int(student_am), lab_id) is None:
+        return jsonify({'success': False, 'message': 'Not on a waitlist for this lab'}), 404
+    return jsonify({'success': True, 'message': _('Αποχωρήσατε από τη λίστα αναμονής.')})
+
+
+@api_bp.route('/api/student/waitlist')
+@require_permission('registrations', 'view')
+def api_student_waitlist():
+    """The student's waitlist entries and queue positions."""
+    student_am = session.get('schGrAcPersonID')
+    if not student_am:
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+    return jsonify({'success': True, 'data': get_student_waitlists(int(student_am))})
+
+
 @api_bp.route('/api/student/enrollments')
 @require_permission('registrations', 'view')
 def api_student_enrollments():
@@ -227,11 +404,13 @@ def api_enrollment_status(lab_id):
     ).first()
 
     period_valid, period_msg = validate_registration_period(lab_id)
+    waitlist = next((w for w in get_student_waitlists(int(student_am)) if w['lab_id'] == lab_id), None)
 
     return jsonify({
         'success': True,
         'lab_id': lab_id,
         'is_enrolled': lab_status is not None,
+        'waitlist': waitlist,
         'lab_status': lab_status,
         'current_group': {
             'group_id': current_group[0].group_id,
@@ -313,10 +492,7 @@ def api_professor_group_students(group_id):
     prof_id = session.get('schGrAcPersonID')
 
     if session.get('role') == 'professor':
-        ownership = RelGroupProf.query.filter_by(
-            prof_id=prof_id, group_id=group_id
-        ).first()
-        if not ownership:
+        if not professor_owns_group(prof_id, group_id):
             return jsonify({'success': False, 'message': 'Access denied'}), 403
 
     # Find the lab_id for this group
@@ -327,17 +503,11 @@ def api_professor_group_students(group_id):
         RelGroupStudent, Student.am == RelGroupStudent.am
     ).filter(RelGroupStudent.group_id == group_id).all()
 
+    absence_dates = get_absence_dates(group_id)
+
     result = []
     for student in students:
-        absence_rec = StudentMissesPerGroup.query.filter_by(
-            am=student.am, group_id=group_id
-        ).first()
-
-        raw_misses = absence_rec.misses if absence_rec else ''
-        if raw_misses:
-            absences_list = [d.strip() for d in raw_misses.split(',') if d.strip()]
-        else:
-            absences_list = []
+        absences_list = absence_dates.get(student.am, [])
 
         grade = 0
         status = STATUS_IN_PROGRESS
@@ -354,7 +524,7 @@ def api_professor_group_students(group_id):
             'name': student.name,
             'email': student.email,
             'semester': student.semester,
-            'absences': raw_misses if raw_misses else '-',
+            'absences': ', '.join(absences_list) if absences_list else '-',
             'absences_list': absences_list,
             'absences_count': len(absences_list),
             'grade': grade,
@@ -367,16 +537,14 @@ def api_professor_group_students(group_id):
 
 @api_bp.route('/api/professor/group/<int:group_id>/student/<int:am>/grade', methods=['PUT'])
 @require_permission('registrations', 'manage')
+@idempotent
 def api_update_student_grade(group_id, am):
     """Update a student's grade and auto-set status."""
     if session.get('role') not in ['professor', 'admin']:
         return jsonify({'success': False, 'message': 'Professors only'}), 403
 
     if session.get('role') == 'professor':
-        ownership = RelGroupProf.query.filter_by(
-            prof_id=session.get('schGrAcPersonID'), group_id=group_id
-        ).first()
-        if not ownership:
+        if not professor_owns_group(session.get('schGrAcPersonID'), group_id):
             return jsonify({'success': False, 'message': 'Access denied'}), 403
 
     data = request.get_json()
@@ -411,11 +579,13 @@ def api_update_student_grade(group_id, am):
         lab_enroll.status = STATUS_IN_PROGRESS
 
     db.session.commit()
+    invalidate_student_enrollments(am)
 
     audit_log('grade_updated',
               old_value=f"grade={old_grade}, status={old_status}",
               new_value=f"grade={lab_enroll.grade}, status={lab_enroll.status}",
-              reason=f"Grade set for student {am} in group {group_id}")
+              reason=f"Grade set for student {am} in group {group_id}",
+              target=('student', am))
 
     return jsonify({
         'success': True,
@@ -437,15 +607,14 @@ def _check_group_ownership(group_id):
     if session.get('role') not in ['professor', 'admin']:
         return jsonify({'success': False, 'message': 'Professors only'}), 403
     if session.get('role') == 'professor':
-        if not RelGroupProf.query.filter_by(
-            prof_id=session.get('schGrAcPersonID'), group_id=group_id
-        ).first():
+        if not professor_owns_group(session.get('schGrAcPersonID'), group_id):
             return jsonify({'success': False, 'message': 'Access denied'}), 403
     return None
 
 
 @api_bp.route('/api/professor/group/<int:group_id>/student/<int:am>/absence', methods=['POST'])
 @require_permission('absences', 'edit_group_absences')
+@idempotent
 def api_add_absence(group_id, am):
     """Add an absence date for a student in a group."""
     err = _check_group_ownership(group_id)
@@ -453,43 +622,31 @@ def api_add_absence(group_id, am):
         return err
 
     data = request.get_json() or {}
-    date_str = data.get('date', '').strip()
-    if not date_str:
-        date_str = datetime.now().strftime('%d/%m/%Y')
-    else:
-        # Normalise YYYY-MM-DD (from HTML date input) to dd/mm/yyyy
-        try:
-            parsed_dt = datetime.strptime(date_str, '%Y-%m-%d')
-            date_str = parsed_dt.strftime('%d/%m/%Y')
-        except ValueError:
-            pass  # already dd/mm/yyyy or another format, use as-is
+    raw_date = data.get('date', '').strip()
+    try:
+        # dd/mm/yyyy or YYYY-MM-DD (from HTML date input); today if omitted
+        absence_date = parse_date(raw_date) if raw_date else datetime.now().date()
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid date'}), 400
+    date_str = format_date(absence_date)
 
     # Verify the student is actually in this group
     if not RelGroupStudent.query.filter_by(am=am, group_id=group_id).first():
         return jsonify({'success': False, 'message': 'Student not in this group'}), 404
 
     try:
-        rec = StudentMissesPerGroup.query.filter_by(am=am, group_id=group_id).first()
-        if rec and rec.misses:
-            existing = [d.strip() for d in rec.misses.split(',') if d.strip()]
-            if date_str in existing:
-                return jsonify({'success': False, 'message': 'Absence already recorded for this date'}), 400
-            existing.append(date_str)
-            rec.misses = ', '.join(existing)
-        elif rec:
-            # Record exists but misses string is empty (after all were deleted)
-            rec.misses = date_str
-        else:
-            rec = StudentMissesPerGroup(am=am, group_id=group_id, misses=date_str)
-            db.session.add(rec)
-
+        if not add_absence(am, group_id, absence_date):
+            db.session.rollback()
+            return jsonify({'success': False, 'message': 'Absence already recorded for this date'}), 400
         db.session.commit()
+        invalidate_student_enrollments(am)
 
-        absences_list = [d.strip() for d in rec.misses.split(',') if d.strip()]
+        absences_list = get_absence_dates(group_id, [am]).get(am, [])
 
         audit_log('absence_added',
                   new_value=f"Student {am} group {group_id}: {date_str}",
-                  reason='Professor recorded absence')
+                  reason='Professor recorded absence',
+                  target=('student', am))
 
         return jsonify({
             'success': True,
@@ -508,6 +665,7 @@ def api_add_absence(group_id, am):
 
 @api_bp.route('/api/professor/group/<int:group_id>/student/<int:am>/absence', methods=['DELETE'])
 @require_permission('absences', 'edit_group_absences')
+@idempotent
 def api_remove_absence(group_id, am):
     """Remove a specific absence date for a student in a group."""
     err = _check_group_ownership(group_id)
@@ -518,29 +676,25 @@ def api_remove_absence(group_id, am):
     if not data or not data.get('date', '').strip():
         return jsonify({'success': False, 'message': 'Date is required'}), 400
 
-    date_str = data['date'].strip()
-
     try:
-        rec = StudentMissesPerGroup.query.filter_by(am=am, group_id=group_id).first()
-        if not rec:
-            return jsonify({'success': False, 'message': 'No absences found'}), 404
+        absence_date = parse_date(data['date'])
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid date'}), 400
+    date_str = format_date(absence_date)
 
-        existing = [d.strip() for d in rec.misses.split(',') if d.strip()]
-        if date_str not in existing:
+    try:
+        if not remove_absence(am, group_id, absence_date):
+            db.session.rollback()
             return jsonify({'success': False, 'message': 'Date not found in absences'}), 404
-
-        existing.remove(date_str)
-
-        if existing:
-            rec.misses = ', '.join(existing)
-        else:
-            db.session.delete(rec)
-
         db.session.commit()
+        invalidate_student_enrollments(am)
+
+        existing = get_absence_dates(group_id, [am]).get(am, [])
 
         audit_log('absence_removed',
                   old_value=f"Student {am} group {group_id}: {date_str}",
-                  reason='Professor removed absence')
+                  reason='Professor removed absence',
+                  target=('student', am))
 
         return jsonify({
             'success': True,
@@ -563,6 +717,7 @@ def api_remove_absence(group_id, am):
 
 @api_bp.route('/api/student/enrollment/<int:lab_id>', methods=['DELETE'])
 @require_permission('registrations', 'cancel')
+@idempotent
 def api_unenroll_lab(lab_id):
     """Completely remove a student's enrollment from a lab and its group."""
     student_am = session.get('schGrAcPersonID')
@@ -579,35 +734,38 @@ def api_unenroll_lab(lab_id):
     academic_year = get_academic_year()
 
     try:
-        group_enrollment = db.session.query(RelGroupStudent).join(
-            LabGroup, RelGroupStudent.group_id == LabGroup.group_id
-        ).join(
-            RelLabGroup, LabGroup.group_id == RelLabGroup.group_id
-        ).filter(
-            RelGroupStudent.am == student_am,
-            RelLabGroup.lab_id == lab_id,
-            LabGroup.year == academic_year
-        ).first()
-
-        if group_enrollment:
+        lab_groups = select(RelLabGroup.group_id).join(
+            LabGroup, LabGroup.group_id == RelLabGroup.group_id
+        ).where(RelLabGroup.lab_id == lab_id, LabGroup.year == academic_year)
+        removed = db.session.execute(
+            delete(RelGroupStudent).where(
+                RelGroupStudent.am == student_am, RelGroupStudent.group_id.in_(lab_groups)
+            ).returning(RelGroupStudent.group_id),
+            execution_options={'synchronize_session': False}
+        ).scalars().all()
+
+        for group_id in removed:
             audit_log('group_enrollment_deleted',
-                      old_value=f"Student {student_am} in group {group_enrollment.group_id}",
-                      reason='Student unenrolled from lab')
-            db.session.delete(group_enrollment)
+                      old_value=f"Student {student_am} in group {group_id}",
+                      reason='Student unenrolled from lab',
+                      target=('student', student_am))
+            adjust_enrolled_count(group_id, -1)
 
-        absence = StudentMissesPerGroup.query.filter_by(
-            am=student_am,
-            group_id=group_enrollment.group_id if group_enrollment else 0
-        ).first()
-        if absence:
-            db.session.delete(absence)
+        if removed:
+            StudentAbsence.query.filter(
+                StudentAbsence.am == student_am, StudentAbsence.group_id.in_(removed)
+            ).delete(synchronize_session=False)
 
         audit_log('lab_enrollment_deleted',
                   old_value=f"Student {student_am} in lab {lab_id}, status={lab_enrollment.status}",
-                  reason='Student unenrolled from lab')
+                  reason='Student unenrolled from lab',
+                  target=('student', student_am))
         db.session.delete(lab_enrollment)
+        promotions = [promote_waitlisted(group_id, lab_id) for group_id in removed]
 
         db.session.commit()
+        invalidate_student_enrollments(student_am)
+        waitlist_committed(*promotions)
         return jsonify({'success': True, 'message': _('Η απεγγραφή ολοκληρώθηκε επιτυχώς.')}), 200
 
     except Exception as e:
@@ -645,6 +803,7 @@ def api_get_student_profile():
 
 @api_bp.route('/api/student/profile', methods=['PUT'])
 @require_permission('students_list', 'edit')
+@idempotent
 def api_update_student_profile():
     student_am = session.get('schGrAcPersonID')
     if not student_am:
@@ -686,7 +845,8 @@ def api_update_student_profile():
 
         new_values = f"name={student.name}, email={student.email}, semester={student.semester}"
         audit_log('profile_updated', old_value=old_values, new_value=new_values,
-                  reason="Student updated profile")
+                  reason="Student updated profile",
+                  target=('student', student_am))
 
         return jsonify({
             'success': True,
@@ -735,16 +895,6 @@ def api_lab_details(lab_id):
         RelLabGroup.lab_id == lab_id
     ).distinct().all()
 
-    # Convert reg_limit to ISO format for HTML5 date inputs
-    reg_limit_iso = ''
-    if lab.reg_limit:
-        for fmt in ('%d/%m/%Y', '%Y-%m-%d'):
-            try:
-                reg_limit_iso = datetime.strptime(lab.reg_limit, fmt).strftime('%Y-%m-%d')
-                break
-            except ValueError:
-                continue
-
     return jsonify({
         'success': True,
         'data': {
@@ -752,8 +902,9 @@ def api_lab_details(lab_id):
             'name': lab.name,
             'description': lab.description,
             'maxusers': lab.maxusers,
-            'reg_limit': lab.reg_limit,
-            'reg_limit_iso': reg_limit_iso,
+            'reg_limit': format_date(lab.reg_limit),
+            # ISO format for HTML5 date inputs
+            'reg_limit_iso': lab.reg_limit.isoformat() if lab.reg_limit else '',
             'max_misses': lab.max_misses,
             'course_id': course_rel.course_id if course_rel else None,
             'course_name': course.name if course else None,
@@ -768,6 +919,7 @@ def api_lab_details(lab_id):
 
 @api_bp.route('/api/admin/labs/<int:lab_id>', methods=['PUT'])
 @require_permission('registrations', 'manage')
+@idempotent
 def api_admin_edit_lab(lab_id):
     """Admin-only: update lab properties and course assignment."""
     if session.get('role') != 'admin':
@@ -782,7 +934,7 @@ def api_admin_edit_lab(lab_id):
         return jsonify({'success': False, 'message': 'No data provided'}), 400
 
     old_values = (f"name={lab.name}, maxusers={lab.maxusers}, "
-                  f"reg_limit={lab.reg_limit}, max_misses={lab.max_misses}")
+                  f"reg_limit={format_date(lab.reg_limit)}, max_misses={lab.max_misses}")
     old_course_rel = RelCourseLab.query.filter_by(lab_id=lab_id).first()
     old_course_id = old_course_rel.course_id if old_course_rel else None
 
@@ -791,10 +943,17 @@ def api_admin_edit_lab(lab_id):
     max_users = data.get('max_users')
     date_end = data.get('date_end', '').strip() if data.get('date_end') else ''
     max_misses = data.get('max_misses')
+    allocation = data.get('allocation')
 
     if name:
         lab.name = name
 
+    if allocation is not None:
+        if allocation not in ALLOCATION_MODES:
+            return jsonify({'success': False, 'message': f'allocation must be one of {ALLOCATION_MODES}'}), 400
+        lab.allocation = allocation
+
+    old_max_users = lab.maxusers
     if max_users is not None:
         try:
             lab.maxusers = int(max_users)
@@ -802,12 +961,11 @@ def api_admin_edit_lab(lab_id):
             return jsonify({'success': False, 'message': 'max_users must be a number'}), 400
 
     if date_end:
-        # Accept YYYY-MM-DD from the HTML date input, store as dd/mm/yyyy
+        # YYYY-MM-DD from the HTML date input, or dd/mm/yyyy
         try:
-            parsed = datetime.strptime(date_end, '%Y-%m-%d')
-            lab.reg_limit = parsed.strftime('%d/%m/%Y')
+            lab.reg_limit = parse_date(date_end)
         except ValueError:
-            lab.reg_limit = date_end  # store as-is if format unknown
+            return jsonify({'success': False, 'message': 'date_end must be a date (YYYY-MM-DD)'}), 400
 
     if max_misses is not None:
         try:
@@ -829,14 +987,29 @@ def api_admin_edit_lab(lab_id):
         else:
             db.session.add(RelCourseLab(course_id=course_id, lab_id=lab_id))
 
+    promotions = []
+    if lab.maxusers > old_max_users:
+        # The new seats go to the waitlists before anyone else can take them
+        db.session.flush()
+        registration_deadlines.invalidate()
+        groups = db.session.scalars(
+            select(LabGroup.group_id).join(RelLabGroup, RelLabGroup.group_id == LabGroup.group_id)
+            .where(RelLabGroup.lab_id == lab_id, LabGroup.year == get_academic_year())
+        ).all()
+        promotions = [promote_waitlisted(group_id, lab_id) for group_id in groups]
+
     db.session.commit()
+    registration_deadlines.invalidate()
+    clear_student_enrollments()
+    waitlist_committed(*promotions)
 
     new_values = (f"name={lab.name}, maxusers={lab.maxusers}, "
-                  f"reg_limit={lab.reg_limit}, max_misses={lab.max_misses}")
+                  f"reg_limit={format_date(lab.reg_limit)}, max_misses={lab.max_misses}")
     audit_log('lab_updated',
               old_value=f"{old_values}, course_id={old_course_id}",
               new_value=f"{new_values}, course_id={course_id or old_course_id}",
-              reason=f"Admin edited lab {lab_id}")
+              reason=f"Admin edited lab {lab_id}",
+              target=('lab', lab_id))
 
     new_course_rel = RelCourseLab.query.filter_by(lab_id=lab_id).first()
     new_course = Coursename.query.get(new_course_rel.course_id) if new_course_rel else None
@@ -848,7 +1021,7 @@ def api_admin_edit_lab(lab_id):
             'lab_id': lab.lab_id,
             'name': lab.name,
             'maxusers': lab.maxusers,
-            'reg_limit': lab.reg_limit,
+            'reg_limit': format_date(lab.reg_limit),
             'max_misses': lab.max_misses,
             'course_id': new_course_rel.course_id if new_course_rel else None,
             'course_name': new_course.name if new_course else None
@@ -858,6 +1031,7 @@ def api_admin_edit_lab(lab_id):
 
 @api_bp.route('/api/admin/labs/<int:lab_id>', methods=['DELETE'])
 @require_permission('registrations', 'manage')
+@idempotent
 def api_admin_delete_lab(lab_id):
     """Admin-only: delete a lab if it has no active groups or enrolled students."""
     if session.get('role') != 'admin':
@@ -867,28 +1041,27 @@ def api_admin_delete_lab(lab_id):
     if not lab:
         return jsonify({'success': False, 'message': 'Lab not found'}), 404
 
-    # Block if groups exist
-    group_count = RelLabGroup.query.filter_by(lab_id=lab_id).count()
-    if group_count > 0:
-        return jsonify({'success': False,
-                        'message': f'Cannot delete: lab has {group_count} group(s). Remove them first.'}), 400
-
-    # Block if students enrolled
-    student_count = RelLabStudent.query.filter_by(lab_id=lab_id).count()
-    if student_count > 0:
-        return jsonify({'success': False,
-                        'message': f'Cannot delete: {student_count} student(s) enrolled. Remove them first.'}), 400
-
     try:
-        RelCourseLab.query.filter_by(lab_id=lab_id).delete()
+        # Groups and enrollments RESTRICT the delete; the course link cascades
         db.session.delete(lab)
         db.session.commit()
+        registration_deadlines.invalidate()
 
         audit_log('lab_deleted',
                   old_value=f"lab_id={lab_id}, name={lab.name}",
-                  reason='Admin deleted lab')
+                  reason='Admin deleted lab',
+                  target=('lab', lab_id))
 
         return jsonify({'success': True, 'message': 'Lab deleted'})
+    except IntegrityError:
+        db.session.rollback()
+        group_count = RelLabGroup.query.filter_by(lab_id=lab_id).count()
+        if group_count > 0:
+            return jsonify({'success': False,
+                            'message': f'Cannot delete: lab has {group_count} group(s). Remove them first.'}), 400
+        student_count = RelLabStudent.query.filter_by(lab_id=lab_id).count()
+        return jsonify({'success': False,
+                        'message': f'Cannot delete: {student_count} student(s) enrolled. Remove them first.'}), 400
     except Exception:
         db.session.rollback()
         return jsonify({'success': False, 'message': 'Delete failed'}), 500
@@ -896,6 +1069,7 @@ def api_admin_delete_lab(lab_id):
 
 @api_bp.route('/api/admin/labs', methods=['POST'])
 @require_permission('registrations', 'manage')
+@idempotent
 def api_admin_create_lab():
     """Admin-only: create a new lab and link it to a course."""
     if session.get('role') != 'admin':
@@ -911,10 +1085,14 @@ def api_admin_create_lab():
     date_end = data.get('date_end', '').strip() if data.get('date_end') else ''
     max_misses = data.get('max_misses')
     description = data.get('description', '').strip()
+    allocation = data.get('allocation') or 'fcfs'
 
     if not name:
         return jsonify({'success': False, 'message': 'Lab name is required'}), 400
 
+    if allocation not in ALLOCATION_MODES:
+        return jsonify({'success': False, 'message': f'allocation must be one of {ALLOCATION_MODES}'}), 400
+
     try:
         max_users_int = int(max_users) if max_users is not None else 30
     except (ValueError, TypeError):
@@ -925,20 +1103,20 @@ def api_admin_create_lab():
     except (ValueError, TypeError):
         return jsonify({'success': False, 'message': 'max_misses must be a number'}), 400
 
-    reg_limit = ''
+    reg_limit = None
     if date_end:
         try:
-            parsed = datetime.strptime(date_end, '%Y-%m-%d')
-            reg_limit = parsed.strftime('%d/%m/%Y')
+            reg_limit = parse_date(date_end)
         except ValueError:
-            reg_limit = date_end
+            return jsonify({'success': False, 'message': 'date_end must be a date (YYYY-MM-DD)'}), 400
 
     new_lab = CourseLab(
         name=name,
         description=description or '',
         maxusers=max_users_int,
         reg_limit=reg_limit,
-        max_misses=max_misses_int
+        max_misses=max_misses_int,
+        allocation=allocation
     )
     db.session.add(new_lab)
     db.session.flush()  # get the new lab_id
@@ -955,10 +1133,12 @@ def api_admin_create_lab():
         db.session.add(RelCourseLab(course_id=course_id, lab_id=new_lab.lab_id))
 
     db.session.commit()
+    registration_deadlines.invalidate()
 
     audit_log('lab_created',
               new_value=f"lab_id={new_lab.lab_id}, name={name}, course_id={course_id}",
-              reason='Admin created new lab')
+              reason='Admin created new lab',
+              target=('lab', new_lab.lab_id))
 
     return jsonify({
         'success': True,
@@ -992,7 +1172,7 @@ def api_admin_get_group(group_id):
     prof_rel = RelGroupProf.query.filter_by(group_id=group_id).first()
     prof_id = prof_rel.prof_id if prof_rel else None
 
-    student_count = RelGroupStudent.query.filter_by(group_id=group_id).count()
+    student_count = group.enrolled_count
 
     return jsonify({
         'success': True,
@@ -1011,6 +1191,7 @@ def api_admin_get_group(group_id):
 
 @api_bp.route('/api/admin/groups', methods=['POST'])
 @require_permission('registrations', 'manage')
+@idempotent
 def api_admin_create_group():
     """Admin-only: create a new group, link it to a lab, optionally assign a professor."""
     if session.get('role') != 'admin':
@@ -1057,10 +1238,12 @@ def api_admin_create_group():
         db.session.add(RelGroupProf(prof_id=int(prof_id), group_id=new_group.group_id))
 
     db.session.commit()
+    invalidate_professor_groups(prof_id)
 
     audit_log('group_created',
               new_value=f"group_id={new_group.group_id}, lab_id={lab_id}, daytime={daytime}, prof_id={prof_id}",
-              reason='Admin created new group')
+              reason='Admin created new group',
+              target=('group', new_group.group_id))
 
     return jsonify({
         'success': True,
@@ -1075,6 +1258,7 @@ def api_admin_create_group():
 
 @api_bp.route('/api/admin/groups/<int:group_id>', methods=['DELETE'])
 @require_permission('registrations', 'manage')
+@idempotent
 def api_admin_delete_group(group_id):
     """Admin-only: delete a group if no students are enrolled."""
     if session.get('role') != 'admin':
@@ -1084,23 +1268,26 @@ def api_admin_delete_group(group_id):
     if not group:
         return jsonify({'success': False, 'message': 'Group not found'}), 404
 
-    student_count = RelGroupStudent.query.filter_by(group_id=group_id).count()
-    if student_count > 0:
-        return jsonify({'success': False,
-                        'message': f'Cannot delete: {student_count} student(s) enrolled. Remove them first.'}), 400
+    owner_ids = [r.prof_id for r in RelGroupProf.query.filter_by(group_id=group_id).all()]
 
     try:
-        RelLabGroup.query.filter_by(group_id=group_id).delete()
-        RelGroupProf.query.filter_by(group_id=group_id).delete()
-        StudentMissesPerGroup.query.filter_by(group_id=group_id).delete()
+        # Enrolled students RESTRICT the delete; lab link, professor
+        # assignments and absences cascade
         db.session.delete(group)
         db.session.commit()
+        invalidate_professor_groups(*owner_ids)
 
         audit_log('group_deleted',
                   old_value=f"group_id={group_id}, daytime={group.daytime}",
-                  reason='Admin deleted group')
+                  reason='Admin deleted group',
+                  target=('group', group_id))
 
         return jsonify({'success': True, 'message': 'Group deleted'})
+    except IntegrityError:
+        db.session.rollback()
+        student_count = RelGroupStudent.query.filter_by(group_id=group_id).count()
+        return jsonify({'success': False,
+                        'message': f'Cannot delete: {student_count} student(s) enrolled. Remove them first.'}), 400
     except Exception:
         db.session.rollback()
         return jsonify({'success': False, 'message': 'Delete failed'}), 500
@@ -1108,6 +1295,7 @@ def api_admin_delete_group(group_id):
 
 @api_bp.route('/api/admin/groups/<int:group_id>', methods=['PUT'])
 @require_permission('registrations', 'manage')
+@idempotent
 def api_admin_edit_group(group_id):
     """Admin-only: update group daytime and professor assignment."""
     if session.get('role') != 'admin':
@@ -1137,7 +1325,7 @@ def api_admin_edit_group(group_id):
 
     # Update lab assignment (only allowed when no students are enrolled)
     if new_lab_id is not None:
-        student_count = RelGroupStudent.query.filter_by(group_id=group_id).count()
+        student_count = group.enrolled_count
         if student_count > 0:
             return jsonify({'success': False,
                             'message': 'Cannot change lab: group has enrolled students. Remove them first.'}), 400
@@ -1152,7 +1340,10 @@ def api_admin_edit_group(group_id):
             db.session.add(RelLabGroup(lab_id=int(new_lab_id), group_id=group_id))
 
     # Update professor assignment
+    owner_ids = []
     if prof_id is not None:
+        owner_ids = [r.prof_id for r in RelGroupProf.query.filter_by(group_id=group_id).all()]
+        owner_ids.append(prof_id)
         # Remove all existing professor links for this group
         RelGroupProf.query.filter_by(group_id=group_id).delete()
 
@@ -1164,13 +1355,16 @@ def api_admin_edit_group(group_id):
             db.session.add(RelGroupProf(prof_id=int(prof_id), group_id=group_id))
 
     db.session.commit()
+    invalidate_professor_groups(*owner_ids)
+    clear_student_enrollments()
 
     new_prof_rel = RelGroupProf.query.filter_by(group_id=group_id).first()
 
     audit_log('group_updated',
               old_value=f"daytime={old_daytime}",
               new_value=f"daytime={group.daytime}, prof_id={new_prof_rel.prof_id if new_prof_rel else None}",
-              reason=f"Admin edited group {group_id}")
+              reason=f"Admin edited group {group_id}",
+              target=('group', group_id))
 
     return jsonify({
         'success': True,
@@ -1189,6 +1383,7 @@ def api_admin_edit_group(group_id):
 
 @api_bp.route('/api/professor/group/<int:group_id>/edit', methods=['PUT'])
 @require_permission('groups', 'view')
+@idempotent
 def api_professor_edit_group(group_id):
     """Allow the assigned professor to update their own group's day/time."""
     err = _check_group_ownership(group_id)
@@ -1218,11 +1413,13 @@ def api_professor_edit_group(group_id):
         return jsonify({'success': False, 'message': 'Day or time is required'}), 400
 
     db.session.commit()
+    clear_student_enrollments()
 
     audit_log('group_updated',
               old_value=f"daytime={old_daytime}",
               new_value=f"daytime={group.daytime}",
-              reason=f"Professor edited group {group_id}")
+              reason=f"Professor edited group {group_id}",
+              target=('group', group_id))
 
     return jsonify({
         'success': True,
@@ -1240,6 +1437,7 @@ def api_professor_edit_group(group_id):
 
 @api_bp.route('/api/professor/group/<int:group_id>/student/<int:am>/remove', methods=['DELETE'])
 @require_permission('registrations', 'manage')
+@idempotent
 def api_force_remove_student(group_id, am):
     """Professor/Admin: forcibly remove a student from a group and its lab."""
     err = _check_group_ownership(group_id)
@@ -1255,21 +1453,24 @@ def api_force_remove_student(group_id, am):
 
     try:
         db.session.delete(group_enroll)
+        adjust_enrolled_count(group_id, -1)
 
         if lab_id:
             lab_enroll = RelLabStudent.query.filter_by(am=am, lab_id=lab_id).first()
             if lab_enroll:
                 db.session.delete(lab_enroll)
 
-        absence = StudentMissesPerGroup.query.filter_by(am=am, group_id=group_id).first()
-        if absence:
-            db.session.delete(absence)
+        StudentAbsence.query.filter_by(am=am, group_id=group_id).delete(synchronize_session=False)
+        promotion = promote_waitlisted(group_id, lab_id)
 
         db.session.commit()
+        invalidate_student_enrollments(am)
+        waitlist_committed(promotion)
 
         audit_log('student_force_removed',
                   old_value=f"Student {am} in group {group_id}, lab {lab_id}",
-                  reason='Professor/Admin force-removed student')
+                  reason='Professor/Admin force-removed student',
+                  target=('student', am))
 
         return jsonify({'success': True, 'message': 'Student removed'})
     except Exception:
@@ -1279,6 +1480,7 @@ def api_force_remove_student(group_id, am):
 
 @api_bp.route('/api/professor/group/<int:group_id>/student/add', methods=['POST'])
 @require_permission('registrations', 'manage')
+@idempotent
 def api_force_add_student(group_id):
     """Professor/Admin: forcibly add a student to a group and its lab."""
     err = _check_group_ownership(group_id)
@@ -1315,6 +1517,7 @@ def api_force_add_student(group_id):
             group_reg_daymonth=now.strftime('%d/%m'),
             group_reg_year=now.year
         ))
+        adjust_enrolled_count(group_id, 1)
 
         # Add lab enrollment if not already present
         if not RelLabStudent.query.filter_by(am=am, lab_id=lab_id).first():
@@ -1329,10 +1532,12 @@ def api_force_add_student(group_id):
             ))
 
         db.session.commit()
+        invalidate_student_enrollments(am)
 
         audit_log('student_force_added',
                   new_value=f"Student {am} added to group {group_id}, lab {lab_id}",
-                  reason='Professor/Admin force-added student')
+                  reason='Professor/Admin force-added student',
+                  target=('student', am))
 
         return jsonify({
             'success': True,
@@ -1351,6 +1556,7 @@ def api_force_add_student(group_id):
 
 @api_bp.route('/api/labs/<int:lab_id>/description', methods=['PUT'])
 @require_permission('labs', 'edit')
+@idempotent
 def api_edit_lab_description(lab_id):
     """Edit a lab description. Professors can only edit labs assigned to them."""
     lab = CourseLab.query.get(lab_id)
@@ -1378,7 +1584,8 @@ def api_edit_lab_description(lab_id):
 
     audit_log('lab_description_updated',
               old_value=old_desc, new_value=lab.description,
-              reason=f"Lab {lab_id} description edited")
+              reason=f"Lab {lab_id} description edited",
+              target=('lab', lab_id))
 
     return jsonify({'success': True, 'message': 'Description updated',
                     'data': {'lab_id': lab.lab_id, 'description': lab.description}})
@@ -1386,6 +1593,7 @@ def api_edit_lab_description(lab_id):
 
 @api_bp.route('/api/professor/profile', methods=['PUT'])
 @require_permission('professors_list', 'edit_own_profile')
+@idempotent
 def api_edit_professor_profile():
     """Professor edits own profile (office, tel). Admin can edit any via ?prof_id=."""
     prof_id = request.args.get('prof_id', type=int)
@@ -1422,7 +1630,8 @@ def api_edit_professor_profile():
     audit_log('professor_profile_updated',
               old_value=old_values,
               new_value=f"status={professor.status}, office={professor.office}, tel={professor.tel}",
-              reason="Professor profile edited")
+              reason="Professor profile edited",
+              target=('professor', professor.prof_id))
 
     return jsonify({
         'success': True, 'message': 'Profile updated',
@@ -1437,6 +1646,7 @@ def api_edit_professor_profile():
 
 @api_bp.route('/api/admin/courses', methods=['POST'])
 @require_permission('registrations', 'manage')
+@idempotent
 def api_admin_create_course():
     """Admin-only: create a new course."""
     if session.get('role') != 'admin':
@@ -1464,7 +1674,8 @@ def api_admin_create_course():
 
     audit_log('course_created',
               new_value=f"course_id={new_course.course_id}, name={name}, semester={semester}",
-              reason='Admin created new course')
+              reason='Admin created new course',
+              target=('course', new_course.course_id))
 
     return jsonify({
         'success': True,
@@ -1479,6 +1690,7 @@ def api_admin_create_course():
 
 @api_bp.route('/api/admin/courses/<int:course_id>', methods=['DELETE'])
 @require_permission('registrations', 'manage')
+@idempotent
 def api_admin_delete_course(course_id):
     """Admin-only: delete a course if no labs are linked to it."""
     if session.get('role') != 'admin':
@@ -1488,22 +1700,22 @@ def api_admin_delete_course(course_id):
     if not course:
         return jsonify({'success': False, 'message': 'Course not found'}), 404
 
-    lab_count = RelCourseLab.query.filter_by(course_id=course_id).count()
-    if lab_count > 0:
-        return jsonify({'success': False,
-                        'message': f'Cannot delete: course has {lab_count} lab(s). Remove them first.'}), 400
-
     try:
-        CourseEligibility.query.filter_by(course_id=course_id).delete()
-        Coursetoprof.query.filter_by(course_id=course_id).delete()
+        # Linked labs RESTRICT the delete; eligibility and professors cascade
         db.session.delete(course)
         db.session.commit()
 
         audit_log('course_deleted',
                   old_value=f"course_id={course_id}, name={course.name}",
-                  reason='Admin deleted course')
+                  reason='Admin deleted course',
+                  target=('course', course_id))
 
         return jsonify({'success': True, 'message': 'Course deleted'})
+    except IntegrityError:
+        db.session.rollback()
+        lab_count = RelCourseLab.query.filter_by(course_id=course_id).count()
+        return jsonify({'success': False,
+                        'message': f'Cannot delete: course has {lab_count} lab(s). Remove them first.'}), 400
     except Exception:
         db.session.rollback()
         return jsonify({'success': False, 'message': 'Delete failed'}), 500
@@ -1515,6 +1727,7 @@ def api_admin_delete_course(course_id):
 
 @api_bp.route('/api/admin/professors', methods=['POST'])
 @require_permission('registrations', 'manage')
+@idempotent
 def api_admin_create_professor():
     """Admin-only: create a new professor."""
     if session.get('role') != 'admin':
@@ -1547,10 +1760,13 @@ def api_admin_create_professor():
     )
     db.session.add(new_prof)
     db.session.commit()
+    invalidate_user_role(new_prof.prof_id)
+    invalidate_professor_email(new_prof.email)
 
     audit_log('professor_created',
               new_value=f"prof_id={new_prof.prof_id}, name={full_name}, email={email}",
-              reason='Admin created new professor')
+              reason='Admin created new professor',
+              target=('professor', new_prof.prof_id))
 
     return jsonify({
         'success': True,
@@ -1565,6 +1781,7 @@ def api_admin_create_professor():
 
 @api_bp.route('/api/admin/professors/<int:prof_id>', methods=['DELETE'])
 @require_permission('registrations', 'manage')
+@idempotent
 def api_admin_delete_professor(prof_id):
     """Admin-only: delete a professor if not assigned to any groups."""
     if session.get('role') != 'admin':
@@ -1574,32 +1791,369 @@ def api_admin_delete_professor(prof_id):
     if not professor:
         return jsonify({'success': False, 'message': 'Professor not found'}), 404
 
-    group_count = RelGroupProf.query.filter_by(prof_id=prof_id).count()
-    if group_count > 0:
-        return jsonify({'success': False,
-                        'message': f'Cannot delete: professor is assigned to {group_count} group(s). Remove assignments first.'}), 400
-
     try:
-        Coursetoprof.query.filter_by(prof_id=prof_id).delete()
+        # Group assignments RESTRICT the delete; course links cascade
         db.session.delete(professor)
         db.session.commit()
+        invalidate_user_role(prof_id)
+        invalidate_professor_email(professor.email)
 
         audit_log('professor_deleted',
                   old_value=f"prof_id={prof_id}, name={professor.name}",
-                  reason='Admin deleted professor')
+                  reason='Admin deleted professor',
+                  target=('professor', prof_id))
 
         return jsonify({'success': True, 'message': 'Professor deleted'})
+    except IntegrityError:
+        db.session.rollback()
+        group_count = RelGroupProf.query.filter_by(prof_id=prof_id).count()
+        return jsonify({'success': False,
+                        'message': f'Cannot delete: professor is assigned to {group_count} group(s). Remove assignments first.'}), 400
     except Exception:
         db.session.rollback()
         return jsonify({'success': False, 'message': 'Delete failed'}), 500
 
 
+# =============================================================================
+# ADMIN INTROSPECTION APIs
+# =============================================================================
+
+@api_bp.route('/api/admin/permissions')
+@require_role('admin')
+def api_admin_route_permissions():
+    """List every route with the roles its decorator lets through (None = public)."""
+    routes = []
+    for rule in sorted(current_app.url_map.iter_rules(), key=lambda r: r.rule):
+        rp = getattr(current_app.view_functions.get(rule.endpoint), 'route_permission', None)
+        routes.append({
+            'rule': rule.rule,
+            'endpoint': rule.endpoint,
+            'methods': sorted(rule.methods - {'HEAD', 'OPTIONS'}),
+            'permission': rp.permission if rp else None,
+            'roles': sorted(rp.roles) if rp and rp.roles is not None else None
+        })
+    return jsonify({'success': True, 'count': len(routes), 'data': routes})
+
+
+AUDIT_PAGE_SIZE = 50
+AUDIT_MAX_PAGE_SIZE = 500
+
+
+@api_bp.route('/api/admin/audit')
+@require_role('admin')
+def api_admin_audit():
+    """Query the audit trail, newest first, with keyset pagination.
+
+    Filters: user_id, action, target_type, target_id, since (inclusive) and
+    until (exclusive) as ISO dates/datetimes. Pass next_cursor back as
+    ?cursor= to fetch the following page.
+    """
+    limit = min(max(request.args.get('limit', type=int, default=AUDIT_PAGE_SIZE), 1), AUDIT_MAX_PAGE_SIZE)
+
+    query = AuditEntry.query
+    for field in ('user_id', 'action', 'target_type', 'target_id'):
+        value = request.args.get(field, '').strip()
+        if value:
+            query = query.filter(getattr(AuditEntry, field) == value)
+
+    try:
+        since = request.args.get('since')
+        if since:
+            query = query.filter(AuditEntry.timestamp >= datetime.fromisoformat(since))
+        until = request.args.get('until')
+        if until:
+            query = query.filter(AuditEntry.timestamp < datetime.fromisoformat(until))
+        cursor = request.args.get('cursor')
+        if cursor:
+            cursor_ts, cursor_id = cursor.rsplit('|', 1)
+            query = query.filter(tuple_(AuditEntry.timestamp, AuditEntry.id) <
+                                 tuple_(datetime.fromisoformat(cursor_ts), int(cursor_id)))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid since/until/cursor'}), 400
+
+    rows = query.order_by(AuditEntry.timestamp.desc(), AuditEntry.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1].timestamp.isoformat()}|{rows[-1].id}"
+
+    return jsonify({
+        'success': True,
+        'count': len(rows),
+        'next_cursor': next_cursor,
+        'data': [{
+            'id': r.id,
+            'timestamp': r.timestamp.isoformat(),
+            'user_id': r.user_id,
+            'user_role': r.user_role,
+            'action': r.action,
+            'target_type': r.target_type,
+            'target_id': r.target_id,
+            'ip_address': r.ip_address,
+            'old_value': r.old_value,
+            'new_value': r.new_value,
+            'reason': r.reason
+        } for r in rows]
+    })
+
+
+@api_bp.route('/api/admin/cache-stats')
+@require_role('admin')
+def api_admin_cache_stats():
+    """Size and hit/miss counters of this worker's in-process caches."""
+    return jsonify({'success': True, 'data': cache_stats()})
+
+
+# =============================================================================
+# ADMIN BULK ENROLLMENT API
+# =============================================================================
+
+BULK_ENROLL_MAX_ROWS = 5000
+
+
+def _as_int(value):
+    try:
+        return int(str(value).strip())
+    except (ValueError, TypeError):
+        return None
+
+
+def _bulk_enroll_rows():
+    """
+    Raw (am, group_id) rows from an uploaded CSV ('file', columns am,group_id,
+    optional header) or a JSON list of {"am", "group_id"} objects or pairs,
+    optionally wrapped as {"rows": [...]}. Returns None if there is no input.
+    """
+    if 'file' in request.files:
+        text = _decode_upload(request.files['file'])
+        if text is None:
+            return None
+        rows = [row for row in csv.reader(io.StringIO(text)) if any(cell.strip() for cell in row)]
+        if rows and _as_int(rows[0][0]) is None:
+            rows = rows[1:]  # header
+        return [(row[0], row[1] if len(row) > 1 else None) for row in rows]
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('rows')
+    if not isinstance(data, list):
+        return None
+    rows = []
+    for item in data:
+        if isinstance(item, dict):
+            rows.append((item.get('am'), item.get('group_id')))
+        elif isinstance(item, (list, tuple)) and len(item) == 2:
+            rows.append(tuple(item))
+        else:
+            rows.append((None, None))
+    return rows
+
+
+@api_bp.route('/api/admin/enrollments/bulk', methods=['POST'])
+@require_permission('registrations', 'manage')
+@idempotent
+def api_admin_bulk_enroll():
+    """Admin-only: place many students into groups in one transaction, with a per-row report."""
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'message': 'Admin only'}), 403
+
+    rows = _bulk_enroll_rows()
+    if not rows:
+        return jsonify({'success': False, 'message': 'Upload a CSV or send a JSON list of (am, group_id)'}), 400
+    if len(rows) > BULK_ENROLL_MAX_ROWS:
+        return jsonify({'success': False,
+                        'message': f'At most {BULK_ENROLL_MAX_ROWS} rows per request'}), 400
+
+    parsed = [(_as_int(am), _as_int(group_id)) for am, group_id in rows]
+    valid = [pair for pair in parsed if None not in pair]
+
+    try:
+        statuses = iter(bulk_enroll_students(valid))
+    except Exception as e:
+        db.session.rollback()
+        import logging
+        logging.getLogger(__name__).error(f'Bulk enrollment failed: {e}')
+        return jsonify({'success': False, 'message': 'Bulk enrollment failed'}), 500
+
+    report = []
+    for number, (am, group_id) in enumerate(parsed, 1):
+        status = 'invalid' if am is None or group_id is None else next(statuses)
+        report.append({'row': number, 'am': am, 'group_id': group_id, 'status': status})
+    added = sum(1 for r in report if r['status'] == 'added')
+
+    if added:
+        audit_log('bulk_enrollment',
+                  new_value=f"{added} students added to "
+                            f"{len({r['group_id'] for r in report if r['status'] == 'added'})} groups",
+                  reason=f'Admin bulk enrollment, {len(report) - added} of {len(report)} rows rejected')
+
+    return jsonify({
+        'success': True,
+        'message': f'{added} of {len(report)} students added',
+        'data': {'added': added, 'rejected': len(report) - added, 'rows': report}
+    })
+
+
+# =============================================================================
+# GROUP PREFERENCE APIs (labs in 'preferences' allocation mode)
+# =============================================================================
+
+@api_bp.route('/api/student/preferences/<int:lab_id>')
+@require_permission('registrations', 'view')
+def api_get_preferences(lab_id):
+    """The student's ranked groups for a lab."""
+    student_am = session.get('schGrAcPersonID')
+    if not student_am:
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+
+    lab = db.session.get(CourseLab, lab_id)
+    if not lab:
+        return jsonify({'success': False, 'message': 'Lab not found'}), 404
+
+    rows = db.session.execute(
+        select(GroupPreference.rank, GroupPreference.group_id, LabGroup.daytime)
+        .join(LabGroup, LabGroup.group_id == GroupPreference.group_id)
+        .where(GroupPreference.am == int(student_am), GroupPreference.lab_id == lab_id)
+        .order_by(GroupPreference.rank)
+    )
+    return jsonify({
+        'success': True,
+        'lab_id': lab_id,
+        'allocation': lab.allocation,
+        'reg_limit': format_date(lab.reg_limit),
+        'data': [{'rank': rank, 'group_id': group_id, 'daytime': daytime} for rank, group_id, daytime in rows]
+    })
+
+
+@api_bp.route('/api/student/preferences/<int:lab_id>', methods=['PUT'])
+@require_permission('registrations', 'create')
+@idempotent
+def api_submit_preferences(lab_id):
+    """Replace the student's ranked groups for a lab; an empty list withdraws them."""
+    student_am = session.get('schGrAcPersonID')
+    if not student_am:
+        return jsonify({'success': False, 'message': 'Authentication required'}), 401
+    student_am = int(student_am)
+
+    lab = db.session.get(CourseLab, lab_id)
+    if not lab:
+        return jsonify({'success': False, 'message': 'Lab not found'}), 404
+    if lab.allocation != 'preferences':
+        return jsonify({'success': False, 'message': 'This lab does not take group preferences'}), 400
+
+    period_valid, period_msg = validate_registration_period(lab_id)
+    if not period_valid:
+        return jsonify({'success': False, 'message': period_msg}), 400
+
+    eligible, elig_msg = _check_eligibility(student_am, lab_id)
+    if not eligible:
+        return jsonify({'success': False, 'message': elig_msg}), 403
+
+    data = request.get_json() or {}
+    group_ids = data.get('group_ids')
+    if not isinstance(group_ids, list) or any(_as_int(g) is None for g in group_ids):
+        return jsonify({'success': False, 'message': 'group_ids must be a list of group ids, best first'}), 400
+    group_ids = [int(g) for g in group_ids]
+    if len(set(group_ids)) != len(group_ids):
+        return jsonify({'success': False, 'message': 'Each group can be ranked once'}), 400
+    if len(group_ids) > MAX_RANKED_GROUPS:
+        return jsonify({'success': False, 'message': f'At most {MAX_RANKED_GROUPS} groups can be ranked'}), 400
+
+    academic_year = get_academic_year()
+    lab_groups = set(db.session.scalars(
+        select(RelLabGroup.group_id)
+        .join(LabGroup, LabGroup.group_id == RelLabGroup.group_id)
+        .where(RelLabGroup.lab_id == lab_id, LabGroup.year == academic_year)
+    ))
+    unknown = [g for g in group_ids if g not in lab_groups]
+    if unknown:
+        return jsonify({'success': False, 'message': f'Groups not in this lab: {unknown}'}), 400
+
+    if db.session.scalar(select(RelGroupStudent.group_id).where(
+            RelGroupStudent.am == student_am, RelGroupStudent.group_id.in_(lab_groups)).limit(1)) is not None:
+        return jsonify({'success': False, 'message': 'Already enrolled in a group of this lab'}), 400
+
+    now = datetime.now()
+    db.session.execute(delete(GroupPreference).where(
+        GroupPreference.am == student_am, GroupPreference.lab_id == lab_id))
+    db.session.add_all([GroupPreference(am=student_am, lab_id=lab_id, rank=rank, group_id=group_id,
+                                        submitted_at=now)
+                        for rank, group_id in enumerate(group_ids, 1)])
+    db.session.commit()
+
+    audit_log('preferences_submitted',
+              new_value=f"Lab {lab_id}: {group_ids}",
+              reason='Student ranked groups' if group_ids else 'Student withdrew preferences',
+              target=('student', student_am))
+
+    return jsonify({'success': True, 'message': 'Preferences saved',
+                    'data': {'lab_id': lab_id, 'group_ids': group_ids}})
+
+
+@api_bp.route('/api/admin/labs/<int:lab_id>/allocate', methods=['POST'])
+@require_permission('registrations', 'manage')
+@idempotent
+def api_admin_allocate_lab(lab_id):
+    """Admin-only: assign everyone who ranked the lab's groups, after its reg_limit."""
+    if session.get('role') != 'admin':
+        return jsonify({'success': False, 'message': 'Admin only'}), 403
+
+    lab = db.session.get(CourseLab, lab_id)
+    if not lab:
+        return jsonify({'success': False, 'message': 'Lab not found'}), 404
+    if lab.allocation != 'preferences':
+        return jsonify({'success': False, 'message': 'This lab does not take group preferences'}), 400
+
+    data = request.get_json(silent=True) or {}
+    if not data.get('force') and (lab.reg_limit is None or datetime.now().date() <= lab.reg_limit):
+        return jsonify({'success': False,
+                        'message': 'Preferences are still open; pass "force": true to allocate now'}), 400
+
+    try:
+        allocation, statuses = allocate_lab(lab_id, seed=data.get('seed'),
+                                            fill_unranked=data.get('fill_unranked', True))
+    except Exception as e:
+        db.session.rollback()
+        import logging
+        logging.getLogger(__name__).error(f'Allocation of lab {lab_id} failed: {e}')
+        return jsonify({'success': False, 'message': 'Allocation failed'}), 500
+
+    enrolled = sum(1 for status in statuses.values() if status == 'added')
+    audit_log('lab_allocated',
+              new_value=f"{enrolled} students enrolled, {len(allocation.unassigned)} without a seat",
+              reason=f"Admin ran preference allocation for lab {lab_id}",
+              target=('lab', lab_id))
+
+    return jsonify({
+        'success': True,
+        'message': f'{enrolled} students enrolled',
+        'data': {
+            'enrolled': enrolled,
+            'unassigned': allocation.unassigned,
+            'ranks': {str(rank): n for rank, n in sorted(allocation.ranks.items())},
+            'rejected': {str(am): status for am, status in statuses.items() if status != 'added'}
+        }
+    })
+
+
 # =============================================================================
 # ADMIN ELIGIBILITY APIs
 # =============================================================================
 
+def _decode_upload(file):
+    """Text of an uploaded CSV: UTF-8 with BOM, then UTF-8, then latin-1. None if undecodable."""
+    raw = file.read()
+    for enc in ('utf-8-sig', 'utf-8', 'latin-1'):
+        try:
+            return raw.decode(enc)
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
 @api_bp.route('/api/admin/course/<int:course_id>/import-eligible', methods=['POST'])
 @require_permission('registrations', 'manage')
+@idempotent
 def api_import_eligible(course_id):
     """Upload a CSV of eligible student AMs for a course (admin only)."""
     if session.get('role') != 'admin':
@@ -1616,15 +2170,8 @@ def api_import_eligible(course_id):
         return jsonify({'success': False, 'message': 'Empty filename'}), 400
 
     try:
-        raw = file.read()
-        # Try UTF-8-BOM first, fall back to UTF-8, then latin-1
-        for enc in ('utf-8-sig', 'utf-8', 'latin-1'):
-            try:
-                text = raw.decode(enc)
-                break
-            except UnicodeDecodeError:
-                continue
-        else:
+        text = _decode_upload(file)
+        if text is None:
             return jsonify({'success': False, 'message': 'Unable to decode file'}), 400
 
         # Robust parsing: split by newlines AND commas so we handle
@@ -1640,6 +2187,7 @@ def api_import_eligible(course_id):
 
         if not ams:
             return jsonify({'success': False, 'message': 'No valid AMs found in file'}), 400
+        ams = list(dict.fromkeys(ams))  # one row per (course_id, am)
 
         # Replace existing list
         CourseEligibility.query.filter_by(course_id=course_id).delete()
@@ -1649,7 +2197,8 @@ def api_import_eligible(course_id):
 
         audit_log('eligibility_imported',
                   new_value=f'Course {course_id}: {len(ams)} students imported',
-                  reason='Admin uploaded eligibility CSV')
+                  reason='Admin uploaded eligibility CSV',
+                  target=('course', course_id))
 
         return jsonify({
             'success': True,
@@ -1673,6 +2222,7 @@ def api_get_eligible(course_id):
 
 @api_bp.route('/api/admin/course/<int:course_id>/clear-eligible', methods=['DELETE'])
 @require_permission('registrations', 'manage')
+@idempotent
 def api_clear_eligible(course_id):
     """Remove all eligibility records for a course (opens registration to everyone)."""
     if session.get('role') != 'admin':
@@ -1681,7 +2231,8 @@ def api_clear_eligible(course_id):
     db.session.commit()
     audit_log('eligibility_cleared',
               old_value=f'Course {course_id}: {deleted} records removed',
-              reason='Admin cleared eligibility list')
+              reason='Admin cleared eligibility list',
+              target=('course', course_id))
     return jsonify({'success': True, 'message': f'{deleted} records cleared'})
 
 
@@ -1720,13 +2271,11 @@ def api_export_group_csv(group_id):
         RelGroupStudent, Student.am == RelGroupStudent.am
     ).filter(RelGroupStudent.group_id == group_id).order_by(Student.name).all()
 
+    absence_dates = get_absence_dates(group_id)
+
     rows = []
     for s in students:
-        absence_rec = StudentMissesPerGroup.query.filter_by(
-            am=s.am, group_id=group_id
-        ).first()
-        dates_str = absence_rec.misses if absence_rec else ''
-        dates_list = [d.strip() for d in dates_str.split(',') if d.strip()] if dates_str else []
+        dates_list = absence_dates.get(s.am, [])
 
         grade = 0
         status = STATUS_IN_PROGRESS
@@ -1755,7 +2304,8 @@ def api_export_group_csv(group_id):
         '\u0397\u03bc\u03b5\u03c1\u03bf\u03bc\u03b7\u03bd\u03af\u03b5\u03c2 \u0391\u03c0\u03bf\u03c5\u03c3\u03b9\u03ce\u03bd'
     ]
 
-    audit_log('csv_export', new_value=f'Group {group_id} roster exported ({len(rows)} students)')
+    audit_log('csv_export', new_value=f'Group {group_id} roster exported ({len(rows)} students)',
+              target=('group', group_id))
     return _make_csv_response(rows, headers, f'group_roster_{group_id}.csv')
 
 
@@ -1790,14 +2340,15 @@ def api_export_lab_csv(lab_id):
         RelGroupStudent, Student.am == RelGroupStudent.am
     ).filter(RelGroupStudent.group_id.in_(group_ids)).order_by(Student.name).all()
 
+    absence_counts = count_absences(group_ids)
+
     rows = []
     for student, gid in enrolled:
         enroll = RelLabStudent.query.filter_by(am=student.am, lab_id=lab_id).first()
         grade = enroll.grade if enroll else 0
         status = enroll.status if enroll else STATUS_IN_PROGRESS
 
-        absence_rec = StudentMissesPerGroup.query.filter_by(am=student.am, group_id=gid).first()
-        abs_count = len([d.strip() for d in absence_rec.misses.split(',') if d.strip()]) if absence_rec else 0
+        abs_count = absence_counts.get((student.am, gid), 0)
 
         rows.append({
             '\u0391.\u039c.': student.am,
@@ -1815,7 +2366,8 @@ def api_export_lab_csv(lab_id):
         '\u03a3\u03cd\u03bd\u03bf\u03bb\u03bf \u0391\u03c0\u03bf\u03c5\u03c3\u03b9\u03ce\u03bd'
     ]
 
-    audit_log('csv_export', new_value=f'Lab {lab_id} full roster exported ({len(rows)} students)')
+    audit_log('csv_export', new_value=f'Lab {lab_id} full roster exported ({len(rows)} students)',
+              target=('lab', lab_id))
     return _make_csv_response(rows, headers, f'lab_{lab_id}_full_roster.csv')
 
 
@@ -1826,30 +2378,23 @@ def api_export_lab_csv(lab_id):
 @api_bp.route('/groups')
 @require_permission('groups', 'view')
 def list_groups():
-    groups = LabGroup.query.all()
-    groups_data = []
-    for group in groups:
-        group_dict = {
-            'group_id': group.group_id,
-            'daytime': group.daytime,
-            'year': group.year,
-            'finalize': group.finalize
-        }
-        groups_data.append(mask_pii(group_dict))
-    return jsonify(groups_data)
+    return jsonify([mask_pii(group._asdict()) for group in group_rows()])
 
 
 @api_bp.route('/groups/<int:group_id>/join', methods=['POST'])
 @require_permission('groups', 'join')
+@idempotent
 def join_group(group_id):
-    student_am = session['schGrAcPersonID']
-    success, message = transactional_enrollment(student_am, group_id)
-    status_code = 200 if success else 400
-    return jsonify({'success': success, 'message': message}), status_code
+    """Legacy alias of /api/register-lab: the same checks and the same admission queue."""
+    lab_id = db.session.scalar(select(RelLabGroup.lab_id).where(RelLabGroup.group_id == group_id))
+    if lab_id is None:
+        return jsonify({'success': False, 'message': 'No lab associated with this group'}), 400
+    return _admit('api_register_lab', {'lab_id': lab_id, 'group_id': group_id})
 
 
 @api_bp.route('/groups/<int:group_id>/leave', methods=['POST'])
 @require_permission('groups', 'leave')
+@idempotent
 def leave_group(group_id):
     student_am = session['schGrAcPersonID']
     try:
@@ -1859,9 +2404,15 @@ def leave_group(group_id):
 
         audit_log('enrollment_deleted',
                   old_value=f"Student {student_am} was enrolled in group {group_id}",
-                  reason='Student left group')
+                  reason='Student left group',
+                  target=('student', student_am))
         db.session.delete(enrollment)
+        adjust_enrolled_count(group_id, -1)
+        lab_id = db.session.scalar(select(RelLabGroup.lab_id).where(RelLabGroup.group_id == group_id))
+        promotion = promote_waitlisted(group_id, lab_id)
         db.session.commit()
+        invalidate_student_enrollments(student_am)
+        waitlist_committed(promotion)
         return jsonify({'success': True, 'message': 'Successfully left group'}), 200
     except Exception:
         db.session.rollback()
@@ -1871,20 +2422,22 @@ def leave_group(group_id):
 @api_bp.route('/groups/<int:group_id>/absences', methods=['GET'])
 @require_permission('absences', 'view_group')
 def view_group_absences(group_id):
-    absences = StudentMissesPerGroup.query.filter_by(group_id=group_id).all()
+    absence_dates = get_absence_dates(group_id)
+    students = {s.am: s for s in Student.query.filter(Student.am.in_(list(absence_dates))).all()}
     absences_data = []
-    for absence in absences:
-        student = Student.query.get(absence.am)
+    for am, dates in absence_dates.items():
+        student = students.get(am)
         absences_data.append({
-            'student_am': mask_pii({'am': absence.am})['am'],
+            'student_am': mask_pii({'am': am})['am'],
             'student_name': student.name if student else 'Unknown',
-            'date': absence.misses
+            'date': ', '.join(dates)
         })
     return jsonify(absences_data)
 
 
 @api_bp.route('/groups/<int:group_id>/absences', methods=['POST'])
 @require_permission('absences', 'edit_group_absences')
+@idempotent
 def record_group_absence(group_id):
     data = request.get_json()
     student_am = data.get('student_am')
@@ -1917,13 +2470,4 @@ def view_own_profile():
 @api_bp.route('/professors')
 @require_permission('professors_list', 'view')
 def list_professors():
-    professors = Professor.query.all()
-    professors_data = []
-    for prof in professors:
-        prof_dict = {
-            'prof_id': prof.prof_id, 'name': prof.name,
-            'status': prof.status, 'office': prof.office,
-            'email': prof.email, 'tel': prof.tel
-        }
-        professors_data.append(mask_pii(prof_dict))
-    return jsonify(professors_data)
+    return jsonify([mask_pii(prof._asdict()) for prof in professor_rows()])
@@ -1,10 +1,10 @@
 from flask import Blueprint, redirect, request, session, url_for, render_template, current_app
 from urllib.parse import urlencode
-import requests as http_requests
 
-from models import Student, Professor
+from models import Student
 from auth import audit_log
-from helpers import create_or_get_student
+from cas import CASUnavailable
+from helpers import create_or_get_student, get_professor_id_by_email
 
 auth_bp = Blueprint('auth_bp', __name__)
 
@@ -41,12 +41,6 @@ FAKE_USERS = {
     }
 }
 
-# CAS configuration
-CAS_LOGIN_URL = 'https://sso.uoi.gr/login'
-CAS_VALIDATE_URL = 'https://sso.uoi.gr/serviceValidate'
-SERVICE_URL = 'http://localhost:5000/cas_callback'
-
-
 @auth_bp.route('/')
 def index():
     """Default landing page - redirect to login."""
@@ -60,8 +54,8 @@ def login():
     if current_app.config['AUTH_MODE'] == 'dev':
         return render_template('dev_login.html', users=FAKE_USERS)
 
-    params = {'service': SERVICE_URL}
-    return redirect(f"{CAS_LOGIN_URL}?{urlencode(params)}")
+    params = {'service': current_app.config['CAS_SERVICE_URL']}
+    return redirect(f"{current_app.config['CAS_LOGIN_URL']}?{urlencode(params)}")
 
 
 @auth_bp.route('/cas_callback')
@@ -84,27 +78,17 @@ def cas_callback():
     if not ticket:
         return redirect(url_for('auth_bp.login'))
 
-    params = {'service': SERVICE_URL, 'ticket': ticket}
-    response = http_requests.get(CAS_VALIDATE_URL, params=params, verify=True)
-    if response.status_code != 200 or 'authenticationSuccess' not in response.text:
+    try:
+        cas_user = current_app.extensions['cas'].validate(ticket, current_app.config['CAS_SERVICE_URL'])
+    except CASUnavailable:
+        return "CAS service unavailable, please try again in a moment", 503, {'Retry-After': '30'}
+    if cas_user is None:
         return "CAS authentication failed", 401
 
-    import xml.etree.ElementTree as ET
-    root = ET.fromstring(response.text)
-    ns = {'cas': 'http://www.yale.edu/tp/cas'}
-    auth = root.find('.//cas:authenticationSuccess', ns)
-    if auth is None:
-        return "CAS authentication failed", 401
-
-    schGrAcPersonID = auth.find('cas:schGrAcPersonID', ns)
-    displayName = auth.find('cas:displayName', ns)
-    eduPersonAffiliation = auth.find('cas:eduPersonAffiliation', ns)
-    mail = auth.find('cas:mail', ns)
-
-    schGrAcPersonID = schGrAcPersonID.text if schGrAcPersonID is not None else None
-    displayName = displayName.text if displayName is not None else 'Unknown'
-    affiliation = eduPersonAffiliation.text if eduPersonAffiliation is not None else ''
-    email = mail.text if mail is not None else ''
+    schGrAcPersonID = cas_user['person_id']
+    displayName = cas_user['name']
+    affiliation = cas_user['affiliation']
+    email = cas_user['email']
 
     if not schGrAcPersonID:
         return "CAS authentication failed: No student ID", 401
@@ -121,12 +105,12 @@ def cas_callback():
         session['email'] = email
 
         if created:
-            audit_log('cas_first_login', new_value=f"New student {schGrAcPersonID} created")
+            audit_log('cas_first_login', new_value=f"New student {schGrAcPersonID} created", target=('student', schGrAcPersonID))
 
     elif 'faculty' in affiliation.lower() or 'staff' in affiliation.lower():
-        prof = Professor.query.filter_by(email=email).first()
-        if prof:
-            session['schGrAcPersonID'] = str(prof.prof_id)
+        prof_id = get_professor_id_by_email(email)
+        if prof_id:
+            session['schGrAcPersonID'] = str(prof_id)
             session['role'] = 'professor'
             session['name'] = displayName
         else:
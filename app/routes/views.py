@@ -3,13 +3,17 @@ from flask_babel import _
 
 from models import (
     Student, Professor, db, LabGroup, CourseLab,
-    RelLabGroup, RelLabStudent, StudentMissesPerGroup,
+    RelLabGroup, RelLabStudent, StudentAbsence,
     Coursename, CourseEligibility, RelCourseLab
 )
 from auth import (
-    require_permission, require_role, get_academic_year, get_student_enrollments
+    require_permission, require_role, get_academic_year, get_student_enrollments,
+    format_date
 )
 from helpers import get_group_occupancy
+from readers import (
+    student_rows, professor_rows, lab_rows, course_rows, lab_choices, professor_choices
+)
 
 views_bp = Blueprint('views_bp', __name__)
 
@@ -64,8 +68,8 @@ def my_enrollments():
 @require_permission('dashboard', 'view')
 def labs_page():
     """Labs listing."""
-    labs = CourseLab.query.all()
-    courses = Coursename.query.order_by(Coursename.semester, Coursename.name).all() if session.get('role') == 'admin' else []
+    labs = lab_rows()
+    courses = course_rows() if session.get('role') == 'admin' else []
     return render_template('labs.html',
                            active_page='labs',
                            labs=labs,
@@ -109,8 +113,8 @@ def groups_page():
     all_labs = []
     professors = []
     if session.get('role') == 'admin':
-        all_labs = CourseLab.query.order_by(CourseLab.name).all()
-        professors = Professor.query.order_by(Professor.name).all()
+        all_labs = lab_choices()
+        professors = professor_choices()
 
     return render_template('groups.html',
                            active_page='groups',
@@ -123,7 +127,7 @@ def groups_page():
 @require_permission('students_list', 'view_professor_students')
 def students_page():
     """Students listing (professors/admins only)."""
-    students = Student.query.all()
+    students = student_rows()
     return render_template('students.html',
                            active_page='students',
                            students=students)
@@ -133,7 +137,7 @@ def students_page():
 @require_permission('professors_list', 'view')
 def professors_page():
     """Professors listing."""
-    professors = Professor.query.all()
+    professors = professor_rows()
     return render_template('professors.html',
                            active_page='professors',
                            professors=professors)
@@ -165,16 +169,26 @@ def registrations_page():
 @require_permission('absences', 'view_group')
 def absences_page():
     """Absences listing (professors/admins only)."""
-    absences_raw = StudentMissesPerGroup.query.all()
-    absences = []
-    for miss in absences_raw:
-        student = Student.query.get(miss.am)
-        absences.append({
-            'am': miss.am,
-            'student_name': student.name if student else 'Unknown',
-            'group_id': miss.group_id,
-            'misses': miss.misses,
+    rows = db.session.query(
+        StudentAbsence.am, StudentAbsence.group_id, StudentAbsence.absence_date, Student.name
+    ).outerjoin(Student, Student.am == StudentAbsence.am).order_by(
+        StudentAbsence.am, StudentAbsence.group_id, StudentAbsence.absence_date
+    ).all()
+
+    by_student_group = {}
+    for am, group_id, absence_date, student_name in rows:
+        entry = by_student_group.setdefault((am, group_id), {
+            'am': am,
+            'student_name': student_name or 'Unknown',
+            'group_id': group_id,
+            'dates': [],
         })
+        entry['dates'].append(format_date(absence_date))
+
+    absences = []
+    for entry in by_student_group.values():
+        entry['misses'] = ', '.join(entry.pop('dates'))
+        absences.append(entry)
     return render_template('absences.html',
                            active_page='absences',
                            absences=absences)
@@ -12,14 +12,14 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, 'data', 'labregister.sqlite')
 
 def get_future_date(days=180):
-    """Επιστρέφει μελλοντική ημερομηνία σε format DD/MM/YYYY"""
+    """Επιστρέφει μελλοντική ημερομηνία σε format YYYY-MM-DD"""
     future = datetime.now() + timedelta(days=days)
-    return future.strftime("%d/%m/%Y")
+    return future.date().isoformat()
 
 def get_past_date(days=30):
-    """Επιστρέφει παρελθοντική ημερομηνία σε format DD/MM/YYYY"""
+    """Επιστρέφει παρελθοντική ημερομηνία σε format YYYY-MM-DD"""
     past = datetime.now() - timedelta(days=days)
-    return past.strftime("%d/%m/%Y")
+    return past.date().isoformat()
 
 def get_current_year():
     """Επιστρέφει το τρέχον ακαδημαϊκό έτος"""
@@ -38,6 +38,13 @@ def update_database():
         print(f"❌ Database not found at: {DB_PATH}")
         return False
     
+    # Εφαρμογή εκκρεμών migrations (π.χ. πίνακας student_absence)
+    from sqlalchemy import create_engine
+    from migrations import upgrade
+    engine = create_engine(f'sqlite:///{DB_PATH}')
+    upgrade(engine)
+    engine.dispose()
+    
     current_year = get_current_year()
     future_date = get_future_date(180)  # 6 μήνες μπροστά
     past_date = get_past_date(30)  # 1 μήνα πίσω
@@ -209,17 +216,24 @@ def update_database():
         print(f"✅ Created failed student (AM=88888) for re-registration test")
         
         # 14. Προσθήκη απουσιών για testing notifications
-        cursor.execute("DELETE FROM student_misses_pergroup WHERE am IN (13628, 13526)")
+        cursor.execute("DELETE FROM student_absence WHERE am IN (13628, 13526)")
         absences_data = [
-            (13526, 1, '10/10/2025, 17/10/2025, 24/10/2025'),
+            (13526, 1, ['2025-10-10', '2025-10-17', '2025-10-24']),
         ]
-        for am, group_id, misses in absences_data:
-            cursor.execute(
-                "INSERT INTO student_misses_pergroup (am, group_id, misses) VALUES (?, ?, ?)",
-                (am, group_id, misses)
+        for am, group_id, dates in absences_data:
+            cursor.executemany(
+                "INSERT INTO student_absence (am, group_id, absence_date) VALUES (?, ?, ?)",
+                [(am, group_id, d) for d in dates]
             )
         print(f"✅ Added absence records for notification testing")
         
+        # 15. Επανυπολογισμός enrolled_count (τα raw INSERT/DELETE δεν τον ενημερώνουν)
+        cursor.execute(
+            "UPDATE lab_groups SET enrolled_count = "
+            "(SELECT COUNT(*) FROM rel_group_student r WHERE r.group_id = lab_groups.group_id)"
+        )
+        print(f"✅ Recounted enrolled_count ({cursor.rowcount} groups)")
+        
         conn.commit()
         conn.close()
         
@@ -0,0 +1,170 @@
+"""
+In-process index of the group waitlists, for O(log n) queue positions.
+
+group_waitlist is the source of truth: a student's position is the number
+of rows of the same group with a seq up to theirs, which SQLite can only
+count by scanning the range. Instead each worker keeps, per group, the
+waiting students in seq order with a Fenwick tree over "still waiting"
+flags. Leaving the queue clears a flag and a position is a prefix sum, both
+O(log n); joining appends a slot in O(log n).
+
+A group is loaded with one query the first time it is asked about. Writers
+call appended()/removed() after committing; groups changed by another
+worker are reloaded after WAITLIST_REFRESH seconds, so a position shown by
+this worker may lag that far behind the table.
+"""
+import threading
+import time
+
+from sqlalchemy import select
+
+from models import db, GroupWaitlist
+
+# Seconds before a group's queue is reloaded; covers joins and promotions made by other workers
+WAITLIST_REFRESH = 30.0
+
+# Rebuild a queue once this many slots (and more than its live entries) are dead
+WAITLIST_COMPACT_AFTER = 64
+
+
+class FenwickTree:
+    """Binary indexed tree over a growable list of integers (1-based positions)."""
+
+    def __init__(self, values=()):
+        self._tree = [0]
+        for value in values:
+            self.append(value)
+
+    def __len__(self):
+        return len(self._tree) - 1
+
+    def append(self, value):
+        # The new node covers (i - lowbit(i), i]: its own value plus the
+        # nodes that tile (i - lowbit(i), i - 1]
+        i = len(self._tree)
+        total, j, stop = value, i - 1, i - (i & -i)
+        while j > stop:
+            total += self._tree[j]
+            j -= j & -j
+        self._tree.append(total)
+
+    def add(self, i, delta):
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, i):
+        """Sum of positions 1..i."""
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+
+class GroupQueue:
+    """The waiting students of one group in seq order."""
+
+    def __init__(self, entries=()):
+        self._seqs = []
+        self._slot = {}  # am -> 1-based slot in seq order
+        self._tree = FenwickTree()
+        for seq, am in entries:
+            self.append(seq, am)
+
+    def __len__(self):
+        return len(self._slot)
+
+    @property
+    def last_seq(self):
+        return self._seqs[-1] if self._seqs else 0
+
+    def append(self, seq, am):
+        self._seqs.append(seq)
+        self._tree.append(1)
+        self._slot[am] = len(self._seqs)
+
+    def remove(self, am):
+        slot = self._slot.pop(am, None)
+        if slot is not None:
+            self._tree.add(slot, -1)
+        return slot is not None
+
+    def position(self, am):
+        """1-based place in the queue, or None if the student is not waiting."""
+        slot = self._slot.get(am)
+        return self._tree.prefix_sum(slot) if slot is not None else None
+
+    def needs_compaction(self):
+        dead = len(self._seqs) - len(self._slot)
+        return dead >= WAITLIST_COMPACT_AFTER and dead > len(self._slot)
+
+    def compacted(self):
+        live = sorted((self._seqs[slot - 1], am) for am, slot in self._slot.items())
+        return GroupQueue(live)
+
+
+class WaitlistIndex:
+    """group_id -> GroupQueue, loaded per group on first use."""
+
+    def __init__(self, refresh=WAITLIST_REFRESH):
+        self.refresh = refresh
+        self._queues = {}  # group_id -> (GroupQueue, loaded_at)
+        self._lock = threading.Lock()
+
+    def _load(self, group_id):
+        rows = db.session.execute(
+            select(GroupWaitlist.seq, GroupWaitlist.am)
+            .where(GroupWaitlist.group_id == group_id)
+            .order_by(GroupWaitlist.seq)
+        ).all()
+        queue = GroupQueue(rows)
+        self._queues[group_id] = (queue, time.monotonic())
+        return queue
+
+    def _queue(self, group_id):
+        item = self._queues.get(group_id)
+        if item is None or time.monotonic() - item[1] > self.refresh:
+            return self._load(group_id)
+        return item[0]
+
+    def position(self, group_id, am):
+        """(position or None, queue length) of a student in a group's waitlist."""
+        with self._lock:
+            queue = self._queue(group_id)
+            return queue.position(am), len(queue)
+
+    def appended(self, group_id, seq, am):
+        """A committed join; groups not loaded yet pick it up when they load."""
+        with self._lock:
+            item = self._queues.get(group_id)
+            if item is None:
+                return
+            queue = item[0]
+            if seq <= queue.last_seq:
+                # Out of order: only possible if this copy is stale
+                del self._queues[group_id]
+            else:
+                queue.append(seq, am)
+
+    def removed(self, group_id, *ams):
+        """Committed departures from a group's waitlist (left, promoted or dropped)."""
+        with self._lock:
+            item = self._queues.get(group_id)
+            if item is None:
+                return
+            queue, loaded_at = item
+            for am in ams:
+                queue.remove(am)
+            if queue.needs_compaction():
+                self._queues[group_id] = (queue.compacted(), loaded_at)
+
+    def invalidate(self, group_id=None):
+        with self._lock:
+            if group_id is None:
+                self._queues.clear()
+            else:
+                self._queues.pop(group_id, None)
+
+
+waitlists = WaitlistIndex()
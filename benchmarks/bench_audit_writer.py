@@ -0,0 +1,61 @@
+"""
+Benchmark: /api/register-lab latency with the audit writer on and off.
+
+"off" writes each entry to the JSONL file and the audit_log table inside the
+request; "on" queues the entry for the background writer.
+
+Usage:
+    python benchmarks/bench_audit_writer.py [registrations_per_mode]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+
+
+def run(app, group_ids, am_start, count):
+    client = app.test_client()
+    latencies = []
+    for i in range(count):
+        am = am_start + i
+        common.login(client, am)
+        payload = {'lab_id': common.BENCH_LAB_ID, 'group_id': group_ids[i % len(group_ids)]}
+        start = time.perf_counter()
+        response = client.post('/api/register-lab', json=payload)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.get_json()
+    return latencies
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    app, db_path, workdir = common.bootstrap()
+    group_ids = common.seed_lab(db_path, students=2 * count)
+
+    import audit
+
+    results = {}
+    for label, enabled, am_start in (('writer off', False, common.BENCH_AM_BASE),
+                                     ('writer on', True, common.BENCH_AM_BASE + count)):
+        app.config['AUDIT_LOG_ASYNC'] = enabled
+        audit.init_audit(app)
+        latencies = run(app, group_ids, am_start, count)
+        audit.flush()
+        results[label] = latencies
+    audit.shutdown_audit()
+
+    print('=' * 60)
+    print(f'/api/register-lab latency, {count} registrations per mode')
+    print('=' * 60)
+    for label, latencies in results.items():
+        mean = sum(latencies) / len(latencies)
+        print(f'  {label:11s}: mean {mean:7.3f} ms   p50 {common.percentile(latencies, 50):7.3f} ms'
+              f'   p99 {common.percentile(latencies, 99):7.3f} ms')
+
+    common.cleanup(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark: seeding a lab's groups one student at a time through the admin
+force-add endpoint versus one /api/admin/enrollments/bulk request.
+
+Both paths place `students` students round-robin into the groups of the
+benchmark lab; each uses its own half of the seeded students. Reports wall
+time and students placed per second.
+
+Usage:
+    python benchmarks/bench_bulk_enroll.py [students] [groups]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+
+
+def main():
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    groups = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    app, db_path, workdir = common.bootstrap()
+    group_ids = common.seed_lab(db_path, groups=groups, students=2 * students)
+    client = app.test_client()
+    common.login(client, 999, role='admin')
+
+    one_by_one = [(common.BENCH_AM_BASE + i, group_ids[i % groups]) for i in range(students)]
+    bulk = [(common.BENCH_AM_BASE + students + i, group_ids[i % groups]) for i in range(students)]
+
+    start = time.perf_counter()
+    added = sum(client.post(f'/api/professor/group/{group_id}/student/add', json={'am': am}).status_code == 201
+                for am, group_id in one_by_one)
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    response = client.post('/api/admin/enrollments/bulk',
+                           json={'rows': [{'am': am, 'group_id': group_id} for am, group_id in bulk]})
+    batched = time.perf_counter() - start
+    bulk_added = response.get_json()['data']['added']
+
+    print('=' * 72)
+    print(f'Placing {students} students into {groups} groups')
+    print('=' * 72)
+    print(f'  force-add, one request each: {single:7.3f} s  ({added / single:8.0f} students/s, {added} added)')
+    print(f'  bulk endpoint, one request : {batched:7.3f} s  ({bulk_added / batched:8.0f} students/s, '
+          f'{bulk_added} added)')
+    print(f'  speedup: {single / batched:.1f}x')
+
+    common.cleanup(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: /cas_callback login throughput against the local CAS stub.
+
+Compares the previous behaviour (a fresh requests.get per login, no timeout)
+with the pooled CASClient, then points the client at a stub that hangs to
+show logins failing fast once the circuit breaker opens.
+
+Usage:
+    python benchmarks/bench_cas_login.py [logins] [threads]
+"""
+import os
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+from cas_stub import start_stub  # noqa: E402
+
+
+class FreshConnectionClient:
+    """The old cas_callback behaviour: new TCP connection, no timeout."""
+
+    def __init__(self, validate_url):
+        self.validate_url = validate_url
+
+    def validate(self, ticket, service):
+        from cas import parse_cas_response
+        response = requests.get(self.validate_url, params={'service': service, 'ticket': ticket}, verify=True)
+        if response.status_code != 200:
+            return None
+        return parse_cas_response(response.text)
+
+
+def run(app, am_start, logins, threads):
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    counter = iter(range(logins))
+
+    def worker():
+        client = app.test_client()
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            response = client.get(f'/cas_callback?ticket=ST-student-{am_start + i}')
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return latencies, statuses, time.perf_counter() - start
+
+
+def report(label, latencies, statuses, wall):
+    mean = sum(latencies) / len(latencies)
+    print(f'  {label:22s}: {len(latencies) / wall:7.1f} logins/s   mean {mean:7.2f} ms'
+          f'   p99 {common.percentile(latencies, 99):8.2f} ms   status {statuses}')
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    server, base_url = start_stub(delay=0.002)
+    app, db_path, workdir = common.bootstrap(
+        AUTH_MODE='cas',
+        CAS_LOGIN_URL=f'{base_url}/login',
+        CAS_VALIDATE_URL=f'{base_url}/serviceValidate',
+        CAS_BREAKER_THRESHOLD=5,
+        CAS_BREAKER_RESET=60
+    )
+    import cas
+
+    pooled = app.extensions['cas']
+    print('=' * 78)
+    print(f'/cas_callback, {logins} logins per mode, {threads} threads, stub latency 2 ms')
+    print('=' * 78)
+
+    app.extensions['cas'] = FreshConnectionClient(app.config['CAS_VALIDATE_URL'])
+    report('fresh connection', *run(app, common.BENCH_AM_BASE, logins, threads))
+    app.extensions['cas'] = pooled
+    report('pooled client', *run(app, common.BENCH_AM_BASE + logins, logins, threads))
+
+    # SSO hangs: every validation would take 5 s
+    slow_server, slow_url = start_stub(delay=5.0)
+    app.extensions['cas'] = cas.CASClient(f'{slow_url}/serviceValidate', read_timeout=0.5,
+                                          breaker=cas.CircuitBreaker(5, 60))
+    report('hung SSO, breaker', *run(app, common.BENCH_AM_BASE + 2 * logins, 200, threads))
+    print(f'  breaker state after hung SSO: {app.extensions["cas"].stats()}')
+
+    slow_server.shutdown()
+    server.shutdown()
+    common.cleanup(workdir)
+
+
+if __name__ == '__main__':
+    main()
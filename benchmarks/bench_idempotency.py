@@ -0,0 +1,63 @@
+"""
+Benchmark: what a double-submitted registration costs with and without an
+Idempotency-Key.
+
+Each of `students` students posts /api/register-lab twice. Without a key the
+duplicate runs the whole validation path again (and gets "already
+enrolled"); with a key it is answered from the response cache. Reports the
+mean latency and SQL statements of the duplicate request.
+
+Usage:
+    python benchmarks/bench_idempotency.py [students]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+
+
+def main():
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    app, db_path, workdir = common.bootstrap(AUDIT_LOG_DB='0')
+    group_ids = common.seed_lab(db_path, groups=4, capacity=students, students=2 * students)
+
+    from sqlalchemy import event
+    from models import db
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(1))
+
+    def run(offset, with_key):
+        elapsed, queries = 0.0, 0
+        for i in range(students):
+            am = common.BENCH_AM_BASE + offset + i
+            client = app.test_client()
+            common.login(client, am)
+            payload = {'lab_id': common.BENCH_LAB_ID, 'group_id': group_ids[i % len(group_ids)]}
+            headers = {'Idempotency-Key': f'register-{am}'} if with_key else {}
+            first = client.post('/api/register-lab', json=payload, headers=headers)
+            assert first.status_code == 200, first.get_json()
+            statements.clear()
+            start = time.perf_counter()
+            client.post('/api/register-lab', json=payload, headers=headers)
+            elapsed += time.perf_counter() - start
+            queries += len(statements)
+        return 1000 * elapsed / students, queries / students
+
+    plain_ms, plain_queries = run(0, with_key=False)
+    keyed_ms, keyed_queries = run(students, with_key=True)
+
+    print('=' * 72)
+    print(f'{students} students each submit /api/register-lab twice')
+    print('=' * 72)
+    print(f'  duplicate, no key      : {plain_ms:6.2f} ms, {plain_queries:4.1f} SQL statements')
+    print(f'  duplicate, same key    : {keyed_ms:6.2f} ms, {keyed_queries:4.1f} SQL statements')
+
+    common.cleanup(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark: a semester-start login storm through /cas_callback.
+
+Every user is a first-time CAS login and submits their ticket twice at the
+same moment (double click / reload), and one login in ten is a faculty member
+resolved by email among a few thousand professors. Compares the previous
+read-then-insert student creation and unindexed email scan with the upsert
+path and the indexed, cached email resolver.
+
+Usage:
+    python benchmarks/bench_login_storm.py [users] [threads]
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+from cas_stub import start_stub  # noqa: E402
+
+PROFESSOR_BASE = 700000
+PROFESSORS = 5000
+
+
+def legacy_create_or_get_student(am, name, email=None):
+    """The old helpers.create_or_get_student: read, then insert and commit."""
+    from models import db, Student
+    student = Student.query.filter_by(am=am).first()
+    if student:
+        return student, False
+    new_student = Student(am=am, name=name, semester=1, pwd='', email=email or '')
+    try:
+        db.session.add(new_student)
+        db.session.commit()
+        return new_student, True
+    except Exception:
+        db.session.rollback()
+        return None, False
+
+
+def legacy_professor_id(email):
+    from models import Professor
+    prof = Professor.query.filter_by(email=email).first()
+    return prof.prof_id if prof else None
+
+
+def seed_professors(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.executemany('INSERT OR REPLACE INTO professor (prof_id, name, status, office, email, tel) '
+                     'VALUES (?,?,?,?,?,?)',
+                     [(PROFESSOR_BASE + i, f'Bench Prof {i}', '', '', f'prof{i}@bench.local', '')
+                      for i in range(PROFESSORS)])
+    conn.commit()
+    conn.close()
+
+
+def storm(app, tickets, threads):
+    statuses, latencies = {}, []
+    lock = threading.Lock()
+    pending = iter(tickets)
+
+    def worker():
+        client = app.test_client()
+        while True:
+            with lock:
+                ticket = next(pending, None)
+            if ticket is None:
+                return
+            start = time.perf_counter()
+            status = client.get(f'/cas_callback?ticket={ticket}').status_code
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return statuses, latencies, time.perf_counter() - start
+
+
+def make_tickets(users, am_start):
+    tickets = []
+    for i in range(users):
+        if i % 10 == 9:
+            ticket = f'ST-faculty-prof{(i * 7919) % PROFESSORS}@bench.local'
+        else:
+            ticket = f'ST-student-{am_start + i}'
+        tickets += [ticket, ticket]  # same user twice, picked up by two threads at once
+    return tickets
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    server, base_url = start_stub()
+    app, db_path, workdir = common.bootstrap(AUTH_MODE='cas', CAS_VALIDATE_URL=f'{base_url}/serviceValidate')
+    seed_professors(db_path)
+
+    from models import db
+    from sqlalchemy import text
+    import routes.auth_routes as auth_routes
+
+    upsert_create, cached_resolver = auth_routes.create_or_get_student, auth_routes.get_professor_id_by_email
+
+    print('=' * 78)
+    print(f'Login storm: {users} first-time users x 2 concurrent tickets, {threads} threads, '
+          f'{PROFESSORS} professors')
+    print('=' * 78)
+
+    with app.app_context():
+        db.session.execute(text('DROP INDEX IF EXISTS ix_professor_email'))
+        db.session.commit()
+    auth_routes.create_or_get_student = legacy_create_or_get_student
+    auth_routes.get_professor_id_by_email = legacy_professor_id
+    results = {'read-then-insert': storm(app, make_tickets(users, common.BENCH_AM_BASE), threads)}
+
+    with app.app_context():
+        db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_professor_email ON professor (email)'))
+        db.session.commit()
+    auth_routes.create_or_get_student = upsert_create
+    auth_routes.get_professor_id_by_email = cached_resolver
+    results['upsert + email index'] = storm(app, make_tickets(users, common.BENCH_AM_BASE + users), threads)
+
+    for label, (statuses, latencies, wall) in results.items():
+        print(f'  {label:21s}: {len(latencies) / wall:7.1f} logins/s   '
+              f'p50 {common.percentile(latencies, 50):7.2f} ms   p99 {common.percentile(latencies, 99):8.2f} ms'
+              f'   status {dict(sorted(statuses.items()))}')
+
+    server.shutdown()
+    common.cleanup(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Micro-benchmark: overhead of the @require_permission decorator.
+
+Compares the old behaviour (a fresh PermissionMatrix per request, i.e. an
+os.path.exists probe plus json.load of permission_matrix.json) against the
+compiled, process-wide PermissionEngine.
+
+Usage:
+    python benchmarks/bench_permissions.py [iterations]
+"""
+import functools
+import json
+import os
+import sys
+import time
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+sys.path.insert(0, APP_DIR)
+
+from flask import Flask, session  # noqa: E402
+from auth import MATRIX_FILE, require_permission  # noqa: E402
+
+
+class LegacyPermissionMatrix:
+    """Copy of the pre-engine PermissionMatrix: reads the JSON file on construction."""
+
+    def __init__(self):
+        matrix_file = 'test_permission_matrix.json' if os.path.exists('test_permission_matrix.json') else MATRIX_FILE
+        with open(matrix_file, 'r', encoding='utf-8') as f:
+            self.matrix = json.load(f)
+
+    def has_permission(self, role, resource, action):
+        if role not in self.matrix['roles']:
+            return False
+        if resource not in self.matrix['resources']:
+            return False
+        resource_config = self.matrix['resources'][resource]
+        if action not in resource_config:
+            return False
+        return role in resource_config[action]
+
+
+def legacy_require_permission(resource, action):
+    def decorator(f):
+        @functools.wraps(f)
+        def decorated_function(*args, **kwargs):
+            matrix = LegacyPermissionMatrix()
+            role = session.get('role', 'guest') if 'schGrAcPersonID' in session else 'guest'
+            if not matrix.has_permission(role, resource, action):
+                return 'denied'
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def view():
+    return 'ok'
+
+
+def timed(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    app = Flask(__name__)
+    app.secret_key = 'bench'
+
+    baseline = view
+    legacy = legacy_require_permission('registrations', 'create')(view)
+    compiled = require_permission('registrations', 'create')(view)
+
+    with app.test_request_context('/api/register-lab', method='POST'):
+        session['schGrAcPersonID'] = '13628'
+        session['role'] = 'student'
+
+        assert legacy() == compiled() == 'ok'
+
+        bare_us = timed(baseline, iterations)
+        legacy_us = timed(legacy, iterations)
+        compiled_us = timed(compiled, iterations)
+
+    print('=' * 60)
+    print(f'@require_permission overhead ({iterations} calls)')
+    print('=' * 60)
+    print(f'  undecorated view        : {bare_us:8.2f} us/call')
+    print(f'  legacy (json per call)  : {legacy_us - bare_us:8.2f} us/call')
+    print(f'  compiled engine         : {compiled_us - bare_us:8.2f} us/call')
+    if compiled_us > bare_us:
+        print(f'  speed-up                : {(legacy_us - bare_us) / (compiled_us - bare_us):8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
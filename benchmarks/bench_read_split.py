@@ -0,0 +1,101 @@
+"""
+Benchmark: read throughput during a registration write storm, with GET
+requests on the shared primary engine versus the read-only engine.
+
+Reader threads poll /api/semesters, /api/courses/<semester>,
+/api/groups/<lab_id> and /api/student/enrollments while writer threads
+register students and unenroll them again as fast as they can. Each mode
+runs in a fresh subprocess on its own copy of the database.
+
+Usage:
+    python benchmarks/bench_read_split.py [seconds] [readers] [writers]
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+
+MODES = {'shared': '0', 'read-only engine': '1'}
+SEMESTER = '9ο Εξάμηνο'
+
+
+def run_mode(readonly, seconds, readers, writers):
+    app, db_path, workdir = common.bootstrap(SQLITE_READONLY_ENGINE=readonly, AUDIT_LOG_DB='0')
+    group_ids = common.seed_lab(db_path, students=readers + writers)
+    lab_id = common.BENCH_LAB_ID
+    urls = ['/api/semesters', f'/api/courses/{quote(SEMESTER)}', f'/api/groups/{lab_id}',
+            '/api/student/enrollments']
+
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def reader(i):
+        client = app.test_client()
+        common.login(client, common.BENCH_AM_BASE + writers + i)
+        n = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            ok = client.get(urls[n % len(urls)]).status_code == 200
+            elapsed = time.perf_counter() - start
+            n += 1
+            with lock:
+                counts['reads' if ok else 'errors'] += 1
+                latencies.append(elapsed)
+
+    def writer(i):
+        client = app.test_client()
+        common.login(client, common.BENCH_AM_BASE + i)
+        payload = {'lab_id': lab_id, 'group_id': group_ids[i % len(group_ids)]}
+        while time.perf_counter() < deadline:
+            for ok in (client.post('/api/register-lab', json=payload).status_code == 200,
+                       client.delete(f'/api/student/enrollment/{lab_id}').status_code == 200):
+                with lock:
+                    counts['writes' if ok else 'errors'] += 1
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    common.cleanup(workdir)
+    result = {k: v / wall for k, v in counts.items()}
+    result['read_p50_ms'] = common.percentile(latencies, 50) * 1000
+    result['read_p95_ms'] = common.percentile(latencies, 95) * 1000
+    return result
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--mode':
+        readonly, seconds, readers, writers = sys.argv[2], float(sys.argv[3]), int(sys.argv[4]), int(sys.argv[5])
+        print(json.dumps(run_mode(readonly, seconds, readers, writers)))
+        return
+
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+    writers = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+    print('=' * 72)
+    print(f'{readers} readers during a {writers}-writer registration storm, {seconds:g}s per mode')
+    print('=' * 72)
+    for label, readonly in MODES.items():
+        out = subprocess.run([sys.executable, __file__, '--mode', readonly, str(seconds), str(readers), str(writers)],
+                             capture_output=True, text=True, check=True).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(f"  {label:17s}: reads {r['reads']:7.1f}/s (p50 {r['read_p50_ms']:6.1f} ms, "
+              f"p95 {r['read_p95_ms']:6.1f} ms)   writes {r['writes']:6.1f}/s   errors {r['errors']:5.1f}/s")
+
+
+if __name__ == '__main__':
+    main()
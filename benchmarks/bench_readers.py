@@ -0,0 +1,94 @@
+"""
+Benchmark: listing queries as full ORM loads versus the Core row projections
+in app/readers.py.
+
+Each listing is loaded both ways from a database padded with `rows` students,
+professors, labs and groups. Reported per row: CPU time (best of `repeats`)
+and the memory still allocated while the result is held, identity map
+included.
+
+Usage:
+    python benchmarks/bench_readers.py [rows] [repeats]
+"""
+import os
+import sqlite3
+import sys
+import time
+import tracemalloc
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+
+PAD_BASE = 700000
+
+
+def pad(db_path, rows):
+    """Add `rows` rows to each listed table."""
+    ids = range(PAD_BASE, PAD_BASE + rows)
+    conn = sqlite3.connect(db_path)
+    conn.executemany('INSERT INTO professor (prof_id, name, status, office, email, tel) VALUES (?,?,?,?,?,?)',
+                     [(i, f'Καθηγητής {i}', 'Λέκτορας', f'Γραφείο {i}', f'p{i}@uoi.gr', '2651000000') for i in ids])
+    conn.executemany('INSERT INTO course_lab (lab_id, name, description, maxusers, reg_limit, max_misses) '
+                     'VALUES (?,?,?,?,?,?)',
+                     [(i, f'Εργαστήριο {i}', 'Ασκήσεις', 20, date(2030, 1, 1).isoformat(), 3) for i in ids])
+    conn.executemany('INSERT INTO lab_groups (group_id, daytime, year, finalize) VALUES (?,?,?,?)',
+                     [(i, 'Δευτέρα 10:00-12:00', 2025, '') for i in ids])
+    conn.commit()
+    conn.close()
+    common.seed_lab(db_path, groups=1, students=rows, am_base=PAD_BASE)
+
+
+def measure(app, db, load, repeats):
+    """(best CPU seconds, bytes held, row count) for one loader."""
+    best = float('inf')
+    for _ in range(repeats):
+        with app.app_context():
+            start = time.process_time()
+            rows = load()
+            best = min(best, time.process_time() - start)
+            db.session.remove()
+    with app.app_context():
+        tracemalloc.start()
+        rows = load()
+        held = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        count = len(rows)
+        del rows
+        db.session.remove()
+    return best, held, count
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    app, db_path, workdir = common.bootstrap(AUDIT_LOG_DB='0')
+    pad(db_path, rows)
+
+    import readers
+    from models import db, CourseLab, LabGroup, Professor, Student
+
+    cases = [
+        ('students_page', lambda: Student.query.all(), readers.student_rows),
+        ('professors_page', lambda: Professor.query.all(), readers.professor_rows),
+        ('labs_page', lambda: CourseLab.query.all(), readers.lab_rows),
+        ('/groups', lambda: LabGroup.query.all(), readers.group_rows),
+    ]
+
+    print('=' * 78)
+    print(f'ORM entities vs row projections, ~{rows} rows per listing, best of {repeats}')
+    print('=' * 78)
+    print(f"  {'listing':16s} {'rows':>7s}   {'ORM us/row':>10s} {'rows us/row':>11s}   "
+          f"{'ORM B/row':>9s} {'rows B/row':>10s}")
+    for label, orm_load, reader in cases:
+        orm_cpu, orm_mem, count = measure(app, db, orm_load, repeats)
+        row_cpu, row_mem, _ = measure(app, db, reader, repeats)
+        print(f'  {label:16s} {count:7d}   {orm_cpu / count * 1e6:10.2f} {row_cpu / count * 1e6:11.2f}   '
+              f'{orm_mem / count:9.0f} {row_mem / count:10.0f}')
+
+    common.cleanup(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark: the opening minute of a popular lab, with and without the
+registration admission controller.
+
+Every student submits /api/register-lab at the same moment (one thread per
+student, released together), spread over a few groups. Reports the latency
+percentiles and the outcome mix: registered, group full (a correct answer),
+queue rejected (503, the client retries) and errors (the request failed
+inside the registration, e.g. the write lock timed out). A queued student
+(202) polls its ticket as often as the answer's poll_after says, like the
+registration page, and the latency runs until the final answer. Each mode runs in a fresh subprocess on its own
+copy of the database.
+
+Usage:
+    python benchmarks/bench_registration_admission.py [students] [groups] [capacity]
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+
+MODES = {'no admission control': '0', 'admission control': '1'}
+
+
+def run_mode(admission, students, groups, capacity):
+    app, db_path, workdir = common.bootstrap(REGISTRATION_ADMISSION=admission, AUDIT_LOG_DB='0')
+    group_ids = common.seed_lab(db_path, groups=groups, capacity=capacity, students=students)
+    lab_id = common.BENCH_LAB_ID
+
+    clients = []
+    for i in range(students):
+        client = app.test_client()
+        common.login(client, common.BENCH_AM_BASE + i)
+        clients.append(client)
+    # Warm up the schema check and the caches outside the measurement
+    clients[0].get(f'/api/groups/{lab_id}')
+
+    outcomes = {'registered': 0, 'full': 0, 'rejected': 0, 'errors': 0}
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(students)
+
+    def student(i):
+        try:
+            attempt(i)
+        except Exception:
+            with lock:
+                outcomes['errors'] += 1
+
+    def attempt(i):
+        payload = {'lab_id': lab_id, 'group_id': group_ids[i % len(group_ids)]}
+        barrier.wait()
+        start = time.perf_counter()
+        response = clients[i].post('/api/register-lab', json=payload)
+        while response.status_code == 202:
+            queued = response.get_json()
+            time.sleep(queued['poll_after'])
+            response = clients[i].get(queued['status_url'])
+        elapsed = time.perf_counter() - start
+        error_type = (response.get_json() or {}).get('details', {}).get('error_type')
+        if response.status_code == 200:
+            outcome = 'registered'
+        elif error_type == 'group_full':
+            outcome = 'full'
+        elif response.status_code == 503:
+            outcome = 'rejected'
+        else:
+            outcome = 'errors'
+        with lock:
+            outcomes[outcome] += 1
+            latencies.append(elapsed)
+
+    threads = [threading.Thread(target=student, args=(i,)) for i in range(students)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    common.cleanup(workdir)
+    result = dict(outcomes)
+    result['wall_s'] = wall
+    result['p50_ms'] = common.percentile(latencies, 50) * 1000
+    result['p99_ms'] = common.percentile(latencies, 99) * 1000
+    return result
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--mode':
+        admission, students, groups, capacity = sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), int(sys.argv[5])
+        print(json.dumps(run_mode(admission, students, groups, capacity)))
+        return
+
+    students = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    groups = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    capacity = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+
+    print('=' * 78)
+    print(f'{students} simultaneous registrations into {groups} groups of {capacity} seats')
+    print('=' * 78)
+    for label, admission in MODES.items():
+        out = subprocess.run([sys.executable, __file__, '--mode', admission, str(students), str(groups),
+                              str(capacity)], capture_output=True, text=True, check=True).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        error_rate = r['errors'] / students * 100
+        print(f"  {label:21s}: p50 {r['p50_ms']:7.1f} ms  p99 {r['p99_ms']:7.1f} ms   "
+              f"registered {r['registered']:4d}  full {r['full']:4d}  rejected {r['rejected']:4d}  "
+              f"errors {r['errors']:4d} ({error_rate:.1f}%)  wall {r['wall_s']:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
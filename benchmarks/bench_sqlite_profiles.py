@@ -0,0 +1,89 @@
+"""
+Benchmark: reader/writer throughput under each SQLite pragma profile.
+
+Reader threads poll GET /api/groups/<lab_id> and /api/student/enrollments
+while writer threads register students to a lab and unenroll them again.
+Each profile runs in a fresh subprocess on its own copy of the database,
+since the pragmas are bound to the engine at import time. Foreign keys are
+enforced in every profile; the rest of 'legacy' is SQLite's defaults.
+
+Usage:
+    python benchmarks/bench_sqlite_profiles.py [seconds] [readers] [writers]
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+
+PROFILES = ('legacy', 'safe', 'performance')
+
+
+def run_profile(profile, seconds, readers, writers):
+    app, db_path, workdir = common.bootstrap(SQLITE_PROFILE=profile, AUDIT_LOG_DB='0')
+    group_ids = common.seed_lab(db_path, students=writers)
+    lab_id = common.BENCH_LAB_ID
+
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def count(key, ok):
+        with lock:
+            counts[key if ok else 'errors'] += 1
+
+    def reader(i):
+        client = app.test_client()
+        common.login(client, common.BENCH_AM_BASE + i % writers)
+        while time.perf_counter() < deadline:
+            count('reads', client.get(f'/api/groups/{lab_id}').status_code == 200)
+            count('reads', client.get('/api/student/enrollments').status_code == 200)
+
+    def writer(i):
+        client = app.test_client()
+        common.login(client, common.BENCH_AM_BASE + i)
+        payload = {'lab_id': lab_id, 'group_id': group_ids[i % len(group_ids)]}
+        while time.perf_counter() < deadline:
+            count('writes', client.post('/api/register-lab', json=payload).status_code == 200)
+            count('writes', client.delete(f'/api/student/enrollment/{lab_id}').status_code == 200)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    common.cleanup(workdir)
+    return {k: v / wall for k, v in counts.items()}
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == '--profile':
+        profile, seconds, readers, writers = sys.argv[2], float(sys.argv[3]), int(sys.argv[4]), int(sys.argv[5])
+        print(json.dumps(run_profile(profile, seconds, readers, writers)))
+        return
+
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    writers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    print('=' * 72)
+    print(f'{readers} readers + {writers} writers for {seconds:g}s per profile (requests/s)')
+    print('=' * 72)
+    for profile in PROFILES:
+        out = subprocess.run([sys.executable, __file__, '--profile', profile, str(seconds), str(readers), str(writers)],
+                             capture_output=True, text=True, check=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        print(f"  {profile:12s}: reads {result['reads']:8.1f}   writes {result['writes']:7.1f}"
+              f"   errors {result['errors']:6.1f}")
+
+
+if __name__ == '__main__':
+    main()
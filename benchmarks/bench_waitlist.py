@@ -0,0 +1,65 @@
+"""
+Benchmark: waitlist queue positions from the in-process Fenwick index versus
+counting the group's rows in SQLite.
+
+`waiting` students queue for one group, a third of them leave again, then
+every remaining student asks for their position. The SQL variant is
+SELECT COUNT(*) over the (group_id, seq) index range, which is linear in the
+position; the index answers with a prefix sum.
+
+Usage:
+    python benchmarks/bench_waitlist.py [waiting]
+"""
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import common  # noqa: E402
+
+
+def main():
+    waiting = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    app, db_path, workdir = common.bootstrap(AUDIT_LOG_DB='0')
+    group_id = common.seed_lab(db_path, groups=1, capacity=1, students=waiting)[0]
+
+    conn = sqlite3.connect(db_path)
+    now = datetime.now().isoformat(sep=' ')
+    conn.executemany('INSERT INTO group_waitlist (group_id, lab_id, am, joined_at) VALUES (?,?,?,?)',
+                     ((group_id, common.BENCH_LAB_ID, common.BENCH_AM_BASE + i, now) for i in range(waiting)))
+    conn.execute('DELETE FROM group_waitlist WHERE am % 3 = 0')
+    conn.commit()
+    queue = conn.execute('SELECT seq, am FROM group_waitlist WHERE group_id = ? ORDER BY seq',
+                         (group_id,)).fetchall()
+
+    print('=' * 72)
+    print(f'{len(queue)} students waiting for one group, every one asks for their position')
+    print('=' * 72)
+
+    start = time.perf_counter()
+    by_count = [conn.execute('SELECT COUNT(*) FROM group_waitlist WHERE group_id = ? AND seq <= ?',
+                             (group_id, seq)).fetchone()[0] for seq, _ in queue]
+    counted = time.perf_counter() - start
+    conn.close()
+    print(f'  SQL COUNT(*)   : {counted:7.3f} s  ({1e6 * counted / len(queue):7.1f} us/lookup)')
+
+    from waitlist import waitlists
+    with app.app_context():
+        start = time.perf_counter()
+        waitlists.position(group_id, queue[0][1])
+        loaded = time.perf_counter() - start
+        start = time.perf_counter()
+        by_index = [waitlists.position(group_id, am)[0] for _, am in queue]
+        indexed = time.perf_counter() - start
+    print(f'  Fenwick index  : {indexed:7.3f} s  ({1e6 * indexed / len(queue):7.1f} us/lookup, '
+          f'first load {loaded * 1000:.1f} ms)')
+    print(f'  speedup: {counted / indexed:.1f}x; positions agree: {by_count == by_index}')
+
+    common.cleanup(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Local CAS stand-in for offline login testing and load tests.
+
+Implements just enough of CAS 2.0 for /cas_callback:
+
+    /login?service=...&user=student:13628     -> 302 to service?ticket=ST-...
+    /serviceValidate?service=...&ticket=...   -> cas:serviceResponse XML
+
+Tickets encode the user, so the stub is stateless and any number of them can
+be minted by a load generator without going through /login:
+
+    ST-student-<am>       authenticationSuccess, affiliation "student"
+    ST-faculty-<email>    authenticationSuccess, affiliation "faculty"
+    anything else         authenticationFailure INVALID_TICKET
+
+--delay adds a fixed per-validation latency to simulate a slow SSO server.
+
+Usage:
+    python benchmarks/cas_stub.py [--port 8765] [--delay 0.05]
+    AUTH_MODE=cas CAS_LOGIN_URL=http://127.0.0.1:8765/login \\
+        CAS_VALIDATE_URL=http://127.0.0.1:8765/serviceValidate python app/app.py
+"""
+import argparse
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+from xml.sax.saxutils import escape
+
+SUCCESS_XML = """<cas:serviceResponse xmlns:cas="http://www.yale.edu/tp/cas">
+  <cas:authenticationSuccess>
+    <cas:user>{uid}</cas:user>
+    <cas:schGrAcPersonID>{uid}</cas:schGrAcPersonID>
+    <cas:displayName>{name}</cas:displayName>
+    <cas:eduPersonAffiliation>{affiliation}</cas:eduPersonAffiliation>
+    <cas:mail>{mail}</cas:mail>
+  </cas:authenticationSuccess>
+</cas:serviceResponse>"""
+
+FAILURE_XML = """<cas:serviceResponse xmlns:cas="http://www.yale.edu/tp/cas">
+  <cas:authenticationFailure code="INVALID_TICKET">Ticket {ticket} not recognized</cas:authenticationFailure>
+</cas:serviceResponse>"""
+
+
+def validation_body(ticket):
+    parts = ticket.split('-', 2)
+    if len(parts) == 3 and parts[0] == 'ST' and parts[1] in ('student', 'faculty') and parts[2]:
+        affiliation, value = parts[1], escape(parts[2])
+        if affiliation == 'student':
+            return SUCCESS_XML.format(uid=value, name=f'Stub Student {value}',
+                                      affiliation='student', mail=f'{value}@stub.local')
+        return SUCCESS_XML.format(uid=value, name=f'Stub Faculty {value}',
+                                  affiliation='faculty', mail=value)
+    return FAILURE_XML.format(ticket=escape(ticket))
+
+
+class CASStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like a real CAS server
+    delay = 0.0
+    validations = 0
+    _count_lock = threading.Lock()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if url.path == '/serviceValidate':
+            with self._count_lock:
+                CASStubHandler.validations += 1
+            if self.delay:
+                time.sleep(self.delay)
+            self._send(200, validation_body(params.get('ticket', '')), 'text/xml; charset=utf-8')
+        elif url.path == '/login' and 'service' in params:
+            role, _, value = params.get('user', 'student:13628').partition(':')
+            ticket = f"ST-{'faculty' if role == 'faculty' else 'student'}-{value}"
+            self.send_response(302)
+            self.send_header('Location', f"{params['service']}?{urlencode({'ticket': ticket})}")
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        else:
+            self._send(404, 'not found', 'text/plain')
+
+    def _send(self, status, body, content_type):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(port=0, delay=0.0):
+    """Start the stub on a daemon thread. Returns (server, base_url)."""
+    handler = type('Handler', (CASStubHandler,), {'delay': delay})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='cas-stub', daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--delay', type=float, default=0.0, help='seconds added to every validation')
+    args = parser.parse_args()
+
+    server, base_url = start_stub(args.port, args.delay)
+    print(f'CAS stub listening on {base_url} (delay {args.delay}s), Ctrl+C to stop')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Every benchmark works on a throw-away copy of app/data/labregister.sqlite so
+the development database is never touched. Call bootstrap() before anything
+from the app is imported: app.py reads DATABASE_PATH at import time.
+"""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT_DIR, 'app')
+SOURCE_DB = os.path.join(APP_DIR, 'data', 'labregister.sqlite')
+
+BENCH_LAB_ID = 9001
+BENCH_COURSE_ID = 9001
+BENCH_GROUP_BASE = 90000
+BENCH_AM_BASE = 500000
+
+
+def academic_year():
+    today = datetime.now()
+    return today.year - 1 if today.timetuple().tm_yday < 35 else today.year
+
+
+def bootstrap(workdir=None, **config_env):
+    """Copy the database to a temp dir, point the app at it and import it.
+
+    Returns (flask_app, db_path, workdir).
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix='unilabs-bench-')
+    db_path = os.path.join(workdir, 'labregister.sqlite')
+    shutil.copyfile(SOURCE_DB, db_path)
+
+    os.environ['DATABASE_PATH'] = db_path
+    os.environ.setdefault('AUDIT_LOG_PATH', os.path.join(workdir, 'audit.jsonl'))
+    for key, value in config_env.items():
+        os.environ[key] = str(value)
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+
+    from app import app
+    from models import db
+    from migrations import upgrade
+    app.config['TESTING'] = True
+    # The app migrates lazily on the first request; seed_lab() writes before that
+    with app.app_context():
+        upgrade(db.engine, metadata=db.metadata)
+    return app, db_path, workdir
+
+
+def seed_lab(db_path, groups=10, capacity=100000, students=1000, am_base=BENCH_AM_BASE):
+    """Create one open lab with `groups` groups of `capacity` seats and `students` students."""
+    year = academic_year()
+    deadline = (datetime.now() + timedelta(days=30)).date().isoformat()
+    group_ids = [BENCH_GROUP_BASE + i for i in range(groups)]
+
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    cur.execute('INSERT OR REPLACE INTO coursename (course_id, name, description, semester) '
+                'VALUES (?,?,?,?)', (BENCH_COURSE_ID, 'Benchmark Course', '', '9ο Εξάμηνο'))
+    cur.execute('INSERT OR REPLACE INTO course_lab (lab_id, name, description, maxusers, reg_limit, max_misses) '
+                'VALUES (?,?,?,?,?,?)', (BENCH_LAB_ID, 'Benchmark Lab', '', capacity, deadline, 3))
+    cur.execute('INSERT OR IGNORE INTO rel_course_lab (course_id, lab_id) VALUES (?,?)',
+                (BENCH_COURSE_ID, BENCH_LAB_ID))
+    cur.executemany('INSERT OR REPLACE INTO lab_groups (group_id, daytime, year, finalize) VALUES (?,?,?,?)',
+                    [(gid, f'Bench {gid}', year, '') for gid in group_ids])
+    cur.executemany('INSERT OR IGNORE INTO rel_lab_group (lab_id, group_id) VALUES (?,?)',
+                    [(BENCH_LAB_ID, gid) for gid in group_ids])
+    cur.executemany('INSERT OR REPLACE INTO student (am, name, semester, pwd, email) VALUES (?,?,?,?,?)',
+                    [(am, f'Bench Student {am}', 5, '', f'{am}@bench.local')
+                     for am in range(am_base, am_base + students)])
+    conn.commit()
+    conn.close()
+    return group_ids
+
+
+def login(client, user_id, role='student'):
+    with client.session_transaction() as sess:
+        sess['schGrAcPersonID'] = str(user_id)
+        sess['role'] = role
+        sess['name'] = f'bench {user_id}'
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def cleanup(workdir):
+    # Drain the audit writer first: its sinks live in workdir
+    if 'audit' in sys.modules:
+        sys.modules['audit'].shutdown_audit()
+    shutil.rmtree(workdir, ignore_errors=True)
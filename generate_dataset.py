@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+"""
+generate_dataset.py - Build a large synthetic UniLabs database for load and scale testing.
+
+Usage (from the project root):
+    python generate_dataset.py --students 100000 --output /tmp/unilabs-100k.sqlite
+    DATABASE_PATH=/tmp/unilabs-100k.sqlite python app/app.py
+
+The same parameters and --seed always produce the same rows. Every history year
+has all four study-year cohorts; an active student takes --labs-per-year labs of
+their current semester in each year they are active. Past enrollments are
+completed or failed, the current year's are in progress. Each enrollment gets
+--sessions weekly lab dates, each missed with probability --absence-density.
+
+The schema comes from the migration baseline (app/migrations.py). Secondary
+indexes are dropped while the tables are filled with executemany in one
+transaction per table and rebuilt at the end. Student AMs start at 10001 and
+professor IDs at 101, so the dev accounts (student1/2, prof1/2, admin1) exist.
+"""
+import argparse
+import math
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, 'app', 'data', 'synthetic.sqlite')
+
+AM_BASE = 10001
+PROF_BASE = 101
+ADMIN_ID = 999
+COURSE_BASE = 1001
+SEMESTERS = 8
+STUDY_YEARS = SEMESTERS // 2
+BATCH = 50000
+
+STATUS_IN_PROGRESS = 'Σε Εξέλιξη'
+STATUS_COMPLETED = 'Ολοκληρωμένο'
+STATUS_FAILED = 'Αποτυχία'
+
+DAYS = ['Δευτέρα', 'Τρίτη', 'Τετάρτη', 'Πέμπτη', 'Παρασκευή']
+SLOTS = ['09:00-11:00', '11:00-13:00', '13:00-15:00', '15:00-17:00', '17:00-19:00']
+SURNAMES = ['Παπαδόπουλος', 'Γεωργίου', 'Δημητρίου', 'Νικολάου', 'Ιωάννου', 'Αντωνίου',
+            'Κωνσταντίνου', 'Βασιλείου', 'Αθανασίου', 'Χριστοδούλου', 'Οικονόμου', 'Μιχαηλίδης']
+FIRST_NAMES = ['Μαρία', 'Γιώργος', 'Ελένη', 'Κώστας', 'Σοφία', 'Νίκος',
+               'Αικατερίνη', 'Δημήτρης', 'Ανδρέας', 'Βασιλική', 'Πέτρος', 'Χριστίνα']
+TOPICS = ['Προγραμματισμός', 'Δομές Δεδομένων', 'Βάσεις Δεδομένων', 'Δίκτυα', 'Λειτουργικά Συστήματα',
+          'Αλγόριθμοι', 'Ψηφιακά Κυκλώματα', 'Τεχνητή Νοημοσύνη', 'Γραφικά', 'Ασφάλεια']
+
+
+def get_academic_year():
+    today = date.today()
+    return today.year - 1 if today.timetuple().tm_yday < 35 else today.year
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description='Build a large synthetic UniLabs database.')
+    p.add_argument('--students', type=int, default=100000)
+    p.add_argument('--courses', type=int, default=120)
+    p.add_argument('--labs-per-course', type=int, default=2)
+    p.add_argument('--groups-per-lab', type=int, default=4, help='groups per lab and academic year')
+    p.add_argument('--years', type=int, default=5, help='academic years of history, current year included')
+    p.add_argument('--labs-per-year', type=int, default=3, help='labs each active student takes per year')
+    p.add_argument('--sessions', type=int, default=13, help='weekly sessions per lab group')
+    p.add_argument('--absence-density', type=float, default=0.08,
+                   help='probability that a student misses a session')
+    p.add_argument('--seed', type=int, default=42)
+    p.add_argument('--output', default=DEFAULT_OUTPUT)
+    p.add_argument('--force', action='store_true', help='overwrite an existing output file')
+    args = p.parse_args(argv)
+    if min(args.students, args.courses, args.labs_per_course, args.groups_per_lab, args.years) < 1:
+        p.error('counts must be positive')
+    if not 0 <= args.absence_density <= 1:
+        p.error('--absence-density must be between 0 and 1')
+    return args
+
+
+def create_schema(path):
+    """Create the current schema through the migration baseline."""
+    sys.path.insert(0, os.path.join(BASE_DIR, 'app'))
+    from sqlalchemy import create_engine
+    from migrations import upgrade
+    from models import db
+
+    engine = create_engine(f'sqlite:///{path}')
+    upgrade(engine, metadata=db.metadata)
+    engine.dispose()
+
+
+def drop_secondary_indexes(conn, tables):
+    """Drop the named indexes on tables and return the SQL to rebuild them."""
+    placeholders = ','.join('?' * len(tables))
+    rows = conn.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+        f"AND tbl_name IN ({placeholders})", tables).fetchall()
+    for name, _ in rows:
+        conn.execute(f'DROP INDEX "{name}"')
+    return [sql for _, sql in rows]
+
+
+# =================================================================
+# GENERATION
+# =================================================================
+
+class Generator:
+    """Deterministic row generator; all randomness comes from one seeded Random."""
+
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.current_year = get_academic_year()
+        self.first_year = self.current_year - args.years + 1
+        self.course_semester = {}
+        self.course_prof = {}
+        self.labs_by_semester = {s: [] for s in range(1, SEMESTERS + 1)}
+        self.lab_groups = {}       # (lab_id, year) -> [group_id]
+        self.group_info = {}       # group_id -> (lab_id, year, weekday)
+        self.group_fill = {}
+        self.lab_misses = {}
+        self.lab_absences = {}     # (am, lab_id) -> absences, for rel_lab_student.misses
+
+    def professors(self):
+        count = max(2, math.ceil(self.args.courses / 3))
+        for i in range(count):
+            prof_id = PROF_BASE + i
+            yield (prof_id, self._person(), 'Καθηγητής', f'Γραφείο {i // 20 + 1}-{i % 20 + 100}',
+                   f'prof{prof_id}@uoi.gr', f'265100{prof_id:04d}')
+        if not PROF_BASE <= ADMIN_ID < PROF_BASE + count:
+            yield (ADMIN_ID, 'System Administrator', 'Διαχειριστής', 'IT Office', 'admin@uoi.gr', '2651009999')
+        self.prof_count = count
+
+    def courses(self):
+        for i in range(self.args.courses):
+            course_id = COURSE_BASE + i
+            semester = i % SEMESTERS + 1
+            self.course_semester[course_id] = semester
+            self.course_prof[course_id] = PROF_BASE + i % self.prof_count
+            topic = TOPICS[i % len(TOPICS)]
+            yield (course_id, f'{topic} {i // len(TOPICS) + 1}', f'Μάθημα {topic}', f'{semester}ο Εξάμηνο')
+
+    def course_professors(self):
+        return self.course_prof.items()
+
+    def labs(self):
+        """Labs with a provisional capacity; capacities() sets it from the generated fill."""
+        lab_id = 1
+        today = date.today()
+        for course_id, semester in self.course_semester.items():
+            for n in range(self.args.labs_per_course):
+                self.labs_by_semester[semester].append((course_id, lab_id))
+                max_misses = self.rng.choice((2, 3, 3, 4))
+                self.lab_misses[lab_id] = max_misses
+                # One lab in ten has its registration period already closed
+                closed = self.rng.random() < 0.1
+                reg_limit = today + timedelta(days=-30 if closed else 180)
+                yield (lab_id, f'Εργαστήριο {course_id}-{n + 1}', 'Εργαστηριακές ασκήσεις',
+                       0, reg_limit.isoformat(), max_misses)
+                lab_id += 1
+
+    def course_labs(self):
+        for labs in self.labs_by_semester.values():
+            yield from labs
+
+    def groups(self):
+        group_id = 1
+        for labs in self.labs_by_semester.values():
+            for _, lab_id in labs:
+                for year in range(self.first_year, self.current_year + 1):
+                    ids = []
+                    for _ in range(self.args.groups_per_lab):
+                        day = self.rng.randrange(len(DAYS))
+                        self.group_info[group_id] = (lab_id, year, day)
+                        self.group_fill[group_id] = 0
+                        ids.append(group_id)
+                        yield (group_id, f'{DAYS[day]} {self.rng.choice(SLOTS)}', year, '')
+                        group_id += 1
+                    self.lab_groups[lab_id, year] = ids
+
+    def lab_group_links(self):
+        for group_id, (lab_id, _, _) in self.group_info.items():
+            yield (lab_id, group_id)
+
+    def group_professors(self):
+        course_of_lab = {lab_id: course_id for labs in self.labs_by_semester.values()
+                         for course_id, lab_id in labs}
+        for group_id, (lab_id, _, _) in self.group_info.items():
+            yield (self.course_prof[course_of_lab[lab_id]], group_id)
+
+    def students(self):
+        """Students with an entry year spread so every history year has all cohorts."""
+        first_entry = self.first_year - STUDY_YEARS + 1
+        self.entry_year = {}
+        for i in range(self.args.students):
+            am = AM_BASE + i
+            entry = self.rng.randint(first_entry, self.current_year)
+            self.entry_year[am] = entry
+            semester = min(2 * (self.current_year - entry) + 1, 12)
+            yield (am, self._person(), semester, '', f'st{am}@student.uoi.gr')
+
+    def enrollments(self):
+        """(am, group_id, lab_id, year, semester_half) for every lab a student took."""
+        per_year = self.args.labs_per_year
+        for am, entry in self.entry_year.items():
+            for year in range(max(entry, self.first_year), min(entry + STUDY_YEARS, self.current_year + 1)):
+                half = self.rng.randrange(2)
+                labs = self.labs_by_semester[2 * (year - entry) + 1 + half]
+                for _, lab_id in self.rng.sample(labs, min(per_year, len(labs))):
+                    group_id = self.rng.choice(self.lab_groups[lab_id, year])
+                    self.group_fill[group_id] += 1
+                    yield am, group_id, lab_id, year, half
+
+    def absences(self, enrollments):
+        """student_absence rows; also records the miss count of each enrollment."""
+        density, sessions, rng = self.args.absence_density, self.args.sessions, self.rng
+        # Jump straight to the next missed session with a geometric gap instead of
+        # drawing once per session; only densities strictly between 0 and 1 need it
+        log_keep = math.log(1 - density) if 0 < density < 1 else None
+        calendars = {}
+        for am, group_id, lab_id, year, half in enrollments:
+            dates = calendars.get((group_id, half))
+            if dates is None:
+                start = date(year, 10, 1) if half == 0 else date(year + 1, 3, 1)
+                start += timedelta(days=(self.group_info[group_id][2] - start.weekday()) % 7)
+                dates = calendars[group_id, half] = [(start + timedelta(weeks=w)).isoformat()
+                                                     for w in range(sessions)]
+            missed = 0
+            week = -1
+            while density:
+                week += 1 if log_keep is None else 1 + int(math.log(1 - rng.random()) / log_keep)
+                if week >= sessions:
+                    break
+                missed += 1
+                yield (am, group_id, dates[week])
+            self.lab_absences[am, lab_id] = missed
+
+    def lab_students(self, enrollments):
+        rng = self.rng
+        for am, group_id, lab_id, year, half in enrollments:
+            misses = self.lab_absences[am, lab_id]
+            if year == self.current_year:
+                status, grade = STATUS_IN_PROGRESS, 0
+            elif misses > self.lab_misses[lab_id] or rng.random() < 0.12:
+                status, grade = STATUS_FAILED, rng.randint(0, 4)
+            else:
+                status, grade = STATUS_COMPLETED, rng.randint(5, 10)
+            month = 10 if half == 0 else 3
+            yield (am, lab_id, misses, grade, month, year + half, status)
+
+    def group_students(self, enrollments):
+        for am, group_id, lab_id, year, half in enrollments:
+            month = 10 if half == 0 else 3
+            yield (am, group_id, f'{self.rng.randint(1, 20)}/{month}', year + half)
+
+    def capacities(self):
+        """maxusers per lab: the fullest generated group plus a quarter for new registrations."""
+        fullest = {}
+        for group_id, fill in self.group_fill.items():
+            lab_id = self.group_info[group_id][0]
+            fullest[lab_id] = max(fullest.get(lab_id, 0), fill)
+        return [(max(1, math.ceil(fill * 1.25)), lab_id) for lab_id, fill in fullest.items()]
+
+    def _person(self):
+        return f'{self.rng.choice(SURNAMES)} {self.rng.choice(FIRST_NAMES)}'
+
+
+def bulk_insert(conn, label, sql, rows):
+    """executemany in BATCH-sized chunks inside a single transaction; returns the row count."""
+    start = time.perf_counter()
+    count = 0
+    conn.execute('BEGIN')
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH:
+            conn.executemany(sql, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        conn.executemany(sql, batch)
+        count += len(batch)
+    conn.execute('COMMIT')
+    elapsed = time.perf_counter() - start
+    print(f'  {label:18s}: {count:>10,} rows in {elapsed:6.2f}s ({count / max(elapsed, 1e-9):>10,.0f} rows/s)')
+    return count
+
+
+# =================================================================
+# MAIN
+# =================================================================
+
+def generate(args):
+    if os.path.exists(args.output):
+        if not args.force:
+            print(f'ERROR: {args.output} exists (use --force to overwrite)')
+            sys.exit(1)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.output + suffix):
+                os.remove(args.output + suffix)
+
+    gen = Generator(args)
+    print('=' * 60)
+    print('GENERATE: Synthetic UniLabs dataset')
+    print(f'  Output        : {args.output}')
+    print(f'  Students      : {args.students:,}   Courses: {args.courses}   '
+          f'Labs/course: {args.labs_per_course}   Groups/lab/year: {args.groups_per_lab}')
+    print(f'  Years         : {gen.first_year}-{gen.current_year}   Labs/year: {args.labs_per_year}   '
+          f'Absence density: {args.absence_density:g}   Seed: {args.seed}')
+    print('=' * 60)
+
+    started = time.perf_counter()
+    create_schema(args.output)
+
+    conn = sqlite3.connect(args.output, isolation_level=None)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA cache_size = -262144')
+    conn.execute('PRAGMA foreign_keys = OFF')
+
+    indexes = drop_secondary_indexes(conn, ['rel_lab_student', 'rel_group_student', 'student_absence',
+                                            'rel_lab_group', 'rel_group_prof', 'lab_groups'])
+
+    total = 0
+    total += bulk_insert(conn, 'professor', 'INSERT INTO professor '
+                         '(prof_id, name, status, office, email, tel) VALUES (?,?,?,?,?,?)', gen.professors())
+    total += bulk_insert(conn, 'coursename', 'INSERT INTO coursename '
+                         '(course_id, name, description, semester) VALUES (?,?,?,?)', gen.courses())
+    total += bulk_insert(conn, 'coursetoprof', 'INSERT INTO coursetoprof (course_id, prof_id) VALUES (?,?)',
+                         gen.course_professors())
+    total += bulk_insert(conn, 'course_lab', 'INSERT INTO course_lab '
+                         '(lab_id, name, description, maxusers, reg_limit, max_misses) VALUES (?,?,?,?,?,?)',
+                         gen.labs())
+    total += bulk_insert(conn, 'rel_course_lab', 'INSERT INTO rel_course_lab (course_id, lab_id) VALUES (?,?)',
+                         gen.course_labs())
+    total += bulk_insert(conn, 'lab_groups', 'INSERT INTO lab_groups '
+                         '(group_id, daytime, year, finalize) VALUES (?,?,?,?)', gen.groups())
+    total += bulk_insert(conn, 'rel_lab_group', 'INSERT INTO rel_lab_group (lab_id, group_id) VALUES (?,?)',
+                         gen.lab_group_links())
+    total += bulk_insert(conn, 'rel_group_prof', 'INSERT INTO rel_group_prof (prof_id, group_id) VALUES (?,?)',
+                         gen.group_professors())
+    total += bulk_insert(conn, 'student', 'INSERT INTO student '
+                         '(am, name, semester, pwd, email) VALUES (?,?,?,?,?)', gen.students())
+
+    # Enrollments are drawn once and replayed for the three tables built from them
+    start = time.perf_counter()
+    enrollments = list(gen.enrollments())
+    elapsed = time.perf_counter() - start
+    print(f'  {"(enrollments)":18s}: {len(enrollments):>10,} drawn in {elapsed:6.2f}s')
+    total += bulk_insert(conn, 'student_absence', 'INSERT INTO student_absence '
+                         '(am, group_id, absence_date) VALUES (?,?,?)', gen.absences(enrollments))
+    total += bulk_insert(conn, 'rel_lab_student', 'INSERT INTO rel_lab_student '
+                         '(am, lab_id, misses, grade, reg_month, reg_year, status) VALUES (?,?,?,?,?,?,?)',
+                         gen.lab_students(enrollments))
+    total += bulk_insert(conn, 'rel_group_student', 'INSERT INTO rel_group_student '
+                         '(am, group_id, group_reg_daymonth, group_reg_year) VALUES (?,?,?,?)',
+                         gen.group_students(enrollments))
+    del enrollments
+
+    start = time.perf_counter()
+    conn.execute('BEGIN')
+    conn.executemany('UPDATE course_lab SET maxusers = ? WHERE lab_id = ?', gen.capacities())
+    conn.executemany('UPDATE lab_groups SET enrolled_count = ? WHERE group_id = ?',
+                     [(fill, gid) for gid, fill in gen.group_fill.items() if fill])
+    for sql in indexes:
+        conn.execute(sql)
+    conn.execute('COMMIT')
+    conn.execute('ANALYZE')
+    print(f'  {"indexes + counts":18s}: {len(indexes):>10,} indexes rebuilt in {time.perf_counter() - start:6.2f}s')
+    conn.close()
+
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(args.output)
+    print()
+    print('=' * 60)
+    print('GENERATION COMPLETE')
+    print(f'  Rows          : {total:,} in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s overall)')
+    print(f'  Database size : {size / 2**20:,.1f} MiB ({size / max(total, 1):.0f} bytes/row)')
+    print('=' * 60)
+    print(f'Run the app on it with: DATABASE_PATH={args.output} python app/app.py')
+    return total
+
+
+if __name__ == '__main__':
+    generate(parse_args())
@@ -23,11 +23,24 @@ def get_academic_year():
 
 
 def future_date(days=180):
-    return (datetime.now() + timedelta(days=days)).strftime('%d/%m/%Y')
+    return (datetime.now() + timedelta(days=days)).date().isoformat()
 
 
 def past_date(days=30):
-    return (datetime.now() - timedelta(days=days)).strftime('%d/%m/%Y')
+    return (datetime.now() - timedelta(days=days)).date().isoformat()
+
+
+def migrate_schema():
+    """Apply pending schema migrations: the seed writes to tables they create."""
+    sys.path.insert(0, os.path.join(BASE_DIR, 'app'))
+    from sqlalchemy import create_engine
+    from migrations import upgrade
+
+    engine = create_engine(f'sqlite:///{DB_PATH}')
+    applied = upgrade(engine)
+    engine.dispose()
+    if applied:
+        print(f'  Migrations applied: {applied}')
 
 
 def seed():
@@ -35,6 +48,8 @@ def seed():
         print(f'ERROR: Database not found at {DB_PATH}')
         sys.exit(1)
 
+    migrate_schema()
+
     year = get_academic_year()
     open_limit = future_date(180)
     closed_limit = past_date(30)
@@ -205,7 +220,7 @@ def seed():
     placeholders = ','.join('?' * len(seed_ams))
     cur.execute(f'DELETE FROM rel_lab_student  WHERE am IN ({placeholders})', seed_ams)
     cur.execute(f'DELETE FROM rel_group_student WHERE am IN ({placeholders})', seed_ams)
-    cur.execute(f'DELETE FROM student_misses_pergroup WHERE am IN ({placeholders})', seed_ams)
+    cur.execute(f'DELETE FROM student_absence WHERE am IN ({placeholders})', seed_ams)
 
     in_progress = 'Σε Εξέλιξη'
     completed   = 'Ολοκληρωμένο'
@@ -254,16 +269,24 @@ def seed():
     # 7. ABSENCES
     # =================================================================
     absences = [
-        (10001, 201, '7/10/2025, 14/10/2025'),            # 2 absences in Prog I
-        (10007, 202, '7/10/2025, 14/10/2025, 21/10/2025'),# 3 absences ? critical
-        (10003, 209, '3/11/2025'),                          # 1 absence in Networks
-        (13628, 201, '7/10/2025'),                          # dev student has 1 absence
+        (10001, 201, ['2025-10-07', '2025-10-14']),                # 2 absences in Prog I
+        (10007, 202, ['2025-10-07', '2025-10-14', '2025-10-21']),  # 3 absences ? critical
+        (10003, 209, ['2025-11-03']),                              # 1 absence in Networks
+        (13628, 201, ['2025-10-07']),                              # dev student has 1 absence
     ]
-    for am, gid, misses in absences:
-        cur.execute(
-            'INSERT OR REPLACE INTO student_misses_pergroup '
-            '(am, group_id, misses) VALUES (?,?,?)', (am, gid, misses))
-    print(f'  Absences  : {len(absences)} records')
+    for am, gid, dates in absences:
+        cur.executemany(
+            'INSERT OR IGNORE INTO student_absence '
+            '(am, group_id, absence_date) VALUES (?,?,?)', [(am, gid, d) for d in dates])
+    print(f'  Absences  : {sum(len(d) for _, _, d in absences)} dates')
+
+    # =================================================================
+    # 8. ENROLLED COUNTS (raw inserts bypass the app's counter updates)
+    # =================================================================
+    cur.execute(
+        'UPDATE lab_groups SET enrolled_count = '
+        '(SELECT COUNT(*) FROM rel_group_student r WHERE r.group_id = lab_groups.group_id)')
+    print(f'  Counts    : {cur.rowcount} groups recounted')
 
     # =================================================================
     # COMMIT
@@ -0,0 +1,71 @@
+"""
+Shared test fixtures: a Flask app on a fresh SQLite database and logged-in
+test clients. Each test module seeds its own rows in its `app` fixture.
+"""
+
+import os
+import sys
+
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+sys.path.insert(0, APP_DIR)
+
+from flask import Flask
+from flask_babel import Babel
+
+import models
+from models import db
+from auth import init_route_permissions, registration_deadlines
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """
+    make_app(api=False, **config) -> an app with the full schema in
+    tmp_path/test.sqlite. api=True registers the API blueprint with its
+    route permissions. Registration admission is off unless config turns it on.
+    """
+    apps = []
+
+    def make(api=False, **config):
+        app = Flask(__name__)
+        app.secret_key = 'test'
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.sqlite'}"
+        app.config['REGISTRATION_ADMISSION'] = False
+        app.config.update(config)
+        models.init_app(app)
+        if api:
+            from routes.api import api_bp
+            Babel(app)
+            app.register_blueprint(api_bp)
+            init_route_permissions(app)
+        with app.app_context():
+            db.create_all()
+        apps.append(app)
+        return app
+
+    # The deadline index is per process: never let one test's labs leak into the next
+    registration_deadlines.invalidate()
+    yield make
+    registration_deadlines.invalidate()
+    for app in apps:
+        with app.app_context():
+            db.engine.dispose()
+
+
+@pytest.fixture
+def login(app):
+    """login(user_id, role='student') -> a test client logged in as that user."""
+    def client_for(user_id, role='student'):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['schGrAcPersonID'] = str(user_id)
+            sess['role'] = role
+        return client
+    return client_for
+
+
+@pytest.fixture
+def admin(login):
+    return login(900, role='admin')
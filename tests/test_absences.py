@@ -0,0 +1,71 @@
+"""
+Tests for normalized absence storage.
+Run from project root: python -m pytest tests/test_absences.py
+"""
+
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+from models import db, LabGroup, Student, StudentAbsence
+from auth import (
+    add_absence, remove_absence, get_absence_dates, count_absences, parse_date
+)
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        db.session.add_all([Student(am=am, name=f'Φοιτητής {am}', semester=1, pwd='', email='')
+                            for am in (1, 2)])
+        db.session.add(LabGroup(group_id=10, daytime='Τρίτη 10:00', year=2025, finalize=''))
+        db.session.commit()
+    return app
+
+
+def test_parse_date():
+    assert parse_date('7/10/2025') == date(2025, 10, 7)
+    assert parse_date('2025-10-07') == date(2025, 10, 7)
+    with pytest.raises(ValueError):
+        parse_date('Τρίτη')
+
+
+def test_add_remove_and_aggregate(app):
+    with app.app_context():
+        assert add_absence(1, 10, date(2025, 10, 14))
+        assert add_absence(1, 10, date(2025, 10, 7))
+        assert not add_absence(1, 10, date(2025, 10, 7))
+        assert add_absence(2, 10, date(2025, 10, 7))
+        db.session.commit()
+
+        assert get_absence_dates(10) == {1: ['07/10/2025', '14/10/2025'], 2: ['07/10/2025']}
+        assert count_absences([10]) == {(1, 10): 2, (2, 10): 1}
+
+        assert remove_absence(1, 10, date(2025, 10, 7))
+        assert not remove_absence(1, 10, date(2025, 10, 7))
+        db.session.commit()
+        assert get_absence_dates(10, [1]) == {1: ['14/10/2025']}
+
+
+def test_concurrent_editors_lose_nothing(app):
+    # Several assistants recording absences for the same student at once
+    editors, per_editor = 6, 20
+    start = date(2025, 1, 1)
+
+    def editor(n):
+        with app.app_context():
+            for i in range(per_editor):
+                add_absence(1, 10, start + timedelta(days=n * per_editor + i))
+                db.session.commit()
+            db.session.remove()
+
+    threads = [threading.Thread(target=editor, args=(n,)) for n in range(editors)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with app.app_context():
+        assert StudentAbsence.query.filter_by(am=1, group_id=10).count() == editors * per_editor
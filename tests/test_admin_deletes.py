@@ -0,0 +1,95 @@
+"""
+Tests for the admin delete endpoints, which rely on the foreign keys' ON DELETE actions.
+Run from project root: python -m pytest tests/test_admin_deletes.py
+"""
+
+from datetime import date
+
+import pytest
+
+from models import (
+    db, Coursename, CourseEligibility, CourseLab, Coursetoprof, LabGroup, Professor, RelCourseLab,
+    RelGroupProf, RelGroupStudent, RelLabGroup, RelLabStudent, Student, StudentAbsence
+)
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(api=True)
+    with app.app_context():
+        db.session.add_all([
+            Student(am=1, name='Άλφα', semester=5, pwd='', email=''),
+            Coursename(course_id=1, name='Βάσεις', description='', semester='5ο Εξάμηνο'),
+            Coursename(course_id=2, name='Κενό', description='', semester='5ο Εξάμηνο'),
+            CourseLab(lab_id=1, name='SQL', description='', maxusers=20, max_misses=3),
+            CourseLab(lab_id=2, name='NoSQL', description='', maxusers=20, max_misses=3),
+            LabGroup(group_id=10, daytime='Δευτέρα', year=2025, finalize='', enrolled_count=1),
+            LabGroup(group_id=11, daytime='Τρίτη', year=2025, finalize=''),
+            Professor(prof_id=7, name='Καθηγητής', status='', office='', email='p7@uoi.gr', tel=''),
+            Professor(prof_id=8, name='Χωρίς τμήμα', status='', office='', email='p8@uoi.gr', tel=''),
+        ])
+        db.session.flush()
+        db.session.add_all([
+            RelCourseLab(course_id=1, lab_id=1), RelCourseLab(course_id=1, lab_id=2),
+            RelLabGroup(lab_id=1, group_id=10), RelLabGroup(lab_id=1, group_id=11),
+            RelGroupProf(prof_id=7, group_id=11),
+            Coursetoprof(course_id=2, prof_id=8),
+            CourseEligibility(course_id=2, am=1),
+            RelGroupStudent(am=1, group_id=10, group_reg_daymonth='01/10', group_reg_year=2025),
+            RelLabStudent(am=1, lab_id=1, misses=0, grade=0, reg_month=10, reg_year=2025, status='Σε Εξέλιξη'),
+            StudentAbsence(am=1, group_id=11, absence_date=date(2025, 10, 7)),
+        ])
+        db.session.commit()
+    return app
+
+
+def _count(model, **filters):
+    return model.query.filter_by(**filters).count()
+
+
+def test_group_with_students_is_refused_empty_group_cascades(app, admin):
+    response = admin.delete('/api/admin/groups/10')
+    assert response.status_code == 400 and '1 student(s) enrolled' in response.get_json()['message']
+
+    assert admin.delete('/api/admin/groups/11').status_code == 200
+    with app.app_context():
+        assert db.session.get(LabGroup, 11) is None and db.session.get(LabGroup, 10) is not None
+        # Lab link, professor assignment and absences went with the group
+        assert _count(RelLabGroup, group_id=11) == _count(RelGroupProf, group_id=11) == 0
+        assert _count(StudentAbsence, group_id=11) == 0
+
+
+def test_lab_with_groups_or_enrollments_is_refused(app, admin):
+    response = admin.delete('/api/admin/labs/1')
+    assert response.status_code == 400 and 'lab has 2 group(s)' in response.get_json()['message']
+
+    with app.app_context():
+        RelLabGroup.query.filter_by(lab_id=1).delete()
+        db.session.commit()
+    response = admin.delete('/api/admin/labs/1')
+    assert response.status_code == 400 and '1 student(s) enrolled' in response.get_json()['message']
+
+    assert admin.delete('/api/admin/labs/2').status_code == 200
+    with app.app_context():
+        assert db.session.get(CourseLab, 1) is not None and db.session.get(CourseLab, 2) is None
+        assert _count(RelCourseLab, lab_id=2) == 0
+
+
+def test_course_with_labs_is_refused_empty_course_cascades(app, admin):
+    response = admin.delete('/api/admin/courses/1')
+    assert response.status_code == 400 and 'course has 2 lab(s)' in response.get_json()['message']
+
+    assert admin.delete('/api/admin/courses/2').status_code == 200
+    with app.app_context():
+        assert _count(CourseEligibility, course_id=2) == _count(Coursetoprof, course_id=2) == 0
+        assert db.session.get(Coursename, 1) is not None
+
+
+def test_professor_with_groups_is_refused(app, admin):
+    response = admin.delete('/api/admin/professors/7')
+    assert response.status_code == 400 and 'assigned to 1 group(s)' in response.get_json()['message']
+
+    assert admin.delete('/api/admin/professors/8').status_code == 200
+    with app.app_context():
+        assert db.session.get(Professor, 7) is not None and db.session.get(Professor, 8) is None
+        assert _count(Coursetoprof, prof_id=8) == 0
@@ -0,0 +1,133 @@
+"""
+Tests for the registration admission controller and its endpoints.
+Run from project root: python -m pytest tests/test_admission.py
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from models import db, CourseLab, LabGroup, RegistrationTicket, RelGroupStudent, RelLabGroup, Student
+from admission import AdmissionController, init_admission
+from auth import get_academic_year
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(api=True, REGISTRATION_ADMISSION=True,
+                   REGISTRATION_MAX_IN_FLIGHT=1, REGISTRATION_QUEUE_SIZE=2)
+    init_admission(app)
+    with app.app_context():
+        db.session.add_all([Student(am=am, name=f'Φοιτητής {am}', semester=1, pwd='', email='')
+                            for am in range(1, 6)])
+        db.session.add(CourseLab(lab_id=1, name='SQL', description='', maxusers=10, max_misses=3))
+        db.session.add(LabGroup(group_id=10, daytime='Δευτέρα', year=get_academic_year(), finalize=''))
+        db.session.flush()
+        db.session.add(RelLabGroup(lab_id=1, group_id=10))
+        db.session.commit()
+    return app
+
+
+def _register(client):
+    return client.post('/api/register-lab', json={'lab_id': 1, 'group_id': 10})
+
+
+def _occupy_slot(app):
+    """Another worker's registration holds the only slot."""
+    with app.test_request_context():
+        return app.extensions['admission'].admit(5, 'api_register_lab', {'lab_id': 1, 'group_id': 10})
+
+
+def _enrolled(app, am):
+    with app.app_context():
+        return db.session.get(RelGroupStudent, (am, 10)) is not None
+
+
+def test_free_slot_runs_the_registration_at_once(app, login):
+    response = _register(login(1))
+    assert response.status_code == 200 and response.get_json()['success']
+    assert _enrolled(app, 1)
+    with app.test_request_context():
+        assert app.extensions['admission'].stats()['in_flight'] == 0
+
+
+def test_queued_registration_runs_when_polled_at_the_head(app, login):
+    holder = _occupy_slot(app)
+    assert holder.state == 'admitted'
+
+    first, second = login(1), login(2)
+    queued = _register(first)
+    assert queued.status_code == 202 and queued.headers['Retry-After'] == '1'
+    body = queued.get_json()
+    assert body['queued'] and body['position'] == 1 and body['waiting'] == 1
+    second_url = _register(second).get_json()['status_url']
+    assert second.get(second_url).get_json()['position'] == 2
+    assert not _enrolled(app, 1)
+
+    # The slot is still taken; another student cannot read the ticket
+    assert first.get(body['status_url']).status_code == 202
+    assert second.get(body['status_url']).status_code == 404
+    # A resubmission returns the same ticket instead of queueing twice
+    assert _register(first).get_json()['ticket'] == body['ticket']
+
+    with app.test_request_context():
+        app.extensions['admission'].finish(holder.ticket_id, 200, '{}')
+    # Only the head of the queue is let in
+    assert second.get(second_url).status_code == 202
+    done = first.get(body['status_url'])
+    assert done.status_code == 200 and done.get_json()['success'] and _enrolled(app, 1)
+    # Later polls replay the stored answer without registering again
+    replay = first.get(body['status_url'])
+    assert replay.status_code == 200 and replay.get_json() == done.get_json()
+
+    assert second.get(second_url).status_code == 200 and _enrolled(app, 2)
+
+
+def test_full_queue_answers_503_with_retry_after(app, login):
+    _occupy_slot(app)
+    assert _register(login(1)).status_code == 202
+    assert _register(login(2)).status_code == 202
+    response = _register(login(3))
+    assert response.status_code == 503 and response.headers['Retry-After'] == '5'
+    details = response.get_json()['details']
+    assert details['error_type'] == 'busy' and details['reason'] == 'queue_full' and details['position'] == 2
+
+
+def test_unpolled_ticket_expires(app, login):
+    _occupy_slot(app)
+    client = login(1)
+    status_url = _register(client).get_json()['status_url']
+    with app.app_context():
+        db.session.execute(update(RegistrationTicket).where(RegistrationTicket.am == 1)
+                           .values(touched_at=datetime.now() - timedelta(minutes=1)))
+        db.session.commit()
+    response = client.get(status_url)
+    assert response.status_code == 410 and response.get_json()['details']['error_type'] == 'ticket_expired'
+    # An expired ticket no longer counts against the queue
+    assert _register(login(2)).get_json()['position'] == 1
+    assert client.get('/api/register-lab/queue/999').status_code == 404
+
+
+def test_legacy_join_route_waits_in_the_same_queue(app, login):
+    holder = _occupy_slot(app)
+    client = login(1)
+    queued = client.post('/groups/10/join')
+    assert queued.status_code == 202 and queued.get_json()['position'] == 1
+    assert not _enrolled(app, 1)
+
+    with app.test_request_context():
+        app.extensions['admission'].finish(holder.ticket_id, 200, '{}')
+    done = client.get(queued.get_json()['status_url'])
+    assert done.status_code == 200 and done.get_json()['success'] and _enrolled(app, 1)
+    assert client.post('/groups/99/join').status_code == 400
+
+
+def test_cap_is_shared_by_every_worker(app):
+    # Two controllers over one database behave like two worker processes
+    workers = [AdmissionController(max_in_flight=1), AdmissionController(max_in_flight=1)]
+    with app.test_request_context():
+        assert workers[0].admit(1, 'api_register_lab', {}).state == 'admitted'
+        waiting = workers[1].admit(2, 'api_register_lab', {})
+        assert waiting.state == 'waiting' and waiting.position == 1
+        assert workers[0].stats() == workers[1].stats()
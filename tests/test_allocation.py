@@ -0,0 +1,101 @@
+"""
+Tests for preference-based group allocation (app/allocation.py).
+Run from project root: python -m pytest tests/test_allocation.py
+"""
+
+from datetime import datetime
+
+import pytest
+
+from models import db, CourseLab, GroupPreference, LabGroup, RelGroupStudent, RelLabGroup, Student
+from allocation import allocate_lab, lottery_order, serial_dictatorship
+from auth import change_student_group, get_academic_year, join_waitlist
+
+
+def test_serial_dictatorship_follows_priority_and_capacity():
+    preferences = {1: [10, 11], 2: [10, 11], 3: [10], 4: [10, 11], 5: []}
+    result = serial_dictatorship(preferences, {10: 1, 11: 2, 12: 1}, order=[3, 1, 2, 4, 5])
+    # 3 takes the only seat of 10; 1 and 2 fall back to 11; 4 and 5 ranked nothing still open
+    assert result.assigned == {3: 10, 1: 11, 2: 11, 4: 12}
+    assert result.unassigned == [5]
+    assert result.ranks == {1: 1, 2: 2, 0: 1}
+
+    strict = serial_dictatorship(preferences, {10: 1, 11: 2, 12: 1}, order=[3, 1, 2, 4, 5],
+                                 fill_unranked=False)
+    assert strict.unassigned == [4, 5] and 4 not in strict.assigned
+
+
+def test_lottery_is_reproducible():
+    ams = range(1000)
+    assert lottery_order(ams, seed=1) == lottery_order(reversed(ams), seed=1)
+    assert lottery_order(ams, seed=1) != lottery_order(ams, seed=2)
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(api=True)
+    year = get_academic_year()
+    with app.app_context():
+        db.session.add_all([Student(am=am, name=f'Φοιτητής {am}', semester=1, pwd='', email='')
+                            for am in range(1, 6)])
+        db.session.add(CourseLab(lab_id=1, name='SQL', description='', maxusers=2, max_misses=3,
+                                 allocation='preferences'))
+        db.session.add_all([LabGroup(group_id=g, daytime='Δευτέρα', year=year, finalize='') for g in (10, 11)])
+        db.session.flush()
+        db.session.add_all([RelLabGroup(lab_id=1, group_id=10), RelLabGroup(lab_id=1, group_id=11)])
+        now = datetime.now()
+        for am in range(1, 6):
+            db.session.add_all([GroupPreference(am=am, lab_id=1, rank=1, group_id=10, submitted_at=now),
+                                GroupPreference(am=am, lab_id=1, rank=2, group_id=11, submitted_at=now)])
+        db.session.commit()
+    return app
+
+
+def test_allocate_lab_enrolls_and_clears_placed_preferences(app):
+    with app.app_context():
+        allocation, statuses = allocate_lab(1, seed=7)
+        assert allocation.ranks == {1: 2, 2: 2} and len(allocation.unassigned) == 1
+        assert set(statuses.values()) == {'added'}
+
+        members = {r.am: r.group_id for r in RelGroupStudent.query.all()}
+        assert members == allocation.assigned
+        assert {g.group_id: g.enrolled_count for g in LabGroup.query.all()} == {10: 2, 11: 2}
+        # The student without a seat keeps their ranking for the next run
+        assert {(p.am, p.rank) for p in GroupPreference.query.all()} == \
+               {(allocation.unassigned[0], 1), (allocation.unassigned[0], 2)}
+
+
+def test_refused_and_unloaded_students_keep_their_preferences(app, monkeypatch):
+    import allocation as allocation_module
+    with app.app_context():
+        # Student 1 already sits in group 11: the allocation is refused for them
+        db.session.add(RelGroupStudent(am=1, group_id=11, group_reg_daymonth='01/10', group_reg_year=2024))
+        db.session.get(LabGroup, 11).enrolled_count = 1
+        db.session.commit()
+        # Student 5 ranks the groups after the preferences were loaded
+        loaded = allocation_module.load_preferences(1)
+        del loaded[5]
+        monkeypatch.setattr(allocation_module, 'load_preferences', lambda lab_id: loaded)
+
+        allocation, statuses = allocate_lab(1, seed=3)
+        refused = {am for am, status in statuses.items() if status != 'added'}
+        assert 5 not in statuses and 5 not in allocation.unassigned
+        kept = {p.am for p in GroupPreference.query.all()}
+        assert kept == refused | set(allocation.unassigned) | {5}
+        assert 1 in kept and all(status == 'added' for am, status in statuses.items() if am not in kept)
+
+
+def test_preference_lab_refuses_every_direct_registration(app, login):
+    student = login(1)
+    # The legacy join endpoint goes through register_student_to_lab like /api/register-lab
+    response = student.post('/groups/10/join')
+    assert response.status_code == 400 and 'προτιμήσεων' in response.get_json()['message']
+    response = student.post('/api/register-lab', json={'lab_id': 1, 'group_id': 10})
+    assert response.status_code == 400 and response.get_json()['details']['error_type'] == 'preferences_only'
+
+    with app.app_context():
+        assert RelGroupStudent.query.count() == 0
+        db.session.add(RelGroupStudent(am=1, group_id=10, group_reg_daymonth='01/10', group_reg_year=2025))
+        db.session.commit()
+        assert change_student_group(1, 10, 11, 1)[2]['error_type'] == 'preferences_only'
+        assert join_waitlist(2, 1, 10)[2]['error_type'] == 'preferences_only'
@@ -0,0 +1,176 @@
+"""
+Tests for the background audit writer and the admin audit query API.
+Run from project root: python -m pytest tests/test_audit.py
+"""
+
+import glob
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from audit import AuditWriter, DatabaseSink, JsonlFileSink, purge_audit_entries
+from models import db, AuditEntry
+
+
+def _read_lines(pattern):
+    lines = []
+    for path in glob.glob(pattern):
+        with open(path, encoding='utf-8') as f:
+            lines.extend(json.loads(line) for line in f)
+    return lines
+
+
+def test_close_drains_every_entry(tmp_path):
+    path = str(tmp_path / 'audit.jsonl')
+    writer = AuditWriter([JsonlFileSink(path)], batch_size=50, flush_interval=10).start()
+    for i in range(1000):
+        writer.submit({'seq': i, 'action': 'test'})
+    writer.close()
+
+    entries = _read_lines(path)
+    assert [e['seq'] for e in entries] == list(range(1000))
+    assert not writer.submit({'seq': 'late'})
+
+
+def test_flush_writes_partial_batch(tmp_path):
+    path = str(tmp_path / 'audit.jsonl')
+    writer = AuditWriter([JsonlFileSink(path)], batch_size=500, flush_interval=30).start()
+    writer.submit({'action': 'grade_updated', 'new_value': 'Βαθμός 7'})
+    writer.flush()
+    assert _read_lines(path) == [{'action': 'grade_updated', 'new_value': 'Βαθμός 7'}]
+    writer.close()
+
+
+def test_rotation_keeps_all_entries(tmp_path):
+    path = str(tmp_path / 'audit.jsonl')
+    writer = AuditWriter([JsonlFileSink(path, max_bytes=2000, backup_count=50)],
+                         batch_size=10, flush_interval=0.01).start()
+    for i in range(300):
+        writer.submit({'seq': i})
+    writer.close()
+
+    assert os.path.exists(path + '.1')
+    assert sorted(e['seq'] for e in _read_lines(path + '*')) == list(range(300))
+
+
+def test_rotation_archives_instead_of_deleting(tmp_path):
+    for backup_count in (0, 2):
+        path = str(tmp_path / f'audit{backup_count}.jsonl')
+        writer = AuditWriter([JsonlFileSink(path, max_bytes=500, backup_count=backup_count)],
+                             batch_size=5, flush_interval=0.01).start()
+        for i in range(300):
+            writer.submit({'seq': i})
+        writer.close()
+        assert sorted(e['seq'] for e in _read_lines(path + '*')) == list(range(300))
+    # backup_count=0 never rotates; otherwise files past path.2 become timestamped archives
+    assert glob.glob(str(tmp_path / 'audit0.jsonl*')) == [str(tmp_path / 'audit0.jsonl')]
+    assert not os.path.exists(str(tmp_path / 'audit2.jsonl.3'))
+    assert glob.glob(str(tmp_path / 'audit2.jsonl.2*T*'))
+
+
+class _BrokenSink:
+    def __init__(self):
+        self.attempts = 0
+
+    def write(self, entries):
+        self.attempts += 1
+        raise OSError('disk full')
+
+
+def test_failing_sink_spills_to_the_process_log(tmp_path, caplog):
+    path = str(tmp_path / 'audit.jsonl')
+    broken = _BrokenSink()
+    writer = AuditWriter([broken, JsonlFileSink(path)], batch_size=10, flush_interval=0.01,
+                         queue_size=20, retry_delay=0, max_attempts=3).start()
+    # More entries than the queue holds: submit() must not hang on the dead sink
+    for i in range(100):
+        writer.submit({'seq': i})
+    writer.flush()
+    writer.close()
+
+    spilled = [r.getMessage() for r in caplog.records if r.getMessage().startswith('AUDIT: ')]
+    assert len(spilled) == 100 and broken.attempts % 3 == 0
+    assert [e['seq'] for e in _read_lines(path)] == list(range(100))
+
+
+def _entry(i, days_ago=0):
+    return {
+        'timestamp': (datetime.now() - timedelta(days=days_ago)).isoformat(),
+        'user_id': 1000 + i,
+        'user_role': 'student',
+        'action': 'LAB_REGISTER',
+        'target_type': 'group',
+        'target_id': str(i % 7),
+        'ip_address': '127.0.0.1',
+        'old_value': None,
+        'new_value': {'group_id': i % 7},
+        'reason': None
+    }
+
+
+def test_database_sink_and_retention_purge(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'audit.sqlite'}")
+    AuditEntry.__table__.create(engine)
+    sink = DatabaseSink(engine)
+    sink.write([_entry(i, days_ago=400) for i in range(120)])
+    sink.write([_entry(i) for i in range(30)])
+
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(AuditEntry.__table__)).scalar() == 150
+        row = conn.execute(select(AuditEntry.__table__).limit(1)).one()
+        assert row.user_id == '1000' and json.loads(row.new_value) == {'group_id': 0}
+
+    assert purge_audit_entries(engine, 365, chunk_size=50, pause=0) == 120
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(AuditEntry.__table__)).scalar() == 30
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(api=True)
+    start = datetime(2025, 10, 1, 9, 0)
+    with app.app_context():
+        # Entries 3 and 4 share a timestamp, so paging must break the tie on id
+        for i, minutes in enumerate([0, 1, 2, 2, 3, 4, 5], start=1):
+            db.session.add(AuditEntry(
+                id=i, timestamp=start + timedelta(minutes=minutes), user_id=str(100 + i % 2), user_role='admin',
+                action='group_deleted' if i % 3 == 0 else 'group_created', target_type='group', target_id=str(i)))
+        db.session.commit()
+    return app
+
+
+def _audit_ids(client, query):
+    response = client.get(f'/api/admin/audit?{query}')
+    assert response.status_code == 200
+    return [e['id'] for e in response.get_json()['data']]
+
+
+def test_audit_api_pages_with_a_keyset_cursor(admin):
+    pages, cursor = [], ''
+    while True:
+        body = admin.get(f'/api/admin/audit?limit=2&cursor={cursor}').get_json()
+        assert body['count'] == len(body['data']) <= 2
+        pages.append([e['id'] for e in body['data']])
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    # Newest first, ties on timestamp ordered by id, no entry repeated or skipped
+    assert pages == [[7, 6], [5, 4], [3, 2], [1]]
+
+
+def test_audit_api_filters(admin):
+    assert _audit_ids(admin, 'action=group_deleted') == [6, 3]
+    assert _audit_ids(admin, 'user_id=100') == [6, 4, 2]
+    assert _audit_ids(admin, 'target_type=group&target_id=5') == [5]
+    # since is inclusive, until exclusive
+    assert _audit_ids(admin, 'since=2025-10-01T09:02&until=2025-10-01T09:04') == [5, 4, 3]
+    assert _audit_ids(admin, 'action=group_created&limit=2&cursor=2025-10-01T09:02:00|4') == [2, 1]
+
+
+@pytest.mark.parametrize('query', ['cursor=garbage', 'cursor=2025-10-01T09:02:00|x', 'since=yesterday'])
+def test_audit_api_rejects_an_invalid_cursor_or_date(admin, query):
+    response = admin.get(f'/api/admin/audit?{query}')
+    assert response.status_code == 400 and response.get_json()['success'] is False
@@ -0,0 +1,117 @@
+"""
+Tests for admin bulk enrollment (auth.bulk_enroll_students and its endpoint).
+Run from project root: python -m pytest tests/test_bulk_enroll.py
+"""
+
+import io
+
+import pytest
+from sqlalchemy import event
+
+from models import db, CourseLab, LabGroup, RelGroupStudent, RelLabGroup, RelLabStudent, Student
+from auth import bulk_enroll_students
+from routes import api
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(api=True)
+    with app.app_context():
+        db.session.add_all([Student(am=am, name=f'Φοιτητής {am}', semester=1, pwd='', email='')
+                            for am in range(1, 8)])
+        db.session.add(CourseLab(lab_id=1, name='SQL', description='', maxusers=2, max_misses=3))
+        db.session.add_all([LabGroup(group_id=g, daytime='Δευτέρα', year=2025, finalize='') for g in (10, 11)])
+        db.session.flush()
+        db.session.add_all([RelLabGroup(lab_id=1, group_id=10), RelLabGroup(lab_id=1, group_id=11)])
+        # Student 1 is already in group 10, student 7 has a lab row from an earlier year
+        db.session.add(RelGroupStudent(am=1, group_id=10, group_reg_daymonth='1/10', group_reg_year=2025))
+        db.session.add_all([
+            RelLabStudent(am=am, lab_id=1, misses=0, grade=0, reg_month=10, reg_year=2024, status='Σε Εξέλιξη')
+            for am in (1, 7)])
+        db.session.get(LabGroup, 10).enrolled_count = 1
+        db.session.commit()
+    return app
+
+
+def test_per_row_statuses_and_single_transaction(app):
+    with app.app_context():
+        pairs = [(2, 10), (3, 10), (1, 10), (1, 11), (2, 11), (99, 10), (4, 77), (7, 11), (5, 11), (6, 11)]
+        commits = []
+
+        def record(session):
+            commits.append(session)
+
+        session = db.session()
+        event.listen(session, 'after_commit', record)
+        try:
+            statuses = bulk_enroll_students(pairs)
+        finally:
+            event.remove(session, 'after_commit', record)
+
+        assert statuses == ['added', 'group_full', 'already_enrolled', 'enrolled_elsewhere', 'duplicate',
+                            'student_not_found', 'group_not_found', 'added', 'added', 'group_full']
+        # BEGIN IMMEDIATE commits the read transaction first, then one commit for all writes
+        assert len(commits) == 2
+
+        members = {(r.am, r.group_id) for r in RelGroupStudent.query.all()}
+        assert members == {(1, 10), (2, 10), (7, 11), (5, 11)}
+        assert {g.group_id: g.enrolled_count for g in LabGroup.query.all()} == {10: 2, 11: 2}
+        # The existing lab row of student 7 is kept, new students get one
+        lab_rows = {r.am: r.reg_year for r in RelLabStudent.query.all()}
+        assert set(lab_rows) == {1, 2, 5, 7} and lab_rows[7] == 2024
+
+
+def test_nothing_to_add_writes_nothing(app):
+    with app.app_context():
+        assert bulk_enroll_students([(1, 10), (99, 11)]) == ['already_enrolled', 'student_not_found']
+        assert RelGroupStudent.query.count() == 1
+        assert db.session.get(LabGroup, 11).enrolled_count == 0
+
+
+def _upload(client, text):
+    return client.post('/api/admin/enrollments/bulk',
+                       data={'file': (io.BytesIO(text.encode('utf-8')), 'rows.csv')},
+                       content_type='multipart/form-data')
+
+
+def _statuses(response):
+    assert response.status_code == 200
+    return [(r['am'], r['group_id'], r['status']) for r in response.get_json()['data']['rows']]
+
+
+def _in_group(app, am, group_id):
+    with app.app_context():
+        return db.session.get(RelGroupStudent, (am, group_id)) is not None
+
+
+@pytest.mark.parametrize('text', ['am,group_id\n2,10\n3,11\n', '\ufeff2,10\n\n3,11\n'])
+def test_csv_with_or_without_header(app, admin, text):
+    assert _statuses(_upload(admin, text)) == [(2, 10, 'added'), (3, 11, 'added')]
+    assert _in_group(app, 2, 10) and _in_group(app, 3, 11)
+
+
+@pytest.mark.parametrize('wrap', [lambda rows: rows, lambda rows: {'rows': rows}])
+def test_json_list_or_rows_object(app, admin, wrap):
+    rows = [{'am': 2, 'group_id': 10}, [3, '11'], {'am': 'x', 'group_id': 10}, [4], 'junk', {'am': 5}]
+    response = admin.post('/api/admin/enrollments/bulk', json=wrap(rows))
+    assert _statuses(response) == [(2, 10, 'added'), (3, 11, 'added'), (None, 10, 'invalid'),
+                                   (None, None, 'invalid'), (None, None, 'invalid'), (5, None, 'invalid')]
+    assert response.get_json()['data']['added'] == 2 and response.get_json()['data']['rejected'] == 4
+
+
+def test_invalid_csv_rows_are_reported_and_skipped(app, admin):
+    response = _upload(admin, '2,10\n3,abc\n4\n5,11\n')
+    assert _statuses(response) == [(2, 10, 'added'), (3, None, 'invalid'), (4, None, 'invalid'), (5, 11, 'added')]
+    assert not _in_group(app, 3, 10) and not _in_group(app, 3, 11)
+
+
+def test_row_limit_and_empty_input_are_refused(app, admin, monkeypatch):
+    monkeypatch.setattr(api, 'BULK_ENROLL_MAX_ROWS', 2)
+    response = admin.post('/api/admin/enrollments/bulk', json=[[2, 10], [3, 11], [4, 11]])
+    assert response.status_code == 400 and 'At most 2 rows' in response.get_json()['message']
+    assert not _in_group(app, 2, 10)
+    # Exactly at the limit is accepted
+    assert admin.post('/api/admin/enrollments/bulk', json=[[2, 10], [3, 11]]).status_code == 200
+
+    assert admin.post('/api/admin/enrollments/bulk', json={'rows': []}).status_code == 400
+    assert _upload(admin, 'am,group_id\n').status_code == 400
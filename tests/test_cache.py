@@ -0,0 +1,39 @@
+"""
+Tests for the in-process TTL/LRU cache.
+Run from project root: python -m pytest tests/test_cache.py
+"""
+
+import cache
+from cache import TTLCache, cache_stats
+
+
+def test_lru_eviction_keeps_recently_used():
+    c = TTLCache('test_lru', maxsize=2, ttl=60)
+    c.set('a', 1)
+    c.set('b', 2)
+    assert c.get('a') == 1
+    c.set('c', 3)
+    assert c.get('b') is None
+    assert c.get('a') == 1 and c.get('c') == 3
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    c = TTLCache('test_ttl', maxsize=10, ttl=5)
+    c.set('k', 'v')
+    now[0] += 4
+    assert c.get('k') == 'v'
+    now[0] += 2
+    assert c.get('k') is None
+    assert len(c) == 0
+
+
+def test_invalidate_and_stats():
+    c = TTLCache('test_stats', maxsize=10, ttl=60)
+    c.set('k', 'v')
+    c.get('k')
+    c.invalidate('k')
+    c.get('k')
+    stats = cache_stats()['test_stats']
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['size'] == 0
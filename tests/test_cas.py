@@ -0,0 +1,75 @@
+"""
+Tests for CAS response parsing, the circuit breaker and client timeouts.
+Run from project root: python -m pytest tests/test_cas.py
+"""
+
+import socket
+import time
+
+import pytest
+
+import cas
+from cas import CASClient, CASUnavailable, CircuitBreaker, parse_cas_response
+
+SUCCESS = """<cas:serviceResponse xmlns:cas="http://www.yale.edu/tp/cas">
+  <cas:authenticationSuccess>
+    <cas:schGrAcPersonID>13628</cas:schGrAcPersonID>
+    <cas:displayName>Αλεξίου Μαρία</cas:displayName>
+    <cas:eduPersonAffiliation>student</cas:eduPersonAffiliation>
+    <cas:mail>malexiou@student.uoi.gr</cas:mail>
+  </cas:authenticationSuccess>
+</cas:serviceResponse>"""
+
+FAILURE = """<cas:serviceResponse xmlns:cas="http://www.yale.edu/tp/cas">
+  <cas:authenticationFailure code="INVALID_TICKET">bad</cas:authenticationFailure>
+</cas:serviceResponse>"""
+
+
+def test_parse_cas_response():
+    user = parse_cas_response(SUCCESS)
+    assert user == {'person_id': '13628', 'name': 'Αλεξίου Μαρία',
+                    'affiliation': 'student', 'email': 'malexiou@student.uoi.gr'}
+    assert parse_cas_response(FAILURE) is None
+    assert parse_cas_response('<html>proxy error</html') is None
+
+
+def test_breaker_opens_and_allows_one_trial(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cas.time, 'monotonic', lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10)
+
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+
+    now[0] += 10
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial while half-open
+    breaker.record_success()
+    assert breaker.state == 'closed' and breaker.allow()
+
+
+def test_client_times_out_and_trips_breaker():
+    # Accepts connections but never answers, like a hung SSO server
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(16)
+    url = f'http://127.0.0.1:{listener.getsockname()[1]}/serviceValidate'
+    client = CASClient(url, read_timeout=0.2, breaker=CircuitBreaker(2, 60))
+
+    try:
+        for _ in range(2):
+            start = time.monotonic()
+            with pytest.raises(CASUnavailable):
+                client.validate('ST-1', 'http://localhost/cas_callback')
+            assert time.monotonic() - start < 2
+        assert client.stats()['state'] == 'open'
+
+        start = time.monotonic()
+        with pytest.raises(CASUnavailable, match='circuit open'):
+            client.validate('ST-1', 'http://localhost/cas_callback')
+        assert time.monotonic() - start < 0.05
+    finally:
+        client.close()
+        listener.close()
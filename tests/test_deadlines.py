@@ -0,0 +1,80 @@
+"""
+Tests for the registration deadline index behind validate_registration_period.
+Run from project root: python -m pytest tests/test_deadlines.py
+"""
+
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from models import db, CourseLab
+from auth import DeadlineIndex, validate_registration_period
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.test_request_context():
+        today = date.today()
+        db.session.add_all([
+            CourseLab(lab_id=1, name='Open', description='', maxusers=10, max_misses=3,
+                      reg_limit=today + timedelta(days=5)),
+            CourseLab(lab_id=2, name='Closed', description='', maxusers=10, max_misses=3,
+                      reg_limit=today - timedelta(days=1)),
+            CourseLab(lab_id=3, name='Unlimited', description='', maxusers=10, max_misses=3),
+        ])
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def _count_queries():
+    queries = []
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: queries.append(args[2]))
+    return queries
+
+
+def test_validate_registration_period(app):
+    deadline = (date.today() + timedelta(days=5)).strftime('%d/%m/%Y')
+    assert validate_registration_period(1) == (True, f"Εγγραφές έως {deadline}")
+    assert validate_registration_period(2)[0] is False
+    assert validate_registration_period(3) == (True, "Δεν υπάρχει όριο εγγραφών")
+    assert validate_registration_period(99) == (False, "Το εργαστήριο δεν βρέθηκε")
+
+
+def test_index_loads_once_and_reloads_on_change(app):
+    index = DeadlineIndex(refresh=3600)
+    queries = _count_queries()
+    for _ in range(50):
+        assert index.lookup(1)[0] and index.lookup(3) == (True, None)
+    assert len(queries) == 1
+
+    # A lab created elsewhere is found by the reload on a miss
+    db.session.add(CourseLab(lab_id=4, name='New', description='', maxusers=10, max_misses=3,
+                             reg_limit=date(2030, 1, 1)))
+    db.session.commit()
+    assert index.lookup(4) == (True, date(2030, 1, 1))
+
+    # An edited deadline is seen after invalidate()
+    db.session.get(CourseLab, 1).reg_limit = date(2020, 1, 1)
+    db.session.commit()
+    assert index.lookup(1) != (True, date(2020, 1, 1))
+    index.invalidate()
+    assert index.lookup(1) == (True, date(2020, 1, 1))
+
+
+def test_unknown_lab_reloads_once_until_the_next_refresh(app):
+    index = DeadlineIndex(refresh=3600)
+    index.lookup(1)
+    queries = _count_queries()
+    for _ in range(50):
+        assert index.lookup(99) == (False, None)
+    assert len(queries) == 1
+
+    # The next load (refresh or invalidate) forgets the miss
+    db.session.add(CourseLab(lab_id=99, name='Late', description='', maxusers=10, max_misses=3))
+    db.session.commit()
+    assert index.lookup(99) == (False, None)
+    index.invalidate()
+    assert index.lookup(99) == (True, None)
@@ -0,0 +1,69 @@
+"""
+Tests for the denormalised lab_groups.enrolled_count.
+Run from project root: python -m pytest tests/test_enrolled_count.py
+"""
+
+import pytest
+
+from models import db, CourseLab, LabGroup, RelGroupStudent, RelLabGroup, Student
+from auth import (
+    check_group_capacity, register_student_to_lab, change_student_group,
+    get_academic_year, repair_enrolled_counts
+)
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.test_request_context():
+        year = get_academic_year()
+        db.session.add(CourseLab(lab_id=1, name='Lab', description='', maxusers=2, max_misses=3))
+        for gid in (10, 11):
+            db.session.add(LabGroup(group_id=gid, daytime='Δευτέρα', year=year, finalize=''))
+            db.session.add(RelLabGroup(lab_id=1, group_id=gid))
+        db.session.add_all(Student(am=am, name=f'S{am}', semester=1, pwd='', email='') for am in (1, 2, 3))
+        db.session.commit()
+        yield app
+        db.session.remove()
+
+
+def _counts():
+    db.session.expire_all()
+    return {g.group_id: g.enrolled_count for g in LabGroup.query.all()}
+
+
+def test_registration_and_change_keep_count(app):
+    assert register_student_to_lab(1, 1, 10)[0]
+    assert register_student_to_lab(2, 1, 10)[0]
+    assert _counts() == {10: 2, 11: 0}
+
+    has_space, _, occupancy = check_group_capacity(10, 1)
+    assert not has_space and occupancy['current'] == 2
+    ok, _, details = register_student_to_lab(3, 1, 10)
+    assert not ok and details['error_type'] == 'group_full'
+
+    assert change_student_group(1, 10, 11, 1)[0]
+    assert _counts() == {10: 1, 11: 1}
+
+
+def test_failed_registration_leaves_count_unchanged(app, monkeypatch):
+    def broken_commit():
+        raise RuntimeError('disk full')
+
+    monkeypatch.setattr(db.session, 'commit', broken_commit)
+    ok, _, details = register_student_to_lab(1, 1, 10)
+    monkeypatch.undo()
+
+    assert not ok and details['error_type'] == 'system_error'
+    assert _counts() == {10: 0, 11: 0}
+
+
+def test_repair_fixes_drift(app):
+    # A raw insert that bypassed the counter
+    db.session.add(RelGroupStudent(am=3, group_id=11, group_reg_daymonth='1/1', group_reg_year=2025))
+    db.session.commit()
+
+    assert repair_enrolled_counts() == {11: (0, 1)}
+    db.session.commit()
+    assert _counts() == {10: 0, 11: 1}
+    assert repair_enrolled_counts() == {}
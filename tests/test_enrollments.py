@@ -0,0 +1,134 @@
+"""
+Tests for the student enrollments query and its per-student cache.
+Run from project root: python -m pytest tests/test_enrollments.py
+"""
+
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from models import (
+    db, Coursename, CourseLab, LabGroup, RelCourseLab, RelGroupStudent, RelLabGroup,
+    RelLabStudent, Student
+)
+import auth
+import cache
+from auth import (
+    add_absence, clear_student_enrollments, get_academic_year, get_student_enrollments,
+    invalidate_student_enrollments, register_student_to_lab, registration_deadlines
+)
+
+YEAR = 2025
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        db.session.add_all([
+            Student(am=1, name='Άλφα', semester=5, pwd='', email=''),
+            Coursename(course_id=1, name='Βάσεις', description='', semester='5ο Εξάμηνο'),
+            Coursename(course_id=2, name='Προγραμματισμός', description='', semester='1ο Εξάμηνο'),
+            # Lab 3 sorts before lab 2 by semester; labs 1 and 2 share a semester and sort by name
+            CourseLab(lab_id=1, name='SQL', description='', maxusers=20, max_misses=3),
+            CourseLab(lab_id=2, name='NoSQL', description='', maxusers=20, max_misses=3),
+            CourseLab(lab_id=3, name='C', description='', maxusers=20, max_misses=3),
+            LabGroup(group_id=10, daytime='Δευτέρα 10:00', year=YEAR, finalize=''),
+            LabGroup(group_id=20, daytime='Τρίτη 12:00', year=YEAR, finalize=''),
+            LabGroup(group_id=30, daytime='Τετάρτη 09:00', year=YEAR, finalize=''),
+            LabGroup(group_id=40, daytime='Πέμπτη 09:00', year=YEAR - 1, finalize=''),
+        ])
+        db.session.flush()
+        db.session.add_all([
+            RelCourseLab(course_id=1, lab_id=1), RelCourseLab(course_id=1, lab_id=2),
+            RelCourseLab(course_id=2, lab_id=3),
+            RelLabGroup(lab_id=1, group_id=10), RelLabGroup(lab_id=2, group_id=20),
+            RelLabGroup(lab_id=3, group_id=30), RelLabGroup(lab_id=3, group_id=40),
+        ])
+        for lab_id, group_id in ((1, 10), (2, 20), (3, 30)):
+            db.session.add(RelLabStudent(am=1, lab_id=lab_id, misses=0, grade=0, reg_month=10,
+                                         reg_year=YEAR, status='Σε Εξέλιξη'))
+            db.session.add(RelGroupStudent(am=1, group_id=group_id, group_reg_daymonth='1/10',
+                                           group_reg_year=YEAR))
+        add_absence(1, 10, date(2025, 10, 14))
+        add_absence(1, 10, date(2025, 10, 7))
+        db.session.commit()
+        clear_student_enrollments()
+    return app
+
+
+def _count_queries(fn):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        result = fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return result, len(statements)
+
+
+def test_one_query_then_cached(app):
+    with app.app_context():
+        enrollments, queries = _count_queries(lambda: get_student_enrollments(1, YEAR))
+        assert queries == 1
+        assert [(e['semester'], e['lab_name']) for e in enrollments] == [
+            ('1ο Εξάμηνο', 'C'), ('5ο Εξάμηνο', 'NoSQL'), ('5ο Εξάμηνο', 'SQL')]
+        sql = enrollments[2]
+        assert sql['absences'] == '07/10/2025, 14/10/2025' and sql['absences_count'] == 2
+        assert enrollments[0]['absences'] == '-' and enrollments[0]['absences_count'] == 0
+
+        # Callers get copies: mutating one does not reach the cache
+        enrollments[0]['lab_name'] = 'changed'
+        again, queries = _count_queries(lambda: get_student_enrollments(1, YEAR))
+        assert queries == 0
+        assert again[0]['lab_name'] == 'C'
+
+        # Other years are cached separately
+        previous, queries = _count_queries(lambda: get_student_enrollments(1, YEAR - 1))
+        assert queries == 1 and previous == []
+
+
+def test_invalidation_after_absence(app):
+    with app.app_context():
+        get_student_enrollments(1, YEAR)
+        add_absence(1, 30, date(2025, 10, 8))
+        db.session.commit()
+        assert get_student_enrollments(1, YEAR)[0]['absences_count'] == 0  # still cached
+
+        invalidate_student_enrollments(1)
+        enrollments, queries = _count_queries(lambda: get_student_enrollments(1, YEAR))
+        assert queries == 1
+        assert enrollments[0]['absences'] == '08/10/2025'
+
+
+def test_registration_drops_the_cached_entry(app):
+    year = get_academic_year()
+    with app.app_context():
+        db.session.add_all([CourseLab(lab_id=4, name='Python', description='', maxusers=20, max_misses=3),
+                            LabGroup(group_id=50, daytime='Παρασκευή 11:00', year=year, finalize='')])
+        db.session.flush()
+        db.session.add_all([RelCourseLab(course_id=2, lab_id=4), RelLabGroup(lab_id=4, group_id=50)])
+        db.session.commit()
+    registration_deadlines.invalidate()
+    with app.test_request_context():
+        assert get_student_enrollments(1, year) == []
+        assert register_student_to_lab(1, 4, 50)[0]
+        assert [e['group_id'] for e in get_student_enrollments(1, year)] == [50]
+
+
+def test_writes_by_other_workers_show_up_after_the_ttl(app, monkeypatch):
+    with app.app_context():
+        get_student_enrollments(1, YEAR)
+        # Another worker grades the student: this process is not told
+        RelLabStudent.query.filter_by(am=1, lab_id=3).update({'grade': 8})
+        db.session.commit()
+        assert get_student_enrollments(1, YEAR)[0]['grade'] == 0
+
+        later = cache.time.monotonic() + auth.ENROLLMENT_CACHE_TTL + 1
+        monkeypatch.setattr(cache.time, 'monotonic', lambda: later)
+        assert get_student_enrollments(1, YEAR)[0]['grade'] == 8
@@ -0,0 +1,74 @@
+"""
+Tests for the synthetic dataset generator (generate_dataset.py).
+Run from project root: python -m pytest tests/test_generate_dataset.py
+"""
+
+import os
+import sqlite3
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from sqlalchemy import create_engine
+
+import generate_dataset
+from migrations import MIGRATIONS, current_version
+
+DATA_TABLES = ['professor', 'coursename', 'course_lab', 'lab_groups', 'student',
+               'rel_lab_student', 'rel_group_student', 'student_absence']
+
+
+def _generate(tmp_path, name, *extra):
+    path = str(tmp_path / name)
+    args = generate_dataset.parse_args(['--students', '600', '--courses', '16', '--years', '3',
+                                        '--output', path, *extra])
+    total = generate_dataset.generate(args)
+    return path, total
+
+
+def _rows(path, table):
+    with sqlite3.connect(path) as conn:
+        return conn.execute(f'SELECT * FROM {table} ORDER BY 1, 2').fetchall()
+
+
+def test_dataset_is_deterministic_and_consistent(tmp_path):
+    first, total = _generate(tmp_path, 'a.sqlite')
+    second, _ = _generate(tmp_path, 'b.sqlite')
+    assert all(_rows(first, t) == _rows(second, t) for t in DATA_TABLES)
+    other, _ = _generate(tmp_path, 'c.sqlite', '--seed', '7')
+    assert _rows(first, 'rel_group_student') != _rows(other, 'rel_group_student')
+
+    engine = create_engine(f'sqlite:///{first}')
+    assert current_version(engine) == MIGRATIONS[-1][0]
+    engine.dispose()
+
+    with sqlite3.connect(first) as conn:
+        counted = sum(conn.execute(f'SELECT COUNT(*) FROM {t}').fetchone()[0]
+                      for (t,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                                "AND name NOT IN ('schema_migrations', 'sqlite_stat1')"))
+        assert counted == total
+        # Cached counters match the relation rows and every group fits its lab
+        assert conn.execute(
+            "SELECT COUNT(*) FROM lab_groups g WHERE enrolled_count != "
+            "(SELECT COUNT(*) FROM rel_group_student r WHERE r.group_id = g.group_id)").fetchone()[0] == 0
+        assert conn.execute(
+            "SELECT COUNT(*) FROM lab_groups g JOIN rel_lab_group lg ON lg.group_id = g.group_id "
+            "JOIN course_lab l ON l.lab_id = lg.lab_id WHERE g.enrolled_count > l.maxusers").fetchone()[0] == 0
+        # rel_lab_student.misses is the number of recorded absences
+        assert conn.execute(
+            "SELECT COUNT(*) FROM rel_lab_student ls JOIN rel_group_student gs ON gs.am = ls.am "
+            "JOIN rel_lab_group lg ON lg.group_id = gs.group_id AND lg.lab_id = ls.lab_id "
+            "WHERE ls.misses != (SELECT COUNT(*) FROM student_absence a "
+            "WHERE a.am = ls.am AND a.group_id = gs.group_id)").fetchone()[0] == 0
+        assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+        names = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {'ux_rel_lab_student_am_lab', 'ix_student_absence_group'} <= names
+
+
+def test_absence_density_bounds(tmp_path):
+    none, _ = _generate(tmp_path, 'none.sqlite', '--absence-density', '0')
+    assert _rows(none, 'student_absence') == []
+    every, _ = _generate(tmp_path, 'all.sqlite', '--absence-density', '1', '--sessions', '5')
+    with sqlite3.connect(every) as conn:
+        assert conn.execute("SELECT MIN(misses), MAX(misses) FROM rel_lab_student").fetchone() == (5, 5)
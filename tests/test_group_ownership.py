@@ -0,0 +1,81 @@
+"""
+Tests for the cached professor -> groups ownership check (helpers.professor_owns_group).
+Run from project root: python -m pytest tests/test_group_ownership.py
+"""
+
+import pytest
+
+from models import db, CourseLab, LabGroup, Professor, RelGroupProf, RelLabGroup
+import helpers
+from helpers import professor_owns_group
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(api=True)
+    with app.app_context():
+        db.session.add_all([
+            CourseLab(lab_id=1, name='SQL', description='', maxusers=20, max_misses=3),
+            LabGroup(group_id=10, daytime='Δευτέρα 10:00', year=2025, finalize=''),
+            LabGroup(group_id=11, daytime='Τρίτη 10:00', year=2025, finalize=''),
+            Professor(prof_id=7, name='Πρώτος', status='', office='', email='p7@uoi.gr', tel=''),
+            Professor(prof_id=8, name='Δεύτερος', status='', office='', email='p8@uoi.gr', tel=''),
+        ])
+        db.session.flush()
+        db.session.add_all([
+            RelLabGroup(lab_id=1, group_id=10), RelLabGroup(lab_id=1, group_id=11),
+            RelGroupProf(prof_id=7, group_id=10),
+        ])
+        db.session.commit()
+    helpers._group_ownership_cache.clear()
+    yield app
+    helpers._group_ownership_cache.clear()
+
+
+def _owns(app, prof_id, group_id):
+    with app.app_context():
+        return professor_owns_group(prof_id, group_id)
+
+
+def test_group_set_is_loaded_once_per_professor(app):
+    cache = helpers._group_ownership_cache
+    hits, misses = cache.hits, cache.misses
+    assert _owns(app, 7, 10)
+    assert (cache.hits, cache.misses) == (hits, misses + 1)
+    # Later checks, for any group and with a string id, are answered from the cache
+    assert not _owns(app, 7, '11') and _owns(app, '7', '10')
+    assert (cache.hits, cache.misses) == (hits + 2, misses + 1)
+    # A professor without groups is cached too
+    assert not _owns(app, 8, 10) and not _owns(app, 8, 11)
+    assert (cache.hits, cache.misses) == (hits + 3, misses + 2)
+
+    # Changes that bypass the invalidation helpers stay invisible until the entry goes
+    with app.app_context():
+        db.session.add(RelGroupProf(prof_id=7, group_id=11))
+        db.session.commit()
+    assert not _owns(app, 7, 11)
+    helpers.invalidate_professor_groups(7)
+    assert _owns(app, 7, 11)
+
+
+def test_admin_create_group_invalidates_the_owner(app, admin):
+    assert _owns(app, 8, 10) is False
+    response = admin.post('/api/admin/groups', json={'lab_id': 1, 'day': 'Τετάρτη', 'time': '12:00', 'prof_id': 8})
+    assert response.status_code == 201
+    assert _owns(app, 8, response.get_json()['data']['group_id'])
+
+
+def test_admin_edit_group_invalidates_old_and_new_owner(app, admin):
+    assert _owns(app, 7, 10) and not _owns(app, 8, 10)
+    assert admin.put('/api/admin/groups/10', json={'prof_id': 8}).status_code == 200
+    assert not _owns(app, 7, 10) and _owns(app, 8, 10)
+
+    # prof_id 0 removes the assignment
+    assert admin.put('/api/admin/groups/10', json={'prof_id': 0}).status_code == 200
+    assert not _owns(app, 8, 10)
+
+
+def test_admin_delete_group_invalidates_the_owner(app, admin):
+    assert _owns(app, 7, 10)
+    assert admin.delete('/api/admin/groups/10').status_code == 200
+    assert not _owns(app, 7, 10)
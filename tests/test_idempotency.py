@@ -0,0 +1,97 @@
+"""
+Tests for Idempotency-Key handling (app/idempotency.py).
+Run from project root: python -m pytest tests/test_idempotency.py
+"""
+
+import threading
+import time
+
+import pytest
+from flask import Flask, jsonify, request, session
+
+import idempotency
+from idempotency import idempotent
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.calls = []
+
+    @app.post('/login/<user>')
+    def login(user):
+        session['schGrAcPersonID'] = user
+        session['role'] = 'student'
+        return '', 204
+
+    @app.post('/register')
+    @idempotent
+    def register():
+        data = request.get_json()
+        app.calls.append(data)
+        if data.get('slow'):
+            time.sleep(0.3)
+        if data.get('fail'):
+            return jsonify({'success': False}), 503
+        return jsonify({'success': True, 'call': len(app.calls)}), 201
+
+    idempotency._responses.clear()
+    yield app
+    idempotency._responses.clear()
+
+
+def _client(app, user='1'):
+    client = app.test_client()
+    client.post(f'/login/{user}')
+    return client
+
+
+def test_retry_replays_the_stored_response(app):
+    client = _client(app)
+    first = client.post('/register', json={'group_id': 10}, headers={'Idempotency-Key': 'k1'})
+    again = client.post('/register', json={'group_id': 10}, headers={'Idempotency-Key': 'k1'})
+    assert (first.status_code, again.status_code) == (201, 201)
+    assert again.get_json() == first.get_json() == {'success': True, 'call': 1}
+    assert again.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+    assert len(app.calls) == 1
+
+    # Other keys, other users and requests without a key all run
+    client.post('/register', json={'group_id': 10}, headers={'Idempotency-Key': 'k2'})
+    _client(app, '2').post('/register', json={'group_id': 10}, headers={'Idempotency-Key': 'k1'})
+    client.post('/register', json={'group_id': 10})
+    assert len(app.calls) == 4
+
+
+def test_key_reused_for_another_request_is_refused(app):
+    client = _client(app)
+    client.post('/register', json={'group_id': 10}, headers={'Idempotency-Key': 'k'})
+    response = client.post('/register', json={'group_id': 11}, headers={'Idempotency-Key': 'k'})
+    assert response.status_code == 422 and len(app.calls) == 1
+    # The query string is part of the request, e.g. ?prof_id= picks the profile to edit
+    response = client.post('/register?prof_id=2', json={'group_id': 10}, headers={'Idempotency-Key': 'k'})
+    assert response.status_code == 422 and len(app.calls) == 1
+    assert client.post('/register', json={}, headers={'Idempotency-Key': 'x' * 256}).status_code == 400
+
+
+def test_concurrent_duplicate_waits_for_the_first(app):
+    results = []
+
+    def submit():
+        response = _client(app).post('/register', json={'slow': True}, headers={'Idempotency-Key': 'k'})
+        results.append((response.status_code, response.get_json()['call']))
+
+    threads = [threading.Thread(target=submit) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [(201, 1)] * 3 and len(app.calls) == 1
+
+
+def test_server_errors_are_not_stored(app):
+    client = _client(app)
+    for _ in range(2):
+        assert client.post('/register', json={'fail': True}, headers={'Idempotency-Key': 'k'}).status_code == 503
+    assert len(app.calls) == 2
@@ -0,0 +1,246 @@
+"""
+Tests for the schema migration runner and the relation-table index pack.
+Run from project root: python -m pytest tests/test_migrations.py
+"""
+
+import json
+import os
+import shutil
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, func, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+
+from migrations import MIGRATIONS, SchemaOutOfDate, check_schema, current_version, orphan_report, upgrade
+from models import (
+    db, CourseEligibility, CourseLab, LabGroup, Professor, RelGroupStudent, RelLabGroup,
+    RelLabStudent, StudentAbsence
+)
+
+SOURCE_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         'app', 'data', 'labregister.sqlite')
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """A copy of the shipped database, which predates the migrations."""
+    path = tmp_path / 'labregister.sqlite'
+    shutil.copyfile(SOURCE_DB, path)
+    engine = create_engine(f'sqlite:///{path}')
+    yield engine
+    engine.dispose()
+
+
+def _plan(engine, stmt):
+    sql = str(stmt.compile(engine, compile_kwargs={'literal_binds': True}))
+    with engine.connect() as conn:
+        return ' '.join(row[-1] for row in conn.execute(text('EXPLAIN QUERY PLAN ' + sql)))
+
+
+def test_upgrade_dedupes_and_is_idempotent(engine):
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO rel_lab_student (am, lab_id, misses, grade, reg_month, reg_year, status) "
+                          "SELECT am, lab_id, 0, 9, reg_month, reg_year, status FROM rel_lab_student LIMIT 2"))
+        conn.execute(text("INSERT INTO course_eligibility (course_id, am) VALUES (1001, 13628), (1001, 13628)"))
+
+    assert upgrade(engine) == [m[0] for m in MIGRATIONS]
+    assert current_version(engine) == MIGRATIONS[-1][0]
+    assert upgrade(engine) == []
+
+    with engine.connect() as conn:
+        lab_rows = conn.execute(select(func.count()).select_from(RelLabStudent.__table__)).scalar()
+        distinct = conn.execute(text("SELECT COUNT(*) FROM (SELECT DISTINCT am, lab_id FROM rel_lab_student)")).scalar()
+        assert lab_rows == distinct
+        # The newest duplicate (grade 9) is the one kept
+        assert conn.execute(text("SELECT COUNT(*) FROM rel_lab_student WHERE grade = 9")).scalar() == 2
+        assert conn.execute(select(func.count()).select_from(CourseEligibility.__table__)).scalar() == 1
+        # The removed duplicates, grades included, are kept in migration_backup
+        backup = conn.execute(text("SELECT source_table, row_data FROM migration_backup ORDER BY id")).all()
+        assert [t for t, _ in backup] == ['rel_lab_student'] * 2 + ['course_eligibility']
+        assert all(json.loads(row)['grade'] != 9 for t, row in backup if t == 'rel_lab_student')
+        assert json.loads(backup[-1][1])['am'] == 13628
+
+
+@pytest.mark.parametrize('stmt, index', [
+    (select(func.count()).select_from(RelGroupStudent.__table__).where(RelGroupStudent.group_id == 1),
+     'ix_rel_group_student_group'),
+    (select(RelLabStudent.__table__).where(RelLabStudent.am == 13628, RelLabStudent.lab_id == 1),
+     'ux_rel_lab_student_am_lab'),
+    (select(RelLabGroup.__table__).where(RelLabGroup.group_id == 1), 'ix_rel_lab_group_group'),
+    (select(LabGroup.group_id, LabGroup.daytime).where(LabGroup.year == 2025), 'ix_lab_groups_year'),
+    (select(CourseEligibility.__table__).where(CourseEligibility.course_id == 1, CourseEligibility.am == 13628),
+     'ux_course_eligibility_course_am'),
+    (select(Professor.prof_id).where(Professor.email == 'x@uoi.gr'), 'ix_professor_email'),
+])
+def test_hot_queries_use_indexes(engine, stmt, index):
+    assert 'SCAN' in _plan(engine, stmt)
+    upgrade(engine)
+    plan = _plan(engine, stmt)
+    assert index in plan and 'SCAN' not in plan.replace('COVERING INDEX', '')
+
+
+def test_absence_blobs_become_rows(engine):
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO student_misses_pergroup (am, group_id, misses) "
+                          "VALUES (90000, 5, '1/3/2026, 2026-03-08,, 15/03/2026, 1/3/2026')"))
+        blobs = conn.execute(text("SELECT misses FROM student_misses_pergroup")).scalars().all()
+    expected = sum(len({d.strip() for d in b.split(',') if d.strip()}) for b in blobs)
+
+    upgrade(engine)
+
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(StudentAbsence.__table__)).scalar() == expected
+        dates = conn.execute(select(StudentAbsence.absence_date).where(StudentAbsence.am == 90000)
+                             .order_by(StudentAbsence.absence_date)).scalars().all()
+        assert [d.isoformat() for d in dates] == ['2026-03-01', '2026-03-08', '2026-03-15']
+        assert conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'student_misses_pergroup'")).first() is None
+
+    plan = _plan(engine, select(StudentAbsence.am, StudentAbsence.absence_date).where(StudentAbsence.group_id == 5))
+    assert 'ix_student_absence_group' in plan
+
+
+def test_unparseable_absences_are_kept(engine):
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO student_misses_pergroup (am, group_id, misses) "
+                          "VALUES (90001, 5, '1/3/2026, την Τρίτη')"))
+
+    upgrade(engine)
+
+    with engine.connect() as conn:
+        kept = conn.execute(text("SELECT am, group_id, misses FROM student_misses_pergroup")).all()
+        assert [tuple(r) for r in kept] == [(90001, 5, 'την Τρίτη')]
+        assert 'ix_student_misses_pergroup_group' in {
+            i['name'] for i in inspect(conn).get_indexes('student_misses_pergroup')}
+        assert conn.execute(select(func.count()).select_from(StudentAbsence.__table__)
+                            .where(StudentAbsence.am == 90001)).scalar() == 1
+
+
+def test_reg_limit_becomes_date(engine):
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE course_lab SET reg_limit = '2026-04-16' WHERE lab_id = 2"))
+        conn.execute(text("UPDATE course_lab SET reg_limit = '' WHERE lab_id = 3"))
+        conn.execute(text("UPDATE course_lab SET reg_limit = 'end of March' WHERE lab_id = 4"))
+        before = conn.execute(text("SELECT COUNT(*) FROM course_lab")).scalar()
+
+    upgrade(engine)
+
+    with engine.connect() as conn:
+        deadlines = dict(conn.execute(select(CourseLab.lab_id, CourseLab.reg_limit)).all())
+    assert len(deadlines) == before
+    assert deadlines[1] == date(2026, 10, 5)
+    assert deadlines[2] == date(2026, 4, 16)
+    assert deadlines[3] is None and deadlines[4] is None
+    # The unreadable deadline is kept, as text, for an admin to restore
+    with engine.connect() as conn:
+        backup = conn.execute(text(
+            "SELECT row_data FROM migration_backup WHERE source_table = 'course_lab'")).scalars().all()
+    assert [(row['lab_id'], row['reg_limit']) for row in map(json.loads, backup)] == [(4, 'end of March')]
+
+    plan = _plan(engine, select(CourseLab.lab_id).where(CourseLab.reg_limit >= date(2026, 1, 1)))
+    assert 'ix_course_lab_reg_limit' in plan
+
+
+def test_enrolled_count_backfilled(engine):
+    upgrade(engine)
+
+    with engine.connect() as conn:
+        actual = dict(conn.execute(text(
+            "SELECT g.group_id, COUNT(r.am) FROM lab_groups g "
+            "LEFT JOIN rel_group_student r ON r.group_id = g.group_id GROUP BY g.group_id")).all())
+        stored = dict(conn.execute(select(LabGroup.group_id, LabGroup.enrolled_count)).all())
+    assert stored == actual and any(actual.values())
+
+
+def test_orphans_removed_and_foreign_keys_enforced(engine):
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO rel_group_student (am, group_id, group_reg_daymonth, group_reg_year) "
+                          "VALUES (13628, 999999, '1/10', 2025), (424242, 1, '1/10', 2025)"))
+        conn.execute(text("INSERT INTO rel_group_prof (prof_id, group_id) VALUES (424242, 1)"))
+        conn.execute(text("INSERT INTO course_eligibility (course_id, am) VALUES (424242, 13628)"))
+        assert orphan_report(conn) == {('rel_group_student', 'group_id'): 1, ('rel_group_student', 'am'): 1,
+                                       ('rel_group_prof', 'prof_id'): 1, ('course_eligibility', 'course_id'): 1}
+        links = conn.execute(text("SELECT COUNT(*) FROM rel_lab_group WHERE group_id = 1")).scalar()
+
+    upgrade(engine)
+
+    with engine.connect() as conn:
+        assert orphan_report(conn) == {}
+        assert conn.execute(text("PRAGMA foreign_key_check")).all() == []
+        # The orphans are kept in migration_backup, whole rows
+        backup = conn.execute(text(
+            "SELECT source_table, row_data FROM migration_backup WHERE source_table IN "
+            "('rel_group_student', 'rel_group_prof', 'course_eligibility')")).all()
+        keys = ('am', 'group_id', 'prof_id', 'course_id')
+        assert sorted((table, *map(json.loads(row).get, keys)) for table, row in backup) == [
+            ('course_eligibility', 13628, None, None, 424242),
+            ('rel_group_prof', None, 1, 424242, None),
+            ('rel_group_student', 13628, 999999, None, None),
+            ('rel_group_student', 424242, 1, None, None),
+        ]
+        assert 'ix_rel_group_student_group' in _plan(
+            engine, select(RelGroupStudent.am).where(RelGroupStudent.group_id == 1))
+
+        conn.exec_driver_sql("PRAGMA foreign_keys = ON")
+        # RESTRICT: a group with students cannot go, neither can a course with labs
+        with pytest.raises(IntegrityError):
+            conn.execute(text("DELETE FROM lab_groups WHERE group_id = "
+                              "(SELECT group_id FROM rel_group_student LIMIT 1)"))
+        with pytest.raises(IntegrityError):
+            conn.execute(text("DELETE FROM coursename WHERE course_id = "
+                              "(SELECT course_id FROM rel_course_lab LIMIT 1)"))
+        # CASCADE: deleting an empty group takes its lab link and absences with it
+        conn.execute(text("DELETE FROM rel_group_student WHERE group_id = 1"))
+        assert conn.execute(text("DELETE FROM lab_groups WHERE group_id = 1")).rowcount == 1
+        assert links and not conn.execute(text("SELECT COUNT(*) FROM rel_lab_group WHERE group_id = 1")).scalar()
+        assert not conn.execute(text("SELECT COUNT(*) FROM student_absence WHERE group_id = 1")).scalar()
+        conn.rollback()
+
+
+def _schema(engine):
+    insp = inspect(engine)
+    return {
+        table: (sorted(c['name'] for c in insp.get_columns(table)),
+                sorted(i['name'] for i in insp.get_indexes(table)),
+                sorted(u['name'] for u in insp.get_unique_constraints(table)),
+                sorted((fk['constrained_columns'], fk['referred_table'], fk['referred_columns'],
+                        fk['options'].get('ondelete')) for fk in insp.get_foreign_keys(table)))
+        for table in insp.get_table_names()
+    }
+
+
+def test_empty_database_gets_baseline_matching_migrations(engine, tmp_path):
+    fresh = create_engine(f"sqlite:///{tmp_path / 'fresh.sqlite'}")
+    assert upgrade(fresh, metadata=db.metadata) == [m[0] for m in MIGRATIONS]
+    assert current_version(fresh) == MIGRATIONS[-1][0]
+    assert upgrade(fresh, metadata=db.metadata) == []
+
+    # Schema drift: the models and the migration chain must describe the same database
+    upgrade(engine, metadata=db.metadata)
+    assert _schema(fresh) == _schema(engine)
+    fresh.dispose()
+
+
+def test_check_schema(engine):
+    with pytest.raises(SchemaOutOfDate):
+        check_schema(engine, db.metadata, auto_upgrade=False)
+    assert current_version(engine) == 0
+
+    assert check_schema(engine, db.metadata) == MIGRATIONS[-1][0]
+    assert check_schema(engine, db.metadata, auto_upgrade=False) == MIGRATIONS[-1][0]
+
+
+def test_failed_migration_rolls_back(engine, monkeypatch):
+    import migrations
+
+    def broken(conn):
+        conn.execute(text("CREATE INDEX ix_half_done ON student (name)"))
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(migrations, 'MIGRATIONS', MIGRATIONS + [(MIGRATIONS[-1][0] + 1, 'broken', broken)])
+    with pytest.raises(RuntimeError):
+        upgrade(engine)
+
+    assert current_version(engine) == MIGRATIONS[-1][0]
+    with engine.connect() as conn:
+        assert not conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'ix_half_done'")).first()
@@ -0,0 +1,90 @@
+"""
+Tests for the compiled permission engine and route permission resolution.
+Run from project root: python -m pytest tests/test_permissions.py
+"""
+
+import json
+import os
+
+import pytest
+from flask import Flask
+
+from auth import (
+    MATRIX_FILE, PermissionConfigError, PermissionEngine,
+    init_route_permissions, require_permission, require_role
+)
+
+
+def _write_matrix(path, resources):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'roles': ['guest', 'student', 'professor', 'admin'], 'resources': resources}, f)
+
+
+def test_engine_matches_matrix_file():
+    engine = PermissionEngine(MATRIX_FILE)
+    with open(MATRIX_FILE, encoding='utf-8') as f:
+        matrix = json.load(f)
+
+    for resource, actions in matrix['resources'].items():
+        for action, roles in actions.items():
+            if not isinstance(roles, list):
+                continue
+            for role in matrix['roles']:
+                assert engine.has_permission(role, resource, action) == (role in roles)
+
+    assert not engine.has_permission('admin', 'no_such_resource', 'view')
+    assert not engine.has_permission('root', 'dashboard', 'view')
+
+
+def test_engine_reloads_on_mtime_change(tmp_path):
+    path = tmp_path / 'matrix.json'
+    _write_matrix(path, {'labs': {'view': ['student']}})
+    engine = PermissionEngine(str(path), reload_interval=0)
+    assert engine.has_permission('student', 'labs', 'view')
+
+    _write_matrix(path, {'labs': {'view': ['admin']}})
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000_000))
+    assert not engine.has_permission('student', 'labs', 'view')
+    assert engine.has_permission('admin', 'labs', 'view')
+    assert engine.version == 2
+
+
+def test_bad_reload_keeps_previous_table(tmp_path):
+    path = tmp_path / 'matrix.json'
+    _write_matrix(path, {'labs': {'view': ['student']}})
+    engine = PermissionEngine(str(path), reload_interval=0)
+
+    path.write_text('{not json', encoding='utf-8')
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000_000))
+    assert engine.has_permission('student', 'labs', 'view')
+    assert engine.version == 1
+
+
+def test_unknown_permission_fails_at_startup():
+    app = Flask(__name__)
+
+    @app.route('/typo')
+    @require_permission('labs', 'veiw')
+    def typo():
+        return 'ok'
+
+    with pytest.raises(PermissionConfigError):
+        init_route_permissions(app)
+
+
+def test_route_roles_resolved_at_registration():
+    app = Flask(__name__)
+
+    @app.route('/labs-list')
+    @require_permission('labs', 'create')
+    def labs_list():
+        return 'ok'
+
+    @app.route('/admin-only')
+    @require_role('admin')
+    def admin_only():
+        return 'ok'
+
+    init_route_permissions(app)
+    assert app.view_functions['labs_list'].route_permission.roles == {'professor', 'admin'}
+    assert app.view_functions['admin_only'].route_permission.roles == {'admin'}
@@ -0,0 +1,56 @@
+"""
+Tests for first-login student provisioning and the professor email resolver.
+Run from project root: python -m pytest tests/test_provisioning.py
+"""
+
+import pytest
+
+from models import db, Professor, Student
+import helpers
+from helpers import create_or_get_student, get_professor_id_by_email, invalidate_professor_email
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.test_request_context():
+        yield app
+        db.session.remove()
+
+
+def test_create_or_get_student_is_idempotent(app):
+    student, created = create_or_get_student(13628, 'Αλεξίου Μαρία', 'm@uoi.gr')
+    assert created and student.am == 13628 and student.email == 'm@uoi.gr'
+
+    again, created = create_or_get_student(13628, 'Other Name')
+    assert not created and again.name == 'Αλεξίου Μαρία'
+    assert Student.query.count() == 1
+
+
+def test_insert_race_does_not_fail(app, monkeypatch):
+    # Another worker inserted the row between our read and our insert
+    db.session.add(Student(am=42, name='First', semester=1, pwd='', email=''))
+    db.session.commit()
+    real_get = db.session.get
+    calls = []
+
+    def stale_get(*args, **kwargs):
+        calls.append(args)
+        return None if len(calls) == 1 else real_get(*args, **kwargs)
+
+    monkeypatch.setattr(helpers.db.session, 'get', stale_get, raising=False)
+
+    student, created = create_or_get_student(42, 'Second')
+    assert not created and student.name == 'First'
+    assert Student.query.count() == 1
+
+
+def test_professor_email_resolver_is_cached_and_invalidated(app):
+    assert get_professor_id_by_email('new@uoi.gr') is None
+
+    db.session.add(Professor(prof_id=7, name='P', status='', office='', email='new@uoi.gr', tel=''))
+    db.session.commit()
+    assert get_professor_id_by_email('new@uoi.gr') is None  # cached miss
+
+    invalidate_professor_email('new@uoi.gr')
+    assert get_professor_id_by_email('new@uoi.gr') == 7
@@ -0,0 +1,61 @@
+"""
+Tests for the Core row projections used by the listing pages.
+Run from project root: python -m pytest tests/test_readers.py
+"""
+
+from datetime import date
+
+import pytest
+
+import readers
+from models import db, CourseLab, Coursename, LabGroup, Professor, Student
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app()
+    with app.app_context():
+        db.session.add_all([
+            Student(am=2, name='Βήτα', semester=3, pwd='secret', email='b@uoi.gr'),
+            Student(am=1, name='Άλφα', semester=5, pwd='secret', email='a@uoi.gr'),
+            Professor(prof_id=7, name='Ζήτα', status='Λέκτορας', office='Α-1', email='z@uoi.gr', tel='123'),
+            Professor(prof_id=3, name='Γάμμα', status='Καθηγητής', office='Β-2', email='g@uoi.gr', tel='456'),
+            CourseLab(lab_id=5, name='SQL', description='', maxusers=20, reg_limit=date(2026, 4, 1), max_misses=3),
+            CourseLab(lab_id=4, name='C', description='', maxusers=15, reg_limit=None, max_misses=2),
+            Coursename(course_id=1, name='Βάσεις', description='', semester='5ο Εξάμηνο'),
+            Coursename(course_id=2, name='Προγραμματισμός', description='', semester='3ο Εξάμηνο'),
+            Coursename(course_id=3, name='Αλγόριθμοι', description='', semester='5ο Εξάμηνο'),
+            LabGroup(group_id=9, daytime='Δευτέρα 10:00', year=2025, finalize=''),
+        ])
+        db.session.commit()
+    return app
+
+
+def _orm(model, fields):
+    return sorted(tuple(getattr(o, f) for f in fields) for o in model.query.all())
+
+
+@pytest.mark.parametrize('reader, model, order', [
+    (readers.student_rows, Student, [1, 2]),
+    (readers.professor_rows, Professor, [3, 7]),
+    (readers.lab_rows, CourseLab, [4, 5]),
+    # By semester, then name
+    (readers.course_rows, Coursename, [2, 3, 1]),
+    (readers.group_rows, LabGroup, [9]),
+])
+def test_projections_match_orm_without_tracking(app, reader, model, order):
+    with app.app_context():
+        rows = reader()
+        assert not db.session.identity_map
+        assert sorted(tuple(r) for r in rows) == _orm(model, rows[0]._fields)
+        assert [r[0] for r in rows] == order
+
+
+def test_choices_sorted_by_name_and_narrow(app):
+    with app.app_context():
+        assert readers.lab_choices() == [(4, 'C'), (5, 'SQL')]
+        profs = readers.professor_choices()
+        assert [p.name for p in profs] == ['Γάμμα', 'Ζήτα'] and profs[0].prof_id == 3
+        assert readers.lab_rows()[1].reg_limit == date(2026, 4, 1)
+        # Passwords never leave the database through a listing
+        assert 'pwd' not in readers.StudentRow._fields
@@ -0,0 +1,57 @@
+"""
+Tests for the cached role lookup (PermissionMatrix.get_user_role) and its invalidation.
+Run from project root: python -m pytest tests/test_role_cache.py
+"""
+
+import pytest
+
+from models import db, Professor
+import auth
+from auth import permission_matrix
+from helpers import create_or_get_student
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(api=True)
+    with app.app_context():
+        db.session.add(Professor(prof_id=7, name='Καθηγητής', status='', office='', email='p7@uoi.gr', tel=''))
+        db.session.commit()
+    auth._role_cache.clear()
+    yield app
+    auth._role_cache.clear()
+
+
+def _role(app, user_id):
+    # A request without a role in the session, so the lookup goes through the cache
+    with app.test_request_context():
+        return permission_matrix.get_user_role(user_id)
+
+
+def test_role_is_cached(app):
+    assert _role(app, 7) == 'professor'
+    with app.app_context():
+        db.session.delete(db.session.get(Professor, 7))
+        db.session.commit()
+    assert _role(app, 7) == 'professor'
+    auth.invalidate_user_role(7)
+    assert _role(app, 7) == 'guest'
+
+
+def test_first_login_invalidates_the_cached_guest_role(app):
+    assert _role(app, 13628) == 'guest'
+    with app.test_request_context():
+        _, created = create_or_get_student(13628, 'Αλεξίου Μαρία')
+    assert created and _role(app, 13628) == 'student'
+
+
+def test_admin_professor_create_and_delete_invalidate_the_role(app, admin):
+    # SQLite gives the new professor the next rowid
+    assert _role(app, 8) == 'guest'
+    response = admin.post('/api/admin/professors',
+                          json={'name': 'Νίκος', 'surname': 'Νέος', 'email': 'p8@uoi.gr'})
+    assert response.status_code == 201 and response.get_json()['data']['prof_id'] == 8
+    assert _role(app, 8) == 'professor'
+
+    assert admin.delete('/api/admin/professors/8').status_code == 200
+    assert _role(app, 8) == 'guest'
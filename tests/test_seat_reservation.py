@@ -0,0 +1,109 @@
+"""
+Concurrency test: simultaneous registrations and group changes never overbook.
+Run from project root: python -m pytest tests/test_seat_reservation.py
+"""
+
+import threading
+
+import pytest
+from flask import jsonify, request
+
+from models import db, CourseLab, LabGroup, RelGroupStudent, RelLabGroup, Student
+from auth import change_student_group, get_academic_year, register_student_to_lab
+
+LAB_ID = 1
+GROUPS = (10, 11, 12, 13)
+CAPACITY = 5
+STUDENTS = 200
+
+
+@pytest.fixture
+def app(make_app):
+    # Every thread gets its own connection, like a threaded server
+    app = make_app(SQLALCHEMY_ENGINE_OPTIONS={'pool_size': 32, 'max_overflow': 0, 'pool_timeout': 60})
+
+    @app.post('/register')
+    def register():
+        data = request.get_json()
+        ok, message, details = register_student_to_lab(data['am'], LAB_ID, data['group_id'])
+        return jsonify({'success': ok, 'details': details}), 200 if ok else 400
+
+    @app.put('/change')
+    def change():
+        data = request.get_json()
+        ok, message, details = change_student_group(data['am'], data['old'], data['new'], LAB_ID)
+        return jsonify({'success': ok, 'details': details}), 200 if ok else 400
+
+    with app.app_context():
+        db.session.add(CourseLab(lab_id=LAB_ID, name='Lab', description='', maxusers=CAPACITY, max_misses=3))
+        for gid in GROUPS:
+            db.session.add(LabGroup(group_id=gid, daytime='Τρίτη', year=get_academic_year(), finalize=''))
+            db.session.add(RelLabGroup(lab_id=LAB_ID, group_id=gid))
+        db.session.add_all(Student(am=am, name=f'S{am}', semester=1, pwd='', email='')
+                           for am in range(1, STUDENTS + 1))
+        db.session.commit()
+    return app
+
+
+def _storm(app, requests):
+    """Fire (method, url, json) requests from one thread each, released together."""
+    barrier = threading.Barrier(len(requests))
+    results = [None] * len(requests)
+
+    def worker(i, method, url, payload):
+        client = app.test_client()
+        barrier.wait()
+        response = client.open(url, method=method, json=payload)
+        results[i] = (response.status_code, response.get_json())
+
+    threads = [threading.Thread(target=worker, args=(i, *r)) for i, r in enumerate(requests)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def _occupancy(app):
+    with app.app_context():
+        stored = {g.group_id: g.enrolled_count for g in LabGroup.query.all()}
+        actual = {gid: RelGroupStudent.query.filter_by(group_id=gid).count() for gid in GROUPS}
+        db.session.remove()
+    return stored, actual
+
+
+def test_no_overbooking_under_concurrent_registration(app):
+    # Every student races for the first group; the rest spread over the others
+    requests = [('POST', '/register', {'am': am, 'group_id': GROUPS[0] if am % 2 else GROUPS[am // 2 % len(GROUPS)]})
+                for am in range(1, STUDENTS + 1)]
+    results = _storm(app, requests)
+
+    ok = [r for r in results if r[0] == 200]
+    errors = [r for r in results if r[1]['details'].get('error_type') not in (None, 'group_full')]
+    stored, actual = _occupancy(app)
+    assert not errors
+    assert stored == actual
+    assert all(n <= CAPACITY for n in actual.values())
+    assert len(ok) == sum(actual.values()) == CAPACITY * len(GROUPS)
+
+
+def test_no_overbooking_under_concurrent_group_changes(app):
+    # Fill groups 10-12, leave group 13 with two free seats, then everyone moves at once
+    with app.test_request_context():
+        for gid in GROUPS[:3]:
+            for am in range(1, CAPACITY + 1):
+                assert register_student_to_lab(am + (gid - 10) * CAPACITY, LAB_ID, gid)[0]
+        for am in (101, 102, 103):
+            assert register_student_to_lab(am, LAB_ID, GROUPS[3])[0]
+        db.session.remove()
+
+    movers = [(am, GROUPS[(am - 1) // CAPACITY]) for am in range(1, 3 * CAPACITY + 1)]
+    results = _storm(app, [('PUT', '/change', {'am': am, 'old': old, 'new': GROUPS[3]})
+                                 for am, old in movers])
+
+    moved = sum(1 for r in results if r[0] == 200)
+    stored, actual = _occupancy(app)
+    assert moved == CAPACITY - 3
+    assert stored == actual
+    assert actual[GROUPS[3]] == CAPACITY
+    assert sum(actual.values()) == 3 * CAPACITY + 3
@@ -0,0 +1,91 @@
+"""
+Tests for the SQLite pragma profiles and read-only engine set up in models.init_app.
+Run from project root: python -m pytest tests/test_sqlite_profiles.py
+"""
+
+import pytest
+from flask import Flask
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+
+import models
+
+
+def _make_app(tmp_path, **config):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.sqlite'}"
+    app.config.update(config)
+    models.init_app(app)
+    return app
+
+
+def _pragma(name):
+    return models.db.session.execute(text(f'PRAGMA {name}')).scalar()
+
+
+def test_performance_profile_applied_to_connections(tmp_path):
+    app = _make_app(tmp_path, SQLITE_PROFILE='performance', SQLITE_PRAGMAS={'busy_timeout': 1234})
+    with app.app_context():
+        assert _pragma('journal_mode') == 'wal'
+        assert _pragma('synchronous') == 1  # NORMAL
+        assert _pragma('foreign_keys') == 1
+        assert _pragma('temp_store') == 2  # MEMORY
+        assert _pragma('busy_timeout') == 1234
+        models.db.session.remove()
+
+
+def test_legacy_profile_keeps_sqlite_defaults(tmp_path):
+    app = _make_app(tmp_path, SQLITE_PROFILE='legacy')
+    with app.app_context():
+        assert _pragma('journal_mode') == 'delete'
+        assert _pragma('synchronous') == 2  # FULL
+        assert _pragma('foreign_keys') == 1  # required by every profile
+        models.db.session.remove()
+
+
+def test_unknown_profile_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        _make_app(tmp_path, SQLITE_PROFILE='fast')
+
+
+def test_turning_foreign_keys_off_is_refused(tmp_path):
+    for value in ('OFF', 0):
+        with pytest.raises(ValueError, match='foreign_keys'):
+            _make_app(tmp_path, SQLITE_PROFILE='legacy', SQLITE_PRAGMAS={'foreign_keys': value})
+    _make_app(tmp_path, SQLITE_PRAGMAS={'foreign_keys': 1})
+
+
+def test_get_requests_read_through_readonly_engine(tmp_path):
+    app = _make_app(tmp_path)
+    db = models.db
+    with app.app_context():
+        db.create_all()
+        primary = db.engine
+    readonly = app.extensions[models.READONLY_ENGINE]
+
+    with app.test_request_context('/api/semesters', method='GET'):
+        assert db.session.get_bind(models.Student) is readonly
+        assert db.session.get(models.Student, 1) is None
+
+        # A GET handler that writes (first CAS login) moves to the primary and reads its own write
+        db.session.add(models.Student(am=1, name='Νέος', semester=1, pwd='', email=''))
+        db.session.flush()
+        assert db.session.get_bind(models.Student) is primary
+        assert db.session.execute(select(models.Student.name).where(models.Student.am == 1)).scalar() == 'Νέος'
+        db.session.commit()
+        db.session.remove()
+
+    with app.test_request_context('/api/register-lab', method='POST'):
+        assert db.session.get_bind(models.Student) is primary
+        db.session.remove()
+
+    with readonly.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("DELETE FROM student"))
+
+
+def test_readonly_engine_disabled(tmp_path):
+    app = _make_app(tmp_path, SQLITE_READONLY_ENGINE=False)
+    assert models.READONLY_ENGINE not in app.extensions
+    with app.test_request_context(method='GET'):
+        assert models.db.session.get_bind(models.Student) is models.db.engine
@@ -0,0 +1,162 @@
+"""
+Tests for the group waitlists (app/waitlist.py and the waitlist functions in auth).
+Run from project root: python -m pytest tests/test_waitlist.py
+"""
+
+import random
+
+import pytest
+
+from models import db, CourseLab, GroupWaitlist, LabGroup, RelGroupStudent, RelLabGroup, RelLabStudent, Student
+from auth import (change_student_group, close_waitlists, get_academic_year, get_student_waitlists, join_waitlist,
+                  leave_waitlist, promote_waitlisted, register_student_to_lab, registration_deadlines,
+                  waitlist_committed)
+from waitlist import FenwickTree, GroupQueue, waitlists
+
+
+def test_fenwick_prefix_sums_match_a_list():
+    rng = random.Random(3)
+    values = [rng.randint(0, 5) for _ in range(200)]
+    tree = FenwickTree(values[:50])
+    for value in values[50:]:
+        tree.append(value)
+    for _ in range(300):
+        i = rng.randrange(len(values))
+        delta = rng.randint(-2, 2)
+        values[i] += delta
+        tree.add(i + 1, delta)
+    assert [tree.prefix_sum(i) for i in range(len(values) + 1)] == \
+           [sum(values[:i]) for i in range(len(values) + 1)]
+
+
+def test_group_queue_positions_and_compaction():
+    queue = GroupQueue((seq, 100 + seq) for seq in range(1, 201))
+    for am in range(101, 251):
+        if am % 10:
+            assert queue.remove(am)
+    assert not queue.remove(101)
+    assert queue.position(110) == 1 and queue.position(251) == 16 and queue.position(101) is None
+    assert queue.needs_compaction()
+    compacted = queue.compacted()
+    assert len(compacted) == len(queue) == 65
+    assert all(compacted.position(am) == queue.position(am) for am in range(101, 301))
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(api=True)
+    year = get_academic_year()
+    with app.app_context():
+        db.session.add_all([Student(am=am, name=f'Φοιτητής {am}', semester=1, pwd='', email='')
+                            for am in range(1, 7)])
+        db.session.add(CourseLab(lab_id=1, name='SQL', description='', maxusers=1, max_misses=3))
+        db.session.add_all([LabGroup(group_id=g, daytime='Δευτέρα', year=year, finalize='') for g in (10, 11)])
+        db.session.flush()
+        db.session.add_all([RelLabGroup(lab_id=1, group_id=10), RelLabGroup(lab_id=1, group_id=11)])
+        db.session.commit()
+    waitlists.invalidate()
+    yield app
+    waitlists.invalidate()
+
+
+def test_departure_promotes_in_fifo_order(app):
+    with app.test_request_context():
+        assert register_student_to_lab(1, 1, 10)[0]
+        ok, _, details = join_waitlist(2, 1, 11)
+        assert not ok and details['error_type'] == 'group_has_space'
+
+        for am in (2, 3, 4):
+            ok, _, details = join_waitlist(am, 1, 10)
+            assert ok
+        assert details['position'] == 3 and details['waiting'] == 3
+        assert join_waitlist(2, 1, 10)[2]['error_type'] == 'already_waiting'
+        assert join_waitlist(1, 1, 10)[2]['error_type'] == 'already_enrolled'
+
+        # 3 leaves the queue, 2 registers elsewhere: 4 is next in line
+        assert leave_waitlist(3, 1) == 10
+        assert register_student_to_lab(2, 1, 11)[0]
+        assert get_student_waitlists(4)[0]['position'] == 1
+
+        # Group 11 is full too, so 1 cannot move there and nobody is promoted
+        assert change_student_group(1, 10, 11, 1)[2]['error_type'] == 'group_full'
+        db.session.execute(db.delete(RelGroupStudent).where(RelGroupStudent.am == 2))
+        db.session.get(LabGroup, 11).enrolled_count = 0
+        db.session.commit()
+
+        # 1 changes group: its seat in 10 goes to 4 in the same transaction
+        assert change_student_group(1, 10, 11, 1)[0]
+        members = {r.am: r.group_id for r in RelGroupStudent.query.all()}
+        assert members == {1: 11, 4: 10}
+        assert {g.group_id: g.enrolled_count for g in LabGroup.query.all()} == {10: 1, 11: 1}
+        assert GroupWaitlist.query.count() == 0
+        assert get_student_waitlists(4) == []
+
+
+def test_stale_entries_are_dropped_and_closed_labs_do_not_promote(app):
+    with app.test_request_context():
+        assert register_student_to_lab(1, 1, 10)[0]
+        assert register_student_to_lab(2, 1, 11)[0]
+        assert join_waitlist(3, 1, 10)[0] and join_waitlist(4, 1, 10)[0]
+        # 3 was placed by hand in the meantime; the queue still lists them first
+        db.session.add(RelGroupStudent(am=3, group_id=11, group_reg_daymonth='1/10', group_reg_year=2025))
+        db.session.get(LabGroup, 11).enrolled_count = 2
+        db.session.commit()
+        assert waitlists.position(10, 4) == (2, 2)
+
+        db.session.get(CourseLab, 1).maxusers = 2
+        db.session.commit()
+        promotion = promote_waitlisted(10, 1)
+        db.session.commit()
+        waitlist_committed(promotion)
+        assert promotion.dropped == [3] and promotion.promoted == [4]
+        assert waitlists.position(10, 4) == (None, 0)
+
+        assert join_waitlist(5, 1, 10)[0]
+        db.session.get(CourseLab, 1).reg_limit = db.func.date('now', '-1 day')
+        db.session.get(CourseLab, 1).maxusers = 3
+        db.session.commit()
+        registration_deadlines.invalidate()
+        # Closed: 5 no longer sees a position, and the next departure drops the queue
+        assert get_student_waitlists(5) == []
+        promotion = promote_waitlisted(10, 1)
+        db.session.commit()
+        assert promotion.promoted == [] and promotion.dropped == [5]
+        assert GroupWaitlist.query.count() == 0
+
+
+def test_close_waitlists_deletes_queues_of_closed_labs(app):
+    with app.test_request_context():
+        assert register_student_to_lab(1, 1, 10)[0]
+        assert join_waitlist(2, 1, 10)[0] and join_waitlist(3, 1, 10)[0]
+        assert close_waitlists() == {}
+
+        db.session.get(CourseLab, 1).reg_limit = db.func.date('now', '-1 day')
+        db.session.commit()
+        registration_deadlines.invalidate()
+        assert close_waitlists() == {10: [2, 3]}
+        assert GroupWaitlist.query.count() == 0 and waitlists.position(10, 3) == (None, 0)
+
+
+@pytest.fixture
+def api(app):
+    with app.test_request_context():
+        assert register_student_to_lab(1, 1, 10)[0]
+        assert join_waitlist(2, 1, 10)[0]
+    return app
+
+
+@pytest.mark.parametrize('trigger, seats', [
+    (lambda login: login(1).delete('/api/student/enrollment/1'), 1),
+    (lambda login: login(1).post('/groups/10/leave'), 1),
+    (lambda login: login(900, 'admin').delete('/api/professor/group/10/student/1/remove'), 1),
+    (lambda login: login(900, 'admin').put('/api/admin/labs/1', json={'max_users': 2}), 2),
+], ids=['unenroll', 'leave_group', 'force_remove', 'maxusers_increase'])
+def test_endpoints_promote_the_head_of_the_waitlist(api, login, trigger, seats):
+    assert trigger(login).status_code == 200
+    with api.app_context():
+        assert db.session.get(RelGroupStudent, (2, 10)) is not None
+        assert RelLabStudent.query.filter_by(am=2, lab_id=1).count() == 1
+        members = RelGroupStudent.query.filter_by(group_id=10).count()
+        assert db.session.get(LabGroup, 10).enrolled_count == members == seats
+        assert GroupWaitlist.query.count() == 0
+    assert login(2).get('/api/student/waitlist').get_json()['data'] == []